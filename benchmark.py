@@ -0,0 +1,1373 @@
+import sqlite3
+import argparse
+import datetime
+import random
+import string
+import time
+import os
+import sys
+import json
+import subprocess
+import tempfile
+import shutil
+import platform
+import threading
+import socket
+import queue
+import multiprocessing
+import tracemalloc
+
+from pos_core import (BarcodeIndex, Cart, CartLine, JournalReplayer, POSCore, ReceiptJournal, ReceiptWriter,
+                      Sale, ScanBurstQueue, StockError, TillJournal, TransactionIdGenerator, LOW_STOCK_WHERE, REPORTS,
+                      create_product_fts, export_report, migrate, product_page, movement_history,
+                      rebuild_daily_rollup, render_receipt, search_product_rows)
+from pos_metrics import Metrics
+
+# Benchmark jalur panas POS tanpa UI (Tk tidak dibuat)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+def summarize(name, samples):
+    return {
+        'name': name,
+        'count': len(samples),
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+        'mean_us': sum(samples) / len(samples) * 1e6,
+    }
+
+def check(result, ok, message):
+    # Pemeriksaan lulus/gagal; kegagalan dicatat di hasil dan membuat benchmark keluar dengan kode non-zero
+    if not ok:
+        result.setdefault('failures', []).append(message)
+        print(f"GAGAL: {message}")
+    return ok
+
+def seed_products(conn, count):
+    migrate(conn)
+    cursor = conn.cursor()
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for i in range(count):
+        barcode = f"{i:013d}"
+        name = 'Produk ' + ''.join(random.choices(string.ascii_uppercase, k=8))
+        capital = round(random.uniform(1000, 50000), 2)
+        rows.append((barcode, name, capital, round(capital * 1.2, 2), random.randint(0, 500), now))
+    cursor.executemany('''
+        INSERT INTO products (barcode, name, capital_price, selling_price, quantity, date_added)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    return [row[0] for row in rows]
+
+def scan_sql(conn, barcode, qty=1):
+    # Jalur lama add_to_cart: prepared statement per scan
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, selling_price, quantity
+        FROM products
+        WHERE barcode = ?
+    ''', (barcode,))
+    product = cursor.fetchone()
+    if not product:
+        return None
+    product_id, name, price, stock = product
+    if qty > stock:
+        return None
+    return (product_id, barcode, name, price, qty, price * qty)
+
+def scan_index(index, barcode, qty=1):
+    product = index.get(barcode)
+    if product is None:
+        return None
+    if qty > product.quantity:
+        return None
+    return (product.id, barcode, product.name, product.selling_price, qty, product.selling_price * qty)
+
+def bench_scan(products, scans):
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        barcodes = seed_products(conn, products)
+        stream = random.choices(barcodes, k=scans)
+
+        start = time.perf_counter()
+        index = BarcodeIndex()
+        index.load(conn)
+        load_time = time.perf_counter() - start
+
+        results = []
+        samples = []
+        for barcode in stream:
+            t0 = time.perf_counter()
+            scan_sql(conn, barcode)
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize('scan_to_cart_sql', samples))
+
+        samples = []
+        for barcode in stream:
+            t0 = time.perf_counter()
+            scan_index(index, barcode)
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize('scan_to_cart_index', samples))
+
+        conn.close()
+        print(f"Katalog: {products} produk, {scans} scan, load index {load_time * 1000:.1f} ms")
+        for r in results:
+            print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+        return results
+    finally:
+        os.remove(db_path)
+
+def bench_search(products, queries, limit=200):
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        create_product_fts(conn)
+        names = [row[0] for row in conn.execute('SELECT name FROM products')]
+        terms = [name[len('Produk '):][:random.randint(3, 6)] for name in random.choices(names, k=queries)]
+        columns = ('id', 'barcode', 'name', 'selling_price', 'quantity')
+
+        results = []
+        for name, fts_enabled in (('search_like', False), ('search_fts', True)):
+            samples = []
+            for term in terms:
+                t0 = time.perf_counter()
+                search_product_rows(conn, term, columns, limit, fts_enabled)
+                samples.append(time.perf_counter() - t0)
+            results.append(summarize(name, samples))
+
+        conn.close()
+        print(f"Katalog: {products} produk, {queries} pencarian, limit {limit}")
+        for r in results:
+            print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+        return results
+    finally:
+        os.remove(db_path)
+
+def synthetic_scan_stream(barcodes, scans, rate=25, basket=(5, 40), pause=3.0, unknown=0.02, seed=42):
+    # Rekaman scan sintetis: keranjang dipindai beruntun (rate scan/detik), jeda antar pelanggan,
+    # sebagian kecil barcode rusak/tidak dikenal dan scan ulang barang yang sama
+    rng = random.Random(seed)
+    stream = []
+    offset = 0.0
+    while len(stream) < scans:
+        for _ in range(rng.randint(*basket)):
+            barcode = rng.choice(barcodes)
+            if rng.random() < unknown:
+                barcode = '9' + barcode[1:] + 'X'
+            stream.append((offset, barcode))
+            if rng.random() < 0.1:
+                stream.append((offset + 1.0 / rate, barcode))
+            offset += 1.0 / rate
+        offset += pause
+    return stream[:scans]
+
+def read_scan_stream(path):
+    # Format rekaman: satu scan per baris, "<detik sejak mulai>\t<barcode>"
+    with open(path, encoding='utf-8') as f:
+        return [(float(offset), barcode) for offset, barcode in
+                (line.rstrip('\n').split('\t', 1) for line in f if line.strip())]
+
+def write_scan_stream(path, stream):
+    with open(path, 'w', encoding='utf-8') as f:
+        for offset, barcode in stream:
+            f.write(f"{offset:.4f}\t{barcode}\n")
+
+def bench_rapid_scan(products, scans, scan_log=None, speed=0.0):
+    # Replay rekaman scan ke ScanBurstQueue: thread pengirim meniru event keyboard-wedge,
+    # loop utama meniru drain_scans di loop Tk. speed=0 memutar secepatnya (kapasitas),
+    # speed=1 memutar sesuai waktu rekaman (latensi pada laju nyata).
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        barcodes = seed_products(conn, products)
+        conn.execute('UPDATE products SET quantity = 1000000')
+        conn.commit()
+        conn.close()
+        
+        if scan_log and os.path.exists(scan_log):
+            stream = read_scan_stream(scan_log)
+        else:
+            stream = synthetic_scan_stream(barcodes, scans)
+            if scan_log:
+                write_scan_stream(scan_log, stream)
+        
+        core = POSCore(db_path)
+        cart = core.new_cart()
+        burst = ScanBurstQueue(core.catalog, cart)
+        events = queue.Queue()
+        
+        def feed():
+            start = time.perf_counter()
+            for offset, barcode in stream:
+                if speed:
+                    delay = start + offset / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                events.put((barcode, time.perf_counter()))
+            events.put(None)
+        
+        latencies = []
+        max_depth = 0
+        done = False
+        feeder = threading.Thread(target=feed)
+        start = time.perf_counter()
+        feeder.start()
+        while not done:
+            item = events.get()
+            while True:
+                if item is None:
+                    done = True
+                    break
+                burst.put(item[0], 1, item[1])
+                try:
+                    item = events.get_nowait()
+                except queue.Empty:
+                    break
+            max_depth = max(max_depth, len(burst))
+            while burst:
+                for result in burst.drain():
+                    latencies.append(time.perf_counter() - result.queued_at)
+                # Keranjang dibayar tiap 50 baris agar ukurannya tetap wajar
+                if len(cart) >= 50:
+                    cart.clear()
+        elapsed = time.perf_counter() - start
+        feeder.join()
+        core.close()
+        
+        result = summarize('rapid_scan_latency', latencies)
+        result.update({
+            'scans': len(stream),
+            'added': burst.added,
+            'rejected': burst.rejected,
+            'max_queue_depth': max_depth,
+            'speed': speed,
+            'items_per_minute': burst.added / elapsed * 60,
+        })
+        print(f"Rapid scan: {len(stream)} scan ({'secepatnya' if not speed else f'x{speed:g} waktu rekaman'}), "
+              f"{result['items_per_minute']:,.0f} item/menit, ditolak {burst.rejected}, "
+              f"antrian maks {max_depth}")
+        print(f"{result['name']:<22} p50 {result['p50_us']:8.2f} us   p99 {result['p99_us']:8.2f} us")
+        return result
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def bench_scanner(source, fps=30, products=1000):
+    # Putar file video/folder gambar lewat pipeline scanner dan ukur throughput decode
+    # serta latensi dari frame ditangkap sampai item masuk keranjang (lookup index).
+    # pos (dan tkinter) baru di-import di sini agar benchmark lain jalan di mesin tanpa Tk.
+    from pos import BarcodeScanner
+    conn = sqlite3.connect(':memory:')
+    seed_products(conn, products)
+    index = BarcodeIndex()
+    index.load(conn)
+    cart = []
+    
+    def on_barcode(barcode, captured_at):
+        line = scan_index(index, barcode)
+        if line is not None:
+            cart.append(line)
+        scanner.record_latency(captured_at)
+    
+    scanner = BarcodeScanner(source, on_barcode=on_barcode, fps=fps)
+    scanner.start()
+    scanner.wait()
+    stats = scanner.stats()
+    stats['cart_lines'] = len(cart)
+    conn.close()
+    for key, value in stats.items():
+        print(f"{key:<22} {value}")
+    return stats
+
+def scan_cart_list(rows, product, qty=1):
+    # Jalur lama: cari baris lewat iterasi semua item lalu jumlahkan ulang semua total
+    for row in rows:
+        if row[0] == product.id:
+            row[4] += qty
+            row[5] = row[3] * row[4]
+            break
+    else:
+        rows.append([product.id, product.barcode, product.name, product.selling_price, qty,
+                     product.selling_price * qty])
+    return sum(row[5] for row in rows)
+
+def scan_cart_model(cart, product, qty=1):
+    cart.add(product, qty)
+    return cart.subtotal
+
+def bench_cart(lines, scans):
+    # Keranjang grosir: isi sampai `lines` baris lalu scan ulang produk yang sudah ada (merge)
+    conn = sqlite3.connect(':memory:')
+    seed_products(conn, lines)
+    index = BarcodeIndex()
+    index.load(conn)
+    conn.close()
+    products = list(index.by_id.values())
+    stream = products + random.choices(products, k=scans)
+    
+    results = []
+    for name, scan, cart in (('cart_scan_list', scan_cart_list, []),
+                             ('cart_scan_model', scan_cart_model, Cart(0.11))):
+        samples = []
+        for product in stream:
+            t0 = time.perf_counter()
+            scan(cart, product)
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize(name, samples))
+    
+    print(f"Keranjang: {lines} baris, {len(stream)} scan")
+    for r in results:
+        print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+    return results
+
+def bench_checkout(products, transactions, batch=100, lines=5):
+    # Throughput checkout lewat pos_core tanpa UI: keranjang acak, checkout_many per batch
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        conn.execute('UPDATE products SET quantity = 1000000')
+        conn.commit()
+        conn.close()
+        
+        core = POSCore(db_path)
+        ids = list(core.catalog.index.by_id)
+        carts = []
+        for _ in range(transactions):
+            cart = core.new_cart()
+            for product_id in random.sample(ids, lines):
+                cart.add(core.catalog.index.get_by_id(product_id), random.randint(1, 3))
+            carts.append(cart)
+        
+        samples = []
+        failed = 0
+        start = time.perf_counter()
+        for i in range(0, transactions, batch):
+            t0 = time.perf_counter()
+            results = core.checkout_many(carts[i:i + batch])
+            samples.append(time.perf_counter() - t0)
+            failed += sum(1 for r in results if isinstance(r, Exception))
+        elapsed = time.perf_counter() - start
+        core.close()
+        
+        result = summarize('checkout_many_batch', samples)
+        result['transactions'] = transactions
+        result['failed'] = failed
+        result['tx_per_sec'] = transactions / elapsed
+        print(f"Checkout: {transactions} transaksi x {lines} item, batch {batch}: "
+              f"{result['tx_per_sec']:.0f} transaksi/detik, gagal {failed}")
+        print(f"{result['name']:<22} p50 {result['p50_us']:8.2f} us   p99 {result['p99_us']:8.2f} us")
+        return result
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def seed_inventory_log(conn, log_rows, products):
+    # Log pergerakan sintetis tersebar merata sepanjang 2025
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO inventory_log (product_id, action, previous_qty, change_qty, new_qty, date)
+        SELECT abs(random()) % ? + 1, 'Keluar', 10, -1, 9,
+               datetime('2025-01-01', '+' || (i * 31536000 / ?) || ' seconds')
+        FROM n
+    ''', (log_rows, products, log_rows))
+    conn.commit()
+
+def bench_export(log_rows, formats=('csv', 'parquet'), products=20000):
+    # Export laporan Pergerakan Inventaris (satu baris per hari x produk) langsung dari cursor;
+    # puncak alokasi Python harus tetap datar walau jumlah baris jutaan
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'export.db')
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        seed_inventory_log(conn, log_rows, products)
+        results = []
+        for fmt in formats:
+            path = os.path.join(workdir, f"laporan.{fmt}")
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                rows = export_report(conn, "Pergerakan Inventaris", path, fmt, '2025-01-01', '2025-12-31')
+            except RuntimeError as e:
+                tracemalloc.stop()
+                print(f"export_{fmt}: dilewati ({e})")
+                continue
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            result = {
+                'name': f'export_{fmt}',
+                'rows': rows,
+                'rows_per_sec': rows / elapsed,
+                'peak_python_mb': peak / 1e6,
+                'file_mb': os.path.getsize(path) / 1e6,
+            }
+            results.append(result)
+            print(f"{result['name']:<16} {rows} baris, {result['rows_per_sec']:,.0f} baris/detik, "
+                  f"puncak memori {result['peak_python_mb']:.1f} MB, file {result['file_mb']:.1f} MB")
+        conn.close()
+        return results
+
+def write_catalog_csv(path, barcodes):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write('barcode,name,capital_price,selling_price,quantity,low_stock_threshold\n')
+        for barcode in barcodes:
+            capital = round(random.uniform(1000, 50000), 2)
+            f.write(f"{barcode},Produk {barcode},{capital},{round(capital * 1.2, 2)},{random.randint(0, 500)},3\n")
+
+def bench_import(rows, baseline_rows=5000):
+    # Import katalog supplier: insert-only ke database kosong, lalu upsert-heavy (90% barcode lama)
+    with tempfile.TemporaryDirectory() as workdir:
+        core = POSCore(os.path.join(workdir, 'import.db'))
+        insert_path = os.path.join(workdir, 'insert.csv')
+        write_catalog_csv(insert_path, (f"{i:013d}" for i in range(rows)))
+        upsert_path = os.path.join(workdir, 'upsert.csv')
+        existing = random.sample(range(rows), rows * 9 // 10)
+        write_catalog_csv(upsert_path, [f"{i:013d}" for i in existing] +
+                          [f"{i:013d}" for i in range(rows, rows + rows // 10)])
+        
+        results = []
+        for name, path in (('import_insert_only', insert_path), ('import_upsert_heavy', upsert_path)):
+            start = time.perf_counter()
+            result = core.import_products(path)
+            elapsed = time.perf_counter() - start
+            results.append({'name': name, 'rows': result.rows, 'inserted': result.inserted,
+                            'updated': result.updated, 'errors': len(result.errors),
+                            'rows_per_sec': result.rows / elapsed})
+        
+        # Jalur lama: satu INSERT dan satu commit per produk seperti form add_product
+        conn = core.db.writer
+        start = time.perf_counter()
+        for i in range(baseline_rows):
+            conn.execute('''
+                INSERT INTO products (barcode, name, capital_price, selling_price, quantity, low_stock_threshold, date_added)
+                VALUES (?, ?, 1000, 1200, 10, 3, datetime('now'))
+            ''', (f"B{i:012d}", f"Produk B{i}"))
+            conn.commit()
+        results.append({'name': 'insert_commit_per_row', 'rows': baseline_rows,
+                        'rows_per_sec': baseline_rows / (time.perf_counter() - start)})
+        core.close()
+    
+    for r in results:
+        print(f"{r['name']:<22} {r['rows']:>8} baris  {r['rows_per_sec']:>10,.0f} baris/detik")
+    return results
+
+def bench_low_stock(products, queries=200):
+    # Startup lama (scan penuh + semua baris stok rendah) vs hitungan dari index di memori
+    # dan halaman pertama daftar stok rendah lewat index parsial
+    conn = sqlite3.connect(':memory:')
+    seed_products(conn, products)
+    conn.execute('UPDATE products SET quantity = quantity % 10, low_stock_threshold = 3')
+    conn.commit()
+    index = BarcodeIndex()
+    index.load(conn)
+    
+    results = []
+    for name, run in (
+        ('low_stock_full_scan', lambda: conn.execute(
+            'SELECT name, quantity, low_stock_threshold FROM products NOT INDEXED '
+            'WHERE quantity <= low_stock_threshold').fetchall()),
+        ('low_stock_count', lambda: len(index.low_stock)),
+        ('low_stock_first_page', lambda: product_page(conn, LOW_STOCK_WHERE)),
+    ):
+        samples = []
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize(name, samples))
+    
+    print(f"Stok rendah: {products} produk, {len(index.low_stock)} di bawah batas")
+    for r in results:
+        print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+    conn.close()
+    return results
+
+def bench_history(log_rows, queries, products=5000):
+    # Query riwayat pergerakan stok per produk di atas jutaan baris inventory_log
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        start = time.perf_counter()
+        seed_inventory_log(conn, log_rows, products)
+        seed_time = time.perf_counter() - start
+        
+        results = []
+        for name, date_from, date_to in (('history_all', None, None),
+                                         ('history_month', '2025-06-01', '2025-06-30')):
+            samples = []
+            for product_id in random.choices(range(1, products + 1), k=queries):
+                t0 = time.perf_counter()
+                movement_history(conn, product_id, date_from, date_to)
+                samples.append(time.perf_counter() - t0)
+            results.append(summarize(name, samples))
+        conn.close()
+        
+        print(f"Riwayat stok: {log_rows} baris log ({seed_time:.1f} s seed), {queries} query")
+        for r in results:
+            print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+        return results
+    finally:
+        os.remove(db_path)
+
+def bench_journal(products, transactions, lock_seconds=2.0, lines=3):
+    # Checkout langsung vs lewat jurnal till saat koneksi lain menahan kunci tulis database
+    results = []
+    for mode in ('direct', 'journal'):
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, 'inventory.db')
+            conn = sqlite3.connect(db_path)
+            seed_products(conn, products)
+            conn.execute('UPDATE products SET quantity = 1000000')
+            conn.commit()
+            conn.close()
+            
+            journal_path = os.path.join(workdir, 'till_journal.jsonl') if mode == 'journal' else None
+            core = POSCore(db_path, {'busy_timeout': '1000'}, receipt_dir=os.path.join(workdir, 'struk'),
+                           journal_path=journal_path)
+            records = list(core.catalog.index.by_id.values())
+            
+            # Kunci tulis ditahan di tengah run, meniru till lain/laporan berat yang menahan database
+            locker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            def hold_lock():
+                time.sleep(0.2)
+                locker.execute('BEGIN IMMEDIATE')
+                time.sleep(lock_seconds)
+                locker.execute('COMMIT')
+            holder = threading.Thread(target=hold_lock)
+            holder.start()
+            
+            samples = []
+            failed = 0
+            start = time.perf_counter()
+            for _ in range(transactions):
+                cart = core.new_cart()
+                for record in random.sample(records, lines):
+                    cart.add(record, 1)
+                t0 = time.perf_counter()
+                try:
+                    core.checkout(cart)
+                except sqlite3.OperationalError:
+                    failed += 1
+                samples.append(time.perf_counter() - t0)
+            elapsed = time.perf_counter() - start
+            holder.join()
+            
+            drain = 0.0
+            drained = True
+            if core.journal is not None:
+                t0 = time.perf_counter()
+                core.journal.wake()
+                drained = wait_for_journal(core)
+                drain = time.perf_counter() - t0
+            core.close()
+            locker.close()
+            
+            # Replay ulang seluruh jurnal (seperti crash sebelum offset tersimpan) tidak boleh menggandakan
+            if journal_path:
+                with open(journal_path + '.applied', 'w') as f:
+                    f.write('0')
+                core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'), journal_path=journal_path)
+                drained = wait_for_journal(core) and drained
+                core.close()
+            conn = sqlite3.connect(db_path)
+            committed, unique = conn.execute('SELECT COUNT(*), COUNT(DISTINCT transaction_id) FROM sales').fetchone()
+            mismatched = stock_mismatches(conn)
+            conn.close()
+            
+            result = summarize(f'checkout_{mode}_under_lock', samples)
+            result.update({'max_us': max(samples) * 1e6, 'transactions': transactions,
+                           'failed': failed, 'committed': committed,
+                           'checkouts_per_sec': transactions / elapsed, 'drain_seconds': drain,
+                           'duplicates': committed - unique, 'stock_mismatches': mismatched})
+            label = f"Jurnal till ({mode})"
+            check(result, committed == unique, f"{label}: {committed - unique} transaksi ganda")
+            check(result, unique == transactions - failed,
+                  f"{label}: {unique} transaksi tersimpan, seharusnya {transactions - failed}")
+            check(result, mismatched == 0, f"{label}: stok {mismatched} produk tidak cocok dengan item terjual")
+            if journal_path:
+                check(result, failed == 0, f"{label}: {failed} checkout gagal walau lewat jurnal")
+                check(result, drained, f"{label}: jurnal tidak habis diterapkan ({core.journal.last_error})")
+            results.append(result)
+    
+    print(f"Jurnal till: {transactions} checkout, kunci database ditahan {lock_seconds:g} detik")
+    for r in results:
+        print(f"{r['name']:<30} p50 {r['p50_us']:8.2f} us   max {r['max_us'] / 1000:8.1f} ms   "
+              f"gagal {r['failed']}, tersimpan {r['committed']}, ganda {r['duplicates']}, "
+              f"drain {r['drain_seconds'] * 1000:.0f} ms")
+    results.append(check_journal_crash(products, transactions, lines))
+    return results
+
+def wait_for_journal(core, timeout=60):
+    # Tunggu replay jurnal habis; False jika masih tertunda (mis. replay terus gagal) setelah batas waktu
+    deadline = time.perf_counter() + timeout
+    while core.journal.backlog:
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def stock_mismatches(conn, initial=1000000):
+    # Produk yang stoknya tidak sama dengan stok awal dikurangi semua item yang terjual
+    return conn.execute('''
+        SELECT COUNT(*) FROM products p
+        LEFT JOIN (SELECT product_id, SUM(quantity) AS sold FROM sale_items GROUP BY product_id) s
+               ON s.product_id = p.id
+        WHERE p.quantity != ? - COALESCE(s.sold, 0)
+    ''', (initial,)).fetchone()[0]
+
+class SimulatedCrash(Exception):
+    pass
+
+def check_journal_crash(products, transactions, lines=3, batch_size=50):
+    # Crash di tengah replay: beberapa batch sudah commit, batch berikutnya baru separuh commit dan offset
+    # belum tersimpan. Setelah dibuka ulang, replay (dua kali) harus menghasilkan tepat satu salinan tiap transaksi.
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'inventory.db')
+        journal_path = os.path.join(workdir, 'till_journal.jsonl')
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        conn.execute('UPDATE products SET quantity = 1000000')
+        conn.commit()
+        conn.close()
+        
+        core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'))
+        records = list(core.catalog.index.by_id.values())
+        journal = TillJournal(journal_path)
+        for _ in range(transactions):
+            cart = core.new_cart()
+            for record in random.sample(records, lines):
+                cart.add(record, 1)
+            journal.append(core.build_sale(cart))
+        
+        batch_size = max(1, min(batch_size, transactions // 4))
+        crash_batch = max(1, transactions // batch_size // 2)
+        batches = 0
+        def apply_then_crash(sales):
+            nonlocal batches
+            batches += 1
+            if batches <= crash_batch:
+                return core.apply_journaled(sales)
+            core.apply_journaled(sales[:len(sales) // 2])
+            raise SimulatedCrash()
+        crashed = False
+        try:
+            JournalReplayer(journal, apply_then_crash, batch_size=batch_size).replay()
+        except SimulatedCrash:
+            crashed = True
+        journal.close()
+        core.close()
+        
+        # Buka ulang seperti aplikasi setelah crash, lalu ulangi replay penuh dari offset 0
+        drained = True
+        index_mismatches = 0
+        for restart in range(2):
+            if restart:
+                with open(journal_path + '.applied', 'w') as f:
+                    f.write('0')
+            core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'), journal_path=journal_path)
+            drained = wait_for_journal(core) and drained
+            with core.db.reader() as conn:
+                index_mismatches += sum(1 for product_id, qty in conn.execute('SELECT id, quantity FROM products')
+                                        if core.catalog.index.by_id[product_id].quantity != qty)
+            core.close()
+        
+        conn = sqlite3.connect(db_path)
+        committed, unique = conn.execute('SELECT COUNT(*), COUNT(DISTINCT transaction_id) FROM sales').fetchone()
+        mismatched = stock_mismatches(conn)
+        conn.close()
+    
+    result = {'name': 'journal_crash_replay', 'transactions': transactions, 'crashed': crashed,
+              'committed': committed, 'duplicates': committed - unique, 'stock_mismatches': mismatched,
+              'index_mismatches': index_mismatches}
+    print(f"Replay setelah crash: {committed} transaksi tersimpan dari {transactions}, "
+          f"ganda {committed - unique}, selisih stok {mismatched}, selisih index {index_mismatches}")
+    check(result, crashed, "Replay setelah crash: crash simulasi tidak terjadi")
+    check(result, drained, "Replay setelah crash: jurnal tidak habis diterapkan")
+    check(result, committed == unique, f"Replay setelah crash: {committed - unique} transaksi ganda")
+    check(result, unique == transactions, f"Replay setelah crash: {unique} transaksi tersimpan, seharusnya {transactions}")
+    check(result, mismatched == 0, f"Replay setelah crash: stok {mismatched} produk tidak cocok dengan item terjual")
+    check(result, index_mismatches == 0, f"Replay setelah crash: stok index {index_mismatches} produk berbeda dari database")
+    return result
+
+def bench_metrics(products, transactions, queries, lines=3):
+    # Overhead instrumentasi: operasi yang sama tanpa dan dengan pos_metrics
+    results = []
+    for mode in ('off', 'on'):
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, 'inventory.db')
+            conn = sqlite3.connect(db_path)
+            seed_products(conn, products)
+            conn.execute('UPDATE products SET quantity = 1000000')
+            conn.commit()
+            conn.close()
+            
+            metrics = Metrics(slow_log=os.path.join(workdir, 'slow.log')) if mode == 'on' else None
+            t0 = time.perf_counter()
+            core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'), metrics=metrics)
+            startup = time.perf_counter() - t0
+            records = list(core.catalog.index.by_id.values())
+            
+            rng = random.Random(42)
+            # Potongan nama produk acak seperti yang diketik kasir
+            words = [record.name[-5:-1] for record in rng.sample(records, queries)]
+            search = []
+            for word in words:
+                t0 = time.perf_counter()
+                core.catalog.search(word)
+                search.append(time.perf_counter() - t0)
+            page = []
+            for _ in range(queries):
+                t0 = time.perf_counter()
+                core.catalog.page()
+                page.append(time.perf_counter() - t0)
+            checkout = []
+            for _ in range(transactions):
+                cart = core.new_cart()
+                for record in rng.sample(records, lines):
+                    cart.add(record, 1)
+                t0 = time.perf_counter()
+                core.checkout(cart)
+                checkout.append(time.perf_counter() - t0)
+            export = 0.0
+            if metrics is not None:
+                t0 = time.perf_counter()
+                metrics.prometheus()
+                export = time.perf_counter() - t0
+            core.close()
+            
+            for name, samples in (('search', search), ('page', page), ('checkout', checkout)):
+                result = summarize(f'{name}_metrics_{mode}', samples)
+                result.update({'startup_ms': startup * 1000, 'export_ms': export * 1000,
+                               'statements': len(metrics.statements) if metrics else 0})
+                results.append(result)
+    
+    print(f"Overhead instrumentasi: {products} produk, {queries} query, {transactions} checkout")
+    half = len(results) // 2
+    for off, on in zip(results[:half], results[half:]):
+        overhead = (on['p50_us'] - off['p50_us']) / off['p50_us'] * 100
+        print(f"{on['name'][:-3]:<22} p50 {off['p50_us']:9.2f} -> {on['p50_us']:9.2f} us   ({overhead:+.1f}%)")
+    print(f"Startup {results[0]['startup_ms']:.0f} -> {results[-1]['startup_ms']:.0f} ms, "
+          f"render Prometheus {results[-1]['export_ms']:.2f} ms untuk {results[-1]['statements']} statement")
+    return results
+
+def make_sales(count, lines=5):
+    ids = TransactionIdGenerator(0)
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    sales = []
+    for _ in range(count):
+        items = [CartLine(i, f"{i:013d}", f"Produk {i}", 1500.0, 2) for i in range(lines)]
+        subtotal = sum(line.total for line in items)
+        sales.append(Sale(ids.next(), now, items, subtotal, subtotal * 0.11, subtotal * 1.11, 'Tunai'))
+    return sales
+
+def bench_receipts(count):
+    # Biaya struk di thread UI: satu file per transaksi (jalur lama) vs antrean writer + jurnal harian
+    sales = make_sales(count)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        files_dir = os.path.join(workdir, 'files')
+        samples = []
+        for sale in sales:
+            t0 = time.perf_counter()
+            os.makedirs(files_dir, exist_ok=True)
+            with open(os.path.join(files_dir, f"struk_{sale.transaction_id}.txt"), 'w', encoding='utf-8') as f:
+                f.write(render_receipt(sale, 0.11))
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize('receipt_file_per_sale', samples))
+        
+        journal = ReceiptJournal(os.path.join(workdir, 'journal'))
+        writer = ReceiptWriter(journal, 0.11)
+        samples = []
+        start = time.perf_counter()
+        for sale in sales:
+            t0 = time.perf_counter()
+            writer.submit(sale)
+            samples.append(time.perf_counter() - t0)
+        writer.close()
+        drained = time.perf_counter() - start
+        results.append(summarize('receipt_queue_submit', samples))
+        
+        samples = []
+        for sale in random.sample(sales, min(1000, count)):
+            t0 = time.perf_counter()
+            journal.read(sale.transaction_id)
+            samples.append(time.perf_counter() - t0)
+        results.append(summarize('receipt_reprint', samples))
+        files = len(os.listdir(journal.directory))
+    
+    print(f"Struk: {count} transaksi, jurnal selesai ditulis dalam {drained * 1000:.0f} ms ({files} file)")
+    for r in results:
+        print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+    return results
+
+def bench_commit(sizes=(1, 50, 500), runs=50, products=2000):
+    # Latensi commit checkout (BEGIN IMMEDIATE + executemany + pengurangan stok set-based)
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, max(products, max(sizes)))
+        conn.execute('UPDATE products SET quantity = 1000000')
+        conn.commit()
+        conn.close()
+        
+        core = POSCore(db_path)
+        records = list(core.catalog.index.by_id.values())
+        results = []
+        for size in sizes:
+            samples = []
+            for _ in range(runs):
+                cart = core.new_cart()
+                for record in random.sample(records, size):
+                    cart.add(record, random.randint(1, 3))
+                t0 = time.perf_counter()
+                core.checkout(cart)
+                samples.append(time.perf_counter() - t0)
+            results.append(summarize(f'checkout_{size}_lines', samples))
+        core.close()
+        
+        print(f"Commit checkout: {runs} transaksi per ukuran keranjang")
+        for r in results:
+            print(f"{r['name']:<22} p50 {r['p50_us']:8.2f} us   p99 {r['p99_us']:8.2f} us")
+        return results
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def generate_ids(terminal_id, threads, count):
+    # Satu proses = satu till; beberapa thread berbagi generator yang sama
+    generator = TransactionIdGenerator(terminal_id)
+    batches = [None] * threads
+    
+    def run(slot):
+        ids = [generator.next() for _ in range(count)]
+        # Urutan per thread harus naik tegas
+        if any(a >= b for a, b in zip(ids, ids[1:])):
+            raise AssertionError(f"ID tidak monoton di terminal {terminal_id}")
+        batches[slot] = ids
+    
+    workers = [threading.Thread(target=run, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [transaction_id for ids in batches for transaction_id in ids]
+
+def bench_txid(processes=4, threads=2, count=250000):
+    # Stress test generator ID transaksi dari beberapa proses dan thread sekaligus
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        batches = pool.starmap(generate_ids, [(terminal_id, threads, count) for terminal_id in range(processes)])
+    elapsed = time.perf_counter() - start
+    total = sum(len(ids) for ids in batches)
+    unique = len({transaction_id for ids in batches for transaction_id in ids})
+    result = {
+        'name': 'transaction_ids',
+        'processes': processes,
+        'threads': threads,
+        'total': total,
+        'collisions': total - unique,
+        'ids_per_minute': total / elapsed * 60,
+    }
+    print(f"ID transaksi: {total} dari {processes} proses x {threads} thread, "
+          f"{result['ids_per_minute'] / 1e6:.1f} juta/menit, tabrakan {result['collisions']}")
+    check(result, total == processes * threads * count,
+          f"ID transaksi: {total} dibuat, seharusnya {processes * threads * count}")
+    check(result, result['collisions'] == 0, f"ID transaksi: {result['collisions']} ID kembar antar thread/proses")
+    return result
+
+STARTUP_SCRIPT = '''
+import json, time, resource
+start = time.perf_counter()
+import pos
+imported = time.perf_counter()
+result = {"import_ms": (imported - start) * 1000,
+          "heavy_modules_loaded": [m for m in ("cv2", "pyzbar", "PIL", "ttkthemes") if m in __import__("sys").modules]}
+try:
+    root = pos.create_root()
+    app = pos.ProductInventorySystem(root)
+    def first_frame():
+        root.update_idletasks()
+        result["first_frame_ms"] = (time.perf_counter() - start) * 1000
+        root.destroy()
+    root.after(0, first_frame)
+    root.mainloop()
+except Exception as e:
+    result["first_frame_error"] = str(e)
+result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+'''
+
+def bench_startup(runs=5):
+    # Setiap run memakai proses baru agar cache import tidak ikut terukur
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=workdir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    result = {'name': 'startup', 'runs': runs}
+    for key in ('import_ms', 'first_frame_ms', 'max_rss_mb'):
+        values = [sample[key] for sample in samples if key in sample]
+        if values:
+            result[key] = percentile(values, 50)
+    result['heavy_modules_loaded'] = samples[-1]['heavy_modules_loaded']
+    if 'first_frame_error' in samples[-1]:
+        result['first_frame_error'] = samples[-1]['first_frame_error']
+    print(json.dumps(result, indent=2))
+    return result
+
+SEED_PAYMENT_METHODS = ("Tunai", "Kartu Kredit", "Kartu Debit", "QRIS")
+
+def seed_database(db_path, products, sales, items_per_sale=5, days=365, seed=42, tax_rate=0.11):
+    # Isi database POS sintetis (katalog + riwayat penjualan) yang deterministik untuk seed yang sama
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = MEMORY')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    migrate(conn)
+    
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for i in range(products):
+        name = 'Produk ' + ''.join(rng.choices(string.ascii_uppercase, k=8))
+        capital = round(rng.uniform(1000, 50000), 2)
+        rows.append((f"{i:013d}", name, capital, round(capital * 1.2, 2), rng.randint(0, 500),
+                     rng.choice((3, 5, 10)), now))
+    conn.executemany('''
+        INSERT INTO products (barcode, name, capital_price, selling_price, quantity, low_stock_threshold, date_added)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    
+    # Item penjualan dibuat di SQL: produk dan jumlah diturunkan dari nomor baris agar tetap deterministik
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO sale_items (transaction_id, product_id, product_name, barcode, quantity, unit_price, total_price,
+                                unit_cost)
+        SELECT printf('SEED%010d', n.i / ?), p.id, p.name, p.barcode,
+               1 + (n.i * 40503 + ?) % 3, p.selling_price, p.selling_price * (1 + (n.i * 40503 + ?) % 3),
+               p.capital_price
+        FROM n JOIN products p ON p.id = (n.i * 2654435761 + ?) % ? + 1
+    ''', (sales * items_per_sale - 1, items_per_sale, seed, seed, seed, products))
+    conn.commit()
+    
+    first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+    conn.execute('''
+        INSERT INTO sales (transaction_id, date, total_items, subtotal, tax, total_amount, payment_method)
+        SELECT transaction_id,
+               datetime(?, '+' || (CAST(substr(transaction_id, 5) AS INTEGER) * ? / ?) || ' seconds'),
+               SUM(quantity), ROUND(SUM(total_price), 2), ROUND(SUM(total_price) * ?, 2),
+               ROUND(SUM(total_price) * (1 + ?), 2),
+               json_extract(?, '$[' || (CAST(substr(transaction_id, 5) AS INTEGER) % ?) || ']')
+        FROM sale_items
+        GROUP BY transaction_id
+        ORDER BY transaction_id
+    ''', (first_day.strftime('%Y-%m-%d 00:00:00'), days * 86400, sales, tax_rate, tax_rate,
+          json.dumps(SEED_PAYMENT_METHODS), len(SEED_PAYMENT_METHODS)))
+    conn.commit()
+    rebuild_daily_rollup(conn)
+    create_product_fts(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    
+    result = {'name': 'seed', 'db': db_path, 'seconds': time.perf_counter() - start}
+    result.update(database_counts(db_path))
+    print(f"Seed {db_path}: {result['products']} produk, {result['sales']} transaksi, "
+          f"{result['sale_items']} item dalam {result['seconds']:.1f} detik")
+    return result
+
+def database_counts(db_path):
+    # Data seed tidak pernah dihapus, jadi MAX(id) cukup dan jauh lebih murah dari COUNT(*)
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = {table: conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+                  for table in ('products', 'sales', 'sale_items', 'inventory_log')}
+        counts['size_mb'] = os.path.getsize(db_path) / 1e6
+        return counts
+    finally:
+        conn.close()
+
+def print_results(results):
+    for r in results:
+        print(f"{r['name']:<36} p50 {r['p50_us']:11.2f} us   p99 {r['p99_us']:11.2f} us")
+
+def bench_suite(db_path, lookups=20000, queries=500, checkouts=200, runs=3, report_days=30,
+                pages=50, lines=5, seed=42):
+    # Ukur jalur panas POS pada database hasil seed; dijalankan pada salinan agar database asli tidak berubah
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        work_db = os.path.join(workdir, 'inventory.db')
+        shutil.copyfile(db_path, work_db)
+        
+        t0 = time.perf_counter()
+        core = POSCore(work_db, receipt_dir=os.path.join(workdir, 'struk'))
+        results = [summarize('core_open', [time.perf_counter() - t0])]
+        try:
+            records = list(core.catalog.index.by_id.values())
+            
+            # Scan barcode, sebagian kecil barcode tidak dikenal
+            stream = [record.barcode for record in rng.choices(records, k=lookups)]
+            stream[::10] = ['X' + barcode for barcode in stream[::10]]
+            samples = []
+            for barcode in stream:
+                t0 = time.perf_counter()
+                core.catalog.lookup(barcode)
+                samples.append(time.perf_counter() - t0)
+            results.append(summarize('barcode_lookup', samples))
+            
+            terms = [record.name[len('Produk '):][:rng.randint(3, 6)] for record in rng.choices(records, k=queries)]
+            samples = []
+            for term in terms:
+                t0 = time.perf_counter()
+                core.catalog.search(term)
+                samples.append(time.perf_counter() - t0)
+            results.append(summarize('product_search', samples))
+            
+            # display_products: halaman pertama lalu gulir dengan keyset (name, id)
+            for name, where in (('display_products', ''), ('display_products_low_stock', LOW_STOCK_WHERE)):
+                first = []
+                for _ in range(runs):
+                    t0 = time.perf_counter()
+                    rows = core.catalog.page(where)
+                    first.append(time.perf_counter() - t0)
+                results.append(summarize(f'{name}_first_page', first))
+                scroll = []
+                for _ in range(pages):
+                    if not rows:
+                        break
+                    t0 = time.perf_counter()
+                    rows = core.catalog.page(where, after=(rows[-1][2], rows[-1][0]))
+                    scroll.append(time.perf_counter() - t0)
+                if scroll:
+                    results.append(summarize(f'{name}_next_page', scroll))
+            
+            date_to = datetime.date.today().strftime('%Y-%m-%d')
+            date_from = (datetime.date.today() - datetime.timedelta(days=report_days - 1)).strftime('%Y-%m-%d')
+            for report_type in REPORTS:
+                samples = []
+                for _ in range(runs):
+                    t0 = time.perf_counter()
+                    row_count = sum(len(chunk) for chunk in core.report_chunks(report_type, date_from, date_to))
+                    samples.append(time.perf_counter() - t0)
+                result = summarize('report_' + report_type.lower().replace(' ', '_'), samples)
+                result['rows'] = row_count
+                results.append(result)
+            
+            # Commit process_payment; hanya produk dengan stok cukup agar yang terukur jalur sukses
+            stocked = [record for record in records if record.quantity >= 50]
+            samples = []
+            failed = 0
+            for _ in range(checkouts):
+                cart = core.new_cart()
+                for record in rng.sample(stocked, lines):
+                    cart.add(record, rng.randint(1, 3))
+                t0 = time.perf_counter()
+                try:
+                    core.checkout(cart)
+                except StockError:
+                    failed += 1
+                samples.append(time.perf_counter() - t0)
+            result = summarize('process_payment_commit', samples)
+            result['failed'] = failed
+            results.append(result)
+        finally:
+            core.close()
+    
+    print(f"Suite pada {db_path} (laporan {report_days} hari terakhir)")
+    print_results(results)
+    return results
+
+def time_reports(core, ranges, runs):
+    # Median waktu laporan per (jenis, rentang); 'Penjualan Produk (tanpa ringkasan)' memaksa query ke sales/sale_items
+    results = {}
+    for label, report_type, rollup in (('Penjualan Harian', 'Penjualan Harian', True),
+                                       ('Penjualan Produk', 'Penjualan Produk', True),
+                                       ('Penjualan Produk (tanpa ringkasan)', 'Penjualan Produk', False)):
+        if not rollup:
+            core.db.writer.execute("UPDATE rollup_state SET covered_from = '9999-12-31'")
+            core.db.writer.commit()
+        for range_name, date_from, date_to in ranges:
+            samples = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                for _ in core.report_chunks(report_type, date_from, date_to):
+                    pass
+                samples.append(time.perf_counter() - t0)
+            results[(label, range_name)] = percentile(samples, 50)
+        if not rollup:
+            core.db.writer.execute("UPDATE rollup_state SET covered_from = '0000-00-00'")
+            core.db.writer.commit()
+    return results
+
+def bench_archive(products, sales, items_per_sale=5, years=5, runs=3, seed=42):
+    # Waktu laporan sebelum dan sesudah transaksi tahun yang sudah tutup dipindah ke arsip per tahun
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'inventory.db')
+        seed_database(db_path, products, sales, items_per_sale, days=years * 365, seed=seed)
+        today = datetime.date.today()
+        ranges = [('30 hari', (today - datetime.timedelta(days=29)).isoformat(), today.isoformat()),
+                  ('tahun lalu', f'{today.year - 1}-01-01', f'{today.year - 1}-12-31'),
+                  (f'{today.year - 3}', f'{today.year - 3}-01-01', f'{today.year - 3}-12-31'),
+                  (f'{years} tahun', (today - datetime.timedelta(days=years * 365)).isoformat(), today.isoformat())]
+        
+        core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'))
+        size_before = os.path.getsize(db_path)
+        before = time_reports(core, ranges, runs)
+        t0 = time.perf_counter()
+        archived = core.archive_sales(vacuum=True)
+        archive_seconds = time.perf_counter() - t0
+        core.close()
+        
+        core = POSCore(db_path, receipt_dir=os.path.join(workdir, 'struk'))
+        after = time_reports(core, ranges, runs)
+        hot_sales = core.db.writer.execute('SELECT COUNT(*) FROM sales').fetchone()[0]
+        core.close()
+        size_after = os.path.getsize(db_path)
+        archive_size = sum(os.path.getsize(os.path.join(workdir, path)) for _, path, _, _ in archived)
+    
+    results = [{'name': 'archive_job', 'years_archived': [year for year, _, _, _ in archived],
+                'sales_archived': sum(count for _, _, count, _ in archived), 'hot_sales': hot_sales,
+                'seconds': archive_seconds, 'hot_db_mb_before': size_before / 1e6,
+                'hot_db_mb_after': size_after / 1e6, 'archive_mb': archive_size / 1e6}]
+    print(f"Arsip {years} tahun ({sales} transaksi): {results[0]['sales_archived']} transaksi dari "
+          f"{results[0]['years_archived']} dipindah dalam {archive_seconds:.1f} detik")
+    print(f"Database utama {size_before / 1e6:.0f} MB -> {size_after / 1e6:.0f} MB, arsip {archive_size / 1e6:.0f} MB")
+    for (label, range_name), seconds in before.items():
+        results.append({'name': f'report_archive {label} {range_name}', 'before_ms': seconds * 1000,
+                        'after_ms': after[(label, range_name)] * 1000})
+        print(f"{label:<36} {range_name:<10} {seconds * 1000:9.1f} ms -> {after[(label, range_name)] * 1000:9.1f} ms")
+    return results
+
+def till_session(url, transactions, lines, seed):
+    # Satu proses = satu till remote: scan dari salinan index, cari produk, lalu checkout ke server
+    from pos_remote import RemoteCore
+    rng = random.Random(seed)
+    core = RemoteCore(url)
+    barcodes = list(core.catalog.index.by_barcode)
+    checkout_samples = []
+    search_samples = []
+    failed = 0
+    for _ in range(transactions):
+        cart = core.new_cart()
+        for barcode in rng.sample(barcodes, lines):
+            cart.add(core.catalog.lookup(barcode), rng.randint(1, 3))
+        t0 = time.perf_counter()
+        core.catalog.search(rng.choice(barcodes)[-5:])
+        search_samples.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        try:
+            core.checkout(cart)
+        except (StockError, ValueError):
+            failed += 1
+        checkout_samples.append(time.perf_counter() - t0)
+    core.close()
+    return checkout_samples, search_samples, failed
+
+def wait_for_server(url, process, timeout=30):
+    from pos_remote import RemoteClient
+    client = RemoteClient(url)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("pos_server berhenti saat start")
+        try:
+            return client.request('GET', '/health')
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("pos_server tidak merespons")
+
+def bench_server(products, tills, transactions, lines=5, batch_ms=0):
+    # Load test pos_server: banyak till disimulasikan sebagai proses terpisah di satu mesin
+    from pos_remote import RemoteClient
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'inventory.db')
+        conn = sqlite3.connect(db_path)
+        seed_products(conn, products)
+        conn.execute('UPDATE products SET quantity = 1000000')
+        conn.commit()
+        initial = dict(conn.execute('SELECT id, quantity FROM products'))
+        conn.close()
+        
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, os.path.join(repo, 'pos_server.py'), '--db', db_path,
+                                   '--port', str(port), '--batch-ms', str(batch_ms)],
+                                  cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(url, server)
+            start = time.perf_counter()
+            with multiprocessing.Pool(tills) as pool:
+                sessions = pool.starmap(till_session, [(url, transactions, lines, seed) for seed in range(tills)])
+            elapsed = time.perf_counter() - start
+            health = RemoteClient(url).request('GET', '/health')
+        finally:
+            server.terminate()
+            server.wait()
+        
+        # Stok akhir harus sama dengan stok awal dikurangi semua item yang terjual
+        conn = sqlite3.connect(db_path)
+        sold = dict(conn.execute('SELECT product_id, SUM(quantity) FROM sale_items GROUP BY product_id'))
+        mismatched = sum(1 for product_id, qty in conn.execute('SELECT id, quantity FROM products')
+                         if qty != initial[product_id] - sold.get(product_id, 0))
+        committed = conn.execute('SELECT COUNT(*) FROM sales').fetchone()[0]
+        conn.close()
+    
+    checkout_samples = [sample for session in sessions for sample in session[0]]
+    search_samples = [sample for session in sessions for sample in session[1]]
+    results = [summarize('remote_checkout', checkout_samples), summarize('remote_search', search_samples)]
+    results[0].update({
+        'tills': tills,
+        'transactions': tills * transactions,
+        'committed': committed,
+        'failed': sum(session[2] for session in sessions),
+        'tx_per_sec': committed / elapsed,
+        'avg_batch': health['batched_sales'] / health['batches'] if health['batches'] else 0.0,
+        'stock_mismatches': mismatched,
+    })
+    r = results[0]
+    print(f"Server: {tills} till x {transactions} transaksi, {r['tx_per_sec']:.0f} transaksi/detik, "
+          f"rata-rata batch {r['avg_batch']:.1f}, gagal {r['failed']}, selisih stok {mismatched}")
+    print_results(results)
+    return results
+
+def run_metadata(args):
+    # Identitas run agar hasil JSON antar versi bisa dibandingkan
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'args': vars(args),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark POS")
+    parser.add_argument('bench', nargs='?', choices=['scan', 'search', 'cart', 'commit', 'checkout', 'txid', 'history', 'receipts', 'export', 'import', 'lowstock', 'scanner', 'rapidscan', 'server', 'journal', 'metrics', 'archive', 'startup', 'seed', 'suite', 'all'], default='all')
+    parser.add_argument('--products', type=int, help="jumlah produk (default 60000, seed/suite 100000)")
+    parser.add_argument('--scans', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--import-rows', type=int, default=100000)
+    parser.add_argument('--log-rows', type=int, default=2000000)
+    parser.add_argument('--cart-lines', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=100, help="jumlah keranjang per checkout_many")
+    parser.add_argument('--processes', type=int, default=4, help="jumlah proses untuk stress test ID transaksi")
+    parser.add_argument('--source', help="file video atau folder gambar untuk benchmark scanner")
+    parser.add_argument('--fps', type=float, default=30, help="laju pemutaran sumber scanner (0 = secepatnya)")
+    parser.add_argument('--scan-log', help="rekaman scan (detik<TAB>barcode) untuk replay; dibuat jika belum ada")
+    parser.add_argument('--speed', type=float, default=0, help="laju replay rekaman scan (0 = secepatnya, 1 = waktu nyata)")
+    parser.add_argument('--tills', type=int, default=8, help="jumlah till simulasi untuk load test server")
+    parser.add_argument('--db', default='inventory_bench.db', help="database hasil seed untuk seed/suite")
+    parser.add_argument('--sales', type=int, default=2000000, help="jumlah transaksi riwayat yang di-seed")
+    parser.add_argument('--items-per-sale', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365, help="rentang hari riwayat penjualan")
+    parser.add_argument('--years', type=int, default=5, help="tahun riwayat penjualan untuk benchmark arsip")
+    parser.add_argument('--report-days', type=int, default=30, help="rentang tanggal laporan pada suite")
+    parser.add_argument('--checkouts', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="timpa database seed yang sudah ada")
+    parser.add_argument('--json', help="simpan hasil sebagai JSON ke file ini ('-' untuk stdout)")
+    args = parser.parse_args()
+    
+    results = []
+    def record(result):
+        if isinstance(result, list):
+            results.extend(result)
+        elif result is not None:
+            results.append(result)
+    
+    products = args.products or (100000 if args.bench in ('seed', 'suite') else 60000)
+    if args.bench in ('seed', 'suite'):
+        if os.path.exists(args.db) and (args.bench == 'seed' or args.force):
+            if not args.force:
+                sys.exit(f"{args.db} sudah ada; pakai --force untuk menimpa")
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+        if not os.path.exists(args.db):
+            record(seed_database(args.db, products, args.sales, args.items_per_sale, args.days, args.seed))
+        if args.bench == 'suite':
+            record(database_counts(args.db) | {'name': 'database'})
+            record(bench_suite(args.db, args.scans, args.queries, args.checkouts,
+                               report_days=args.report_days, seed=args.seed))
+    if args.bench in ('scan', 'all'):
+        record(bench_scan(products, args.scans))
+    if args.bench in ('search', 'all'):
+        record(bench_search(products, args.queries))
+    if args.bench in ('cart', 'all'):
+        record(bench_cart(args.cart_lines, args.scans))
+    if args.bench in ('commit', 'all'):
+        record(bench_commit())
+    if args.bench in ('checkout', 'all'):
+        record(bench_checkout(products, args.transactions, args.batch))
+    if args.bench in ('history', 'all'):
+        record(bench_history(args.log_rows, args.queries))
+    if args.bench in ('receipts', 'all'):
+        record(bench_receipts(args.transactions))
+    if args.bench in ('export', 'all'):
+        record(bench_export(args.log_rows))
+    if args.bench in ('import', 'all'):
+        record(bench_import(args.import_rows))
+    if args.bench in ('lowstock', 'all'):
+        record(bench_low_stock(products))
+    if args.bench in ('rapidscan', 'all'):
+        record(bench_rapid_scan(products, args.scans, args.scan_log, args.speed))
+    if args.bench in ('server', 'all'):
+        record(bench_server(products, args.tills, args.transactions // args.tills))
+    if args.bench in ('journal', 'all'):
+        record(bench_journal(products, args.transactions))
+    if args.bench in ('metrics', 'all'):
+        record(bench_metrics(products, args.transactions, args.queries))
+    if args.bench == 'archive':
+        record(bench_archive(products, args.sales, args.items_per_sale, args.years, seed=args.seed))
+    if args.bench in ('txid', 'all'):
+        record(bench_txid(args.processes))
+    if args.bench in ('startup', 'all'):
+        record(bench_startup())
+    if args.bench == 'scanner' or (args.bench == 'all' and args.source):
+        record(bench_scanner(args.source, args.fps))
+    
+    if args.json:
+        report = json.dumps({'meta': run_metadata(args), 'results': results}, indent=2, default=str)
+        if args.json == '-':
+            print(report)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            print(f"Hasil JSON disimpan ke {args.json}")
+    
+    failures = [failure for result in results for failure in result.get('failures', [])]
+    if failures:
+        sys.exit(f"{len(failures)} pemeriksaan gagal: " + '; '.join(failures))
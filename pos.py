@@ -1,23 +1,454 @@
 import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import datetime
 import random
 import string
-from PIL import Image, ImageTk
-from ttkthemes import ThemedTk
-import cv2
-from pyzbar.pyzbar import decode
 import threading
 import time
 import os
 import logging
 import configparser
+import queue
+import contextlib
+import argparse
+import concurrent.futures
+import collections
+import importlib
+import importlib.util
+
+from pos_core import (
+    DATABASE_DEFAULTS, EXPORT_FORMATS, LOW_STOCK_WHERE, PRODUCT_PAGE_SIZE, REPORTS, ExportCancelled, POSCore,
+    ProductRecord, ScanBurstQueue, StockError,
+    migrate, rebuild_daily_rollup,
+)
+from pos_metrics import METRICS_DEFAULTS, LoopLagMonitor, metrics_from_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+DEFAULT_THEME = "arc"  # Anda bisa mengganti theme sesuai preferensi
+
+# Dependensi berat (cv2, pyzbar, ttkthemes) baru di-import saat pertama dipakai
+_optional_modules = {}
+
+def optional_import(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"Optional module {name} not available: {e}")
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+def module_available(name):
+    # Cek ketersediaan modul tanpa meng-import-nya
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def scanner_available():
+    return module_available('cv2') and module_available('pyzbar')
+
+def apply_theme(root, theme=DEFAULT_THEME):
+    ttkthemes = optional_import('ttkthemes')
+    if ttkthemes is not None:
+        ttkthemes.ThemedStyle(root).set_theme(theme)
+
+def create_root():
+    # Window tampil dulu, theme diterapkan setelah frame pertama
+    root = tk.Tk()
+    root.after_idle(apply_theme, root)
+    return root
+
+DB_WORKER_POLL_MS = 15
+
+class DatabaseWorker:
+    # Jalankan pekerjaan database di thread terpisah; hasil dikirim balik ke loop Tk lewat root.after.
+    # Penulisan lewat satu thread agar koneksi penulis tidak dipakai bersamaan.
+    def __init__(self, root, readers=2, on_busy=None, metrics=None):
+        self.root = root
+        self.on_busy = on_busy
+        self.metrics = metrics
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix='db-read')
+        self.write_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='db-write')
+        self.results = queue.Queue()
+        self.pending = 0
+        self.latest = {}
+        self.polling = False
+        self.was_busy = False
+
+    @property
+    def busy(self):
+        return self.pending > 0
+
+    def submit(self, fn, *args, on_done=None, on_error=None, write=False, key=None):
+        # Pekerjaan dengan key yang sama menggantikan pekerjaan sebelumnya (mis. pencarian basi)
+        if key is not None:
+            previous = self.latest.get(key)
+            if previous is not None:
+                previous.cancel()
+        executor = self.write_executor if write else self.read_executor
+        future = executor.submit(fn, *args)
+        if key is not None:
+            self.latest[key] = future
+        self.pending += 1
+        self._notify_busy()
+        future.add_done_callback(lambda f: self.results.put((f, on_done, on_error, key)))
+        if not self.polling:
+            self.polling = True
+            self.root.after(DB_WORKER_POLL_MS, self._poll)
+        return future
+
+    def _poll(self):
+        while True:
+            try:
+                future, on_done, on_error, key = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            stale = key is not None and self.latest.get(key) is not future
+            if key is not None and not stale:
+                del self.latest[key]
+            if future.cancelled() or stale:
+                continue
+            error = future.exception()
+            if error is not None:
+                # Tetap dicatat walau handler hanya menampilkan messagebox
+                logging.error(f"Database worker error: {type(error).__name__}: {error}")
+                if self.metrics is not None:
+                    self.metrics.count_error('db_worker', error)
+                if on_error is not None:
+                    on_error(error)
+            elif on_done is not None:
+                on_done(future.result())
+        self._notify_busy()
+        if self.pending > 0:
+            self.root.after(DB_WORKER_POLL_MS, self._poll)
+        else:
+            self.polling = False
+
+    def _notify_busy(self):
+        if self.on_busy is not None and self.busy != self.was_busy:
+            self.was_busy = self.busy
+            self.on_busy(self.busy)
+
+    def shutdown(self):
+        self.read_executor.shutdown(wait=False, cancel_futures=True)
+        self.write_executor.shutdown(wait=True)
+
+POS_DEFAULTS = {
+    'rapid_scan': '0',  # Scan beruntun tanpa dialog per item; hanya input angka yang dianggap barcode
+    # Jurnal cadangan (fsync) hanya saat database terkunci/server tidak terjangkau; kosong = nonaktif
+    'journal': 'till_journal.jsonl',
+}
+JOURNAL_POLL_MS = 1000
+
+SCANNER_DEFAULTS = {
+    'source': '0',
+    'roi': '0.6',
+    'scale': '0.5',
+    'debounce': '1.5',
+    'queue_size': '2',
+}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+class FrameQueue:
+    # Antrian frame terbatas; frame terlama dibuang agar decoder selalu memproses frame terbaru
+    def __init__(self, maxsize=2):
+        self.frames = collections.deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        with self.condition:
+            while not self.frames and not self.closed:
+                if not self.condition.wait(timeout):
+                    return None
+            return self.frames.popleft() if self.frames else None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class BarcodeScanner:
+    # Pipeline scan kamera: thread capture -> FrameQueue -> thread decode -> on_barcode.
+    # Sumber bisa indeks kamera, file video, atau folder berisi urutan gambar;
+    # fps mengatur laju pemutaran sumber file agar meniru kamera sungguhan.
+    def __init__(self, source=0, on_barcode=None, roi=0.6, scale=0.5, debounce=1.5, queue_size=2, fps=None):
+        self.source = source
+        self.fps = fps
+        self.on_barcode = on_barcode
+        self.roi = roi
+        self.scale = scale
+        self.debounce = debounce
+        self.frames = FrameQueue(queue_size)
+        self.running = threading.Event()
+        self.threads = []
+        self.last_seen = {}
+        self.frames_captured = 0
+        self.frames_decoded = 0
+        self.scans = 0
+        self.decode_time = 0.0
+        self.started = None
+        self.latencies = collections.deque(maxlen=1000)
+
+    def start(self):
+        self.cv2 = optional_import('cv2')
+        pyzbar = optional_import('pyzbar.pyzbar')
+        if self.cv2 is None or pyzbar is None:
+            raise RuntimeError("Scanner kamera membutuhkan opencv-python dan pyzbar")
+        self.decode = pyzbar.decode
+        self.running.set()
+        self.started = time.perf_counter()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name='scanner-capture', daemon=True),
+            threading.Thread(target=self._decode_loop, name='scanner-decode', daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.frames.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+
+    def wait(self, timeout=None):
+        # Tunggu sampai sumber file/gambar habis diproses
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _frames_from_source(self):
+        if isinstance(self.source, str) and os.path.isdir(self.source):
+            for name in sorted(os.listdir(self.source)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    frame = self.cv2.imread(os.path.join(self.source, name))
+                    if frame is not None:
+                        yield frame
+            return
+        capture = self.cv2.VideoCapture(self.source)
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield frame
+        finally:
+            capture.release()
+
+    def _capture_loop(self):
+        interval = 1.0 / self.fps if self.fps else 0.0
+        next_frame = time.perf_counter()
+        try:
+            for frame in self._frames_from_source():
+                if not self.running.is_set():
+                    break
+                if interval:
+                    next_frame += interval
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.frames_captured += 1
+                self.frames.put((frame, time.perf_counter()))
+        except Exception as e:
+            logging.error(f"Scanner capture error: {e}")
+        finally:
+            self.frames.close()
+
+    def prepare(self, frame):
+        # Grayscale, potong area tengah (ROI), lalu perkecil sebelum decode
+        gray = self.cv2.cvtColor(frame, self.cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape[:2]
+        if self.roi < 1:
+            dy = int(height * (1 - self.roi) / 2)
+            dx = int(width * (1 - self.roi) / 2)
+            gray = gray[dy:height - dy, dx:width - dx]
+        if self.scale < 1:
+            gray = self.cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=self.cv2.INTER_AREA)
+        return gray
+
+    def _decode_loop(self):
+        while True:
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                if self.frames.closed:
+                    break
+                continue
+            frame, captured_at = item
+            start = time.perf_counter()
+            try:
+                results = self.decode(self.prepare(frame))
+            except Exception as e:
+                logging.error(f"Scanner decode error: {e}")
+                continue
+            self.decode_time += time.perf_counter() - start
+            self.frames_decoded += 1
+            for result in results:
+                barcode = result.data.decode('utf-8', errors='replace')
+                if self.is_duplicate(barcode, captured_at):
+                    continue
+                self.scans += 1
+                if self.on_barcode is not None:
+                    self.on_barcode(barcode, captured_at)
+        self.running.clear()
+
+    def is_duplicate(self, barcode, seen_at):
+        # Debounce: barcode yang sama dalam jendela waktu dianggap satu kali scan
+        last = self.last_seen.get(barcode)
+        self.last_seen[barcode] = seen_at
+        return last is not None and seen_at - last < self.debounce
+
+    def record_latency(self, captured_at):
+        self.latencies.append(time.perf_counter() - captured_at)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        latencies = sorted(self.latencies)
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))] * 1000 if latencies else None
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.frames.dropped,
+            'scans': self.scans,
+            'decode_fps': self.frames_decoded / self.decode_time if self.decode_time else 0.0,
+            'pipeline_fps': self.frames_decoded / elapsed if elapsed else 0.0,
+            'scan_to_cart_p50_ms': pct(50),
+            'scan_to_cart_p99_ms': pct(99),
+        }
+
+PRODUCT_WINDOW_PAGES = 3
+
+class ProductListView:
+    # Daftar produk tervirtualisasi: hanya beberapa halaman di sekitar posisi scroll yang ada di Treeview
+    def __init__(self, tree, scrollbar, worker, catalog, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.worker = worker
+        self.catalog = catalog
+        self.on_error = on_error
+        self.where = ''
+        self.more_before = False
+        self.more_after = False
+        self.loading = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def clear(self):
+        # Hapus semua baris dalam satu panggilan Tk
+        self.tree.delete(*self.tree.get_children())
+
+    def show(self, where=''):
+        self.where = where
+        self.loading = False
+        self.more_before = False
+        self.more_after = False
+        self.load('after', None, reset=True)
+
+    def fill(self, rows):
+        # Hasil pencarian sudah dibatasi, jadi ditampilkan sekaligus tanpa paging
+        self.loading = False
+        self.more_before = False
+        self.more_after = False
+        self.clear()
+        for row in rows:
+            self.insert_row(row, 'end')
+
+    def insert_row(self, row, index):
+        low_stock = row[5] <= row[6]
+        status = "Stok Rendah" if low_stock else "Normal"
+        values = list(row[:7]) + [status] + list(row[7:])
+        
+        # Tambahkan tag untuk stok rendah
+        tags = ('low_stock',) if low_stock else ()
+        if not self.tree.exists(str(row[0])):
+            self.tree.insert('', index, iid=str(row[0]), values=values, tags=tags)
+
+    def row_key(self, item):
+        return (self.tree.set(item, 'name'), int(item))
+
+    def load(self, direction, key, reset=False):
+        if self.loading:
+            return
+        self.loading = True
+        where = self.where
+        
+        def query():
+            if direction == 'after':
+                return self.catalog.page(where, after=key)
+            return self.catalog.page(where, before=key)
+        
+        def failed(e):
+            self.loading = False
+            if self.on_error is not None:
+                self.on_error(e)
+        
+        self.worker.submit(
+            query, key='product_list',
+            on_done=lambda rows: self.add_page(direction, rows, reset),
+            on_error=failed)
+
+    def add_page(self, direction, rows, reset=False):
+        self.loading = False
+        if reset:
+            self.clear()
+        
+        # Ingat baris teratas yang terlihat agar posisi scroll tetap setelah trimming
+        anchor = self.tree.identify_row(5)
+        
+        if direction == 'after':
+            for row in rows:
+                self.insert_row(row, 'end')
+            self.more_after = len(rows) == PRODUCT_PAGE_SIZE
+        else:
+            for i, row in enumerate(rows):
+                self.insert_row(row, i)
+            self.more_before = len(rows) == PRODUCT_PAGE_SIZE
+        
+        # Batasi jumlah baris yang dimaterialisasi
+        children = self.tree.get_children()
+        excess = len(children) - PRODUCT_PAGE_SIZE * PRODUCT_WINDOW_PAGES
+        if excess > 0:
+            if direction == 'after':
+                self.tree.delete(*children[:excess])
+                self.more_before = True
+            else:
+                self.tree.delete(*children[-excess:])
+                self.more_after = True
+        
+        if anchor and self.tree.exists(anchor):
+            children = self.tree.get_children()
+            self.tree.yview_moveto(self.tree.index(anchor) / max(1, len(children)))
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        children = self.tree.get_children()
+        if not children:
+            return
+        if float(last) >= 0.95 and self.more_after:
+            self.load('after', self.row_key(children[-1]))
+        elif float(first) <= 0.05 and self.more_before:
+            self.load('before', self.row_key(children[0]))
+
+REPORT_POLL_MS = 20
+EXPORT_POLL_MS = 200
+
 class ProductInventorySystem:
     def __init__(self, root):
         self.root = root
@@ -31,20 +462,97 @@ class ProductInventorySystem:
         
         # Set default values if not present
         if 'Database' not in self.config:
-            self.config['Database'] = {'path': 'inventory.db'}
+            self.config['Database'] = {}
+        for key, value in DATABASE_DEFAULTS.items():
+            self.config['Database'].setdefault(key, value)
         if 'Tax' not in self.config:
             self.config['Tax'] = {'rate': '0.11'}
+        if 'Search' not in self.config:
+            self.config['Search'] = {'limit': '200'}
+        if 'Scanner' not in self.config:
+            self.config['Scanner'] = {}
+        for key, value in SCANNER_DEFAULTS.items():
+            self.config['Scanner'].setdefault(key, value)
+        if 'Terminal' not in self.config:
+            self.config['Terminal'] = {'id': ''}  # Isi ID unik per till jika beberapa till berbagi database
+        if 'Server' not in self.config:
+            self.config['Server'] = {'url': ''}  # Isi mis. http://192.168.1.10:8765 untuk mode remote (pos_server)
+        if 'POS' not in self.config:
+            self.config['POS'] = {}
+        for key, value in POS_DEFAULTS.items():
+            self.config['POS'].setdefault(key, value)
+        if 'Metrics' not in self.config:
+            self.config['Metrics'] = {}
+        for key, value in METRICS_DEFAULTS.items():
+            self.config['Metrics'].setdefault(key, value)
             
         self.db_path = self.config['Database']['path']
         self.tax_rate = float(self.config['Tax']['rate'])
+        self.search_limit = int(self.config['Search']['limit'])
+        terminal_id = self.config['Terminal'].get('id', '').strip()
+        self.terminal_id = int(terminal_id) if terminal_id else None
+        journal_path = self.config['POS']['journal'].strip() or None
         
         # Save configuration
         with open('config.ini', 'w') as configfile:
             self.config.write(configfile)
         
-        # Koneksi ke database SQLite
-        self.conn = sqlite3.connect(self.db_path)
-        self.create_tables()
+        # Instrumentasi (latensi SQL, query lambat, lag loop Tk) hanya aktif jika [Metrics] enabled = 1
+        try:
+            self.metrics, self.metrics_exporter = metrics_from_config(self.config['Metrics'])
+        except (ValueError, OSError) as e:
+            logging.error(f"Metrics disabled: {e}")
+            self.metrics, self.metrics_exporter = None, None
+        if self.metrics is not None:
+            self.root.report_callback_exception = self.report_callback_exception
+            LoopLagMonitor(self.root, self.metrics).start()
+        
+        # Lapisan inti: koneksi database, migrasi skema, dan index barcode di memori.
+        # Mode remote: database dipegang pos_server dan dipakai bersama beberapa till.
+        server_url = self.config['Server'].get('url', '').strip()
+        try:
+            if server_url:
+                from pos_remote import RemoteCore  # asyncio/http.client hanya dimuat di mode remote
+                self.core = RemoteCore(server_url, self.search_limit, terminal_id=self.terminal_id,
+                                       journal_path=journal_path)
+                logging.info(f"Connected to POS service at {server_url}.")
+            else:
+                self.core = POSCore(self.db_path, dict(self.config['Database']),
+                                    self.tax_rate, self.search_limit, self.terminal_id,
+                                    journal_path=journal_path, metrics=self.metrics)
+                logging.info("Tables created successfully.")
+        except sqlite3.Error as e:
+            logging.error(f"Database error: {e}")
+            messagebox.showerror("Error", f"Database error: {str(e)}")
+            raise
+        except OSError as e:
+            logging.error(f"POS service unreachable: {e}")
+            messagebox.showerror("Error", f"Gagal terhubung ke server POS {server_url}: {str(e)}")
+            raise
+        self.tax_rate = self.core.tax_rate
+        self.db = self.core.db
+        self.catalog = self.core.catalog
+        self.cart = self.core.new_cart()
+        
+        # Status bar untuk indikator proses database
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+        self.status_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.status_var, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Indikator stok rendah non-modal; klik untuk membuka daftar produk stok rendah
+        self.low_stock_label = ttk.Label(status_frame, cursor="hand2")
+        self.low_stock_label.pack(side=tk.RIGHT)
+        self.low_stock_label.bind("<Button-1>", lambda event: self.show_low_stock())
+        
+        # Jumlah transaksi di jurnal till yang belum masuk database
+        self.journal_label = ttk.Label(status_frame)
+        self.journal_label.pack(side=tk.RIGHT, padx=10)
+        if self.core.journal is not None:
+            self.root.after(JOURNAL_POLL_MS, self.poll_journal)
+        
+        # Worker database agar loop Tk tidak tertahan
+        self.db_worker = DatabaseWorker(root, self.db.read_size, on_busy=self.set_busy, metrics=self.metrics)
         
         # Buat notebook untuk tab berbeda
         self.notebook = ttk.Notebook(root)
@@ -72,74 +580,13 @@ class ProductInventorySystem:
         # Setup penutupan kamera saat window ditutup
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # Cek item inventaris yang rendah
-        self.check_low_inventory()
+        # Jumlah produk stok rendah dari index di memori (tanpa query saat startup)
+        self.refresh_low_stock_indicator()
+
+    def set_busy(self, busy):
+        self.status_var.set("Memproses..." if busy else "")
+        self.root.config(cursor="watch" if busy else "")
 
-    def create_tables(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                barcode TEXT UNIQUE,
-                name TEXT NOT NULL,
-                capital_price REAL NOT NULL,
-                selling_price REAL NOT NULL,
-                quantity INTEGER NOT NULL,
-                date_added TEXT NOT NULL,
-                last_updated TEXT,
-                low_stock_threshold INTEGER DEFAULT 3
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                action TEXT,
-                previous_qty INTEGER,
-                change_qty INTEGER,
-                new_qty INTEGER,
-                date TEXT,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT NOT NULL,
-                date TEXT NOT NULL,
-                total_items INTEGER NOT NULL,
-                subtotal REAL NOT NULL,
-                tax REAL NOT NULL,
-                total_amount REAL NOT NULL,
-                payment_method TEXT NOT NULL,
-                customer_name TEXT,
-                notes TEXT
-            )
-            ''')
-            
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sale_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT NOT NULL,
-                product_id INTEGER NOT NULL,
-                product_name TEXT NOT NULL,
-                barcode TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                unit_price REAL NOT NULL,
-                discount REAL DEFAULT 0,
-                total_price REAL NOT NULL,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-            ''')
-            
-            self.conn.commit()
-            logging.info("Tables created successfully.")
-        except sqlite3.Error as e:
-            logging.error(f"Database error: {e}")
-            messagebox.showerror("Error", f"Database error: {str(e)}")
     def setup_inventory_tab(self):
         # Variabel untuk inventaris
         self.barcode_var = tk.StringVar()
@@ -202,6 +649,8 @@ class ProductInventorySystem:
         ttk.Button(btn_frame, text="Update Produk", width=15, command=self.update_product).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Hapus Produk", width=15, command=self.delete_product).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Bersihkan Form", width=15, command=self.clear_fields).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Import Produk", width=15, command=self.import_products).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Export Produk", width=15, command=self.export_products).pack(side=tk.LEFT, padx=5)
         
         # Setup frame pencarian dan daftar produk
         self.setup_product_list_frame(right_frame)
@@ -267,6 +716,11 @@ class ProductInventorySystem:
         
         # Create tags for status highlighting
         self.product_tree.tag_configure('low_stock', background='#FFCCCC')
+        
+        # Muat produk per halaman sesuai posisi scroll
+        self.product_view = ProductListView(
+            self.product_tree, self.tree_scroll_y, self.db_worker, self.catalog,
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal menampilkan produk: {str(e)}"))
 
     def setup_pos_tab(self):
         # Variabel POS
@@ -277,7 +731,13 @@ class ProductInventorySystem:
         self.notes_var = tk.StringVar()
         self.payment_method_var = tk.StringVar()
         self.payment_method_var.set("Tunai")  # Metode pembayaran default
-        self.cart_items = []  # List untuk menyimpan item di keranjang
+        self.payment_in_progress = False
+        self.scanner = None
+        self.scan_queue = queue.Queue()
+        self.scan_burst = ScanBurstQueue(self.catalog, self.cart)
+        self.scan_drain_scheduled = False
+        self.rapid_scan_var = tk.BooleanVar(value=self.config['POS'].getboolean('rapid_scan', False))
+        self.scan_feedback_var = tk.StringVar()
         
         # Frame utama untuk POS
         pos_main_frame = ttk.Frame(self.pos_frame)
@@ -312,6 +772,12 @@ class ProductInventorySystem:
 
         ttk.Button(search_frame, text="Cari", command=self.search_pos_products).grid(row=0, column=2, padx=5, pady=5)
         ttk.Button(search_frame, text="Reset", command=self.reset_pos_search).grid(row=0, column=3, padx=5, pady=5)
+        self.scan_button = ttk.Button(search_frame, text="Scan Kamera", command=self.toggle_scanner)
+        self.scan_button.grid(row=0, column=4, padx=5, pady=5)
+        if not scanner_available():
+            self.scan_button.config(state='disabled')
+        ttk.Checkbutton(search_frame, text="Scan Cepat", variable=self.rapid_scan_var).grid(
+            row=0, column=5, padx=5, pady=5)
 
         # Treeview for search results
         self.pos_search_tree = ttk.Treeview(search_frame,
@@ -334,53 +800,45 @@ class ProductInventorySystem:
 
         self.pos_search_tree.bind("<Double-1>", self.select_pos_product)
 
+        # Umpan balik scan inline (tanpa dialog) agar input scanner tidak terputus
+        self.scan_feedback_label = ttk.Label(search_frame, textvariable=self.scan_feedback_var, anchor=tk.W)
+        self.scan_feedback_label.grid(row=2, column=0, columnspan=6, padx=5, pady=2, sticky=tk.W+tk.E)
+
     def search_pos_products(self):
         search_term = self.pos_search_var.get()
         if not search_term:
-            messagebox.showwarning("Peringatan", "Masukkan barcode atau nama produk untuk mencari.")
+            if not self.rapid_scan_var.get():
+                messagebox.showwarning("Peringatan", "Masukkan barcode atau nama produk untuk mencari.")
+            return
+        
+        if self.rapid_scan_var.get() and search_term.strip().isdigit():
+            # Mode scan cepat: input langsung dikosongkan agar barcode berikutnya tidak tercampur.
+            # Input selain angka diperlakukan sebagai nama produk dan dicari seperti biasa
+            self.pos_search_var.set('')
+            self.queue_scan(search_term)
             return
 
         # Clear previous search results
         for item in self.pos_search_tree.get_children():
             self.pos_search_tree.delete(item)
 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, barcode, name, selling_price, quantity
-                FROM products
-                WHERE barcode LIKE ? OR name LIKE ?
-                ORDER BY name
-            ''', (f'%{search_term}%', f'%{search_term}%'))
-
-            results = cursor.fetchall()
+        # Exact barcode match langsung dari index di memori
+        record = self.catalog.lookup(search_term)
+        if record is not None:
+            self.show_pos_search_results(
+                search_term, [(record.id, record.barcode, record.name, record.selling_price, record.quantity)])
+            return
+        
+        self.db_worker.submit(
+            self.catalog.search, search_term, ('id', 'barcode', 'name', 'selling_price', 'quantity'),
+            key='pos_search',
+            on_done=lambda results: self.show_pos_search_results(search_term, results),
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal mencari produk: {str(e)}"))
 
+    def show_pos_search_results(self, search_term, results):
+        try:
             if len(results) == 1 and results[0][1] == search_term:  # Exact barcode match
-                product_id, barcode, name, price, stock = results[0]
-                if stock <= 0:
-                    messagebox.showwarning("Peringatan", "Stok tidak mencukupi.")
-                    return
-
-                # Check if the product is already in the cart
-                for item in self.cart_tree.get_children():
-                    values = self.cart_tree.item(item)['values']
-                    if values[1] == barcode:  # Match by barcode
-                        new_qty = values[4] + 1
-                        if new_qty > stock:
-                            messagebox.showwarning("Peringatan", f"Stok tidak mencukupi. Stok tersedia: {stock}")
-                            return
-                        new_total = new_qty * price
-                        self.cart_tree.item(item, values=(values[0], values[1], values[2], values[3], new_qty, new_total))
-                        self.update_totals()
-                        self.pos_search_var.set('')  # Clear search field
-                        messagebox.showinfo("Sukses", f"Jumlah produk '{name}' di keranjang diperbarui.")
-                        return
-
-                # Add new product to the cart
-                self.cart_tree.insert('', 'end', values=(product_id, barcode, name, price, 1, price))
-                self.update_totals()
-                self.pos_search_var.set('')  # Clear search field
-                messagebox.showinfo("Sukses", f"Produk '{name}' berhasil ditambahkan ke keranjang.")
+                self.add_one_to_cart(results[0])
             else:
                 # Populate search results for manual selection
                 for row in results:
@@ -389,6 +847,116 @@ class ProductInventorySystem:
         except Exception as e:
             messagebox.showerror("Error", f"Gagal mencari produk: {str(e)}")
 
+    def toggle_scanner(self):
+        if self.scanner is not None:
+            self.scanner.stop()
+            logging.info(f"Scanner stopped: {self.scanner.stats()}")
+            self.scanner = None
+            self.scan_button.config(text="Scan Kamera")
+            return
+        
+        settings = self.config['Scanner']
+        source = settings['source']
+        self.scanner = BarcodeScanner(
+            int(source) if source.isdigit() else source,
+            on_barcode=lambda barcode, captured_at: self.scan_queue.put((barcode, captured_at)),
+            roi=float(settings['roi']),
+            scale=float(settings['scale']),
+            debounce=float(settings['debounce']),
+            queue_size=int(settings['queue_size']))
+        try:
+            self.scanner.start()
+        except RuntimeError as e:
+            self.scanner = None
+            messagebox.showerror("Error", str(e))
+            return
+        self.scan_button.config(text="Stop Kamera")
+        self.root.after(50, self.poll_scanner)
+
+    def poll_scanner(self):
+        # Barcode dari thread decode diproses di loop Tk lewat jalur add_to_cart
+        scanner = self.scanner
+        if scanner is None:
+            return
+        while True:
+            try:
+                barcode, captured_at = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.queue_scan(barcode, 1, captured_at)
+        if scanner.running.is_set():
+            self.root.after(50, self.poll_scanner)
+        else:
+            self.toggle_scanner()
+
+    def queue_scan(self, barcode, qty=1, queued_at=None):
+        self.scan_burst.put(barcode, qty, queued_at)
+        self.schedule_scan_drain()
+
+    def schedule_scan_drain(self):
+        if not self.scan_drain_scheduled and self.scan_burst:
+            self.scan_drain_scheduled = True
+            self.root.after_idle(self.drain_scans)
+
+    def drain_scans(self):
+        # Semua scan yang menumpuk diproses berurutan; Treeview dan total diperbarui sekali per batch
+        self.scan_drain_scheduled = False
+        if self.payment_in_progress:
+            return  # Ditahan sampai keranjang yang sedang dibayar selesai di-reset
+        results = self.scan_burst.drain()
+        added = None
+        for result in results:
+            if result.status != 'added':
+                # Index bisa tertinggal dari till lain atau server: dicek ulang di thread worker, bukan di loop Tk
+                self.recheck_scan(result)
+                continue
+            self.render_cart_line(result.line)
+            added = result
+            if self.scanner is not None and result.queued_at is not None:
+                self.scanner.record_latency(result.queued_at)
+        if added is not None:
+            self.update_totals()
+            self.notify_scan(f"{added.line.name} x{added.line.quantity} "
+                             f"({len(self.cart)} item, Rp {self.cart.total:,.2f})")
+        if self.scan_burst:
+            self.scan_drain_scheduled = True
+            self.root.after(1, self.drain_scans)
+
+    def recheck_scan(self, result):
+        # Produk baru atau stok bertambah: masuk antrian lagi agar stok dan keranjang dicek seperti scan biasa
+        def done(record):
+            if record is None:
+                self.show_unknown_scan(result.barcode)
+            elif result.status == 'no_stock' and record.quantity <= result.available:
+                self.notify_scan(f"Stok tidak mencukupi untuk {record.name}. "
+                                 f"Stok tersedia: {record.quantity}", ok=False)
+            else:
+                self.queue_scan(result.barcode, result.quantity, result.queued_at)
+        self.db_worker.submit(
+            self.catalog.fetch, result.barcode, on_done=done,
+            on_error=lambda e: self.notify_scan(f"Gagal mencari produk '{result.barcode}': {str(e)}", ok=False))
+
+    def show_unknown_scan(self, barcode):
+        self.notify_scan(f"Produk '{barcode}' tidak ditemukan", ok=False)
+        # Bisa jadi nama produk: tampilkan hasil pencarian untuk dipilih manual
+        for item in self.pos_search_tree.get_children():
+            self.pos_search_tree.delete(item)
+        self.db_worker.submit(
+            self.catalog.search, barcode, ('id', 'barcode', 'name', 'selling_price', 'quantity'),
+            key='pos_search',
+            on_done=lambda rows: self.show_pos_search_results(barcode, rows),
+            on_error=lambda e: logging.error(f"POS search error: {e}"))
+
+    def notify_scan(self, message, ok=True):
+        # Sukses cukup tampil inline; kegagalan memakai dialog hanya di luar mode scan cepat
+        self.scan_feedback_var.set(message)
+        self.scan_feedback_label.config(foreground="" if ok else "red")
+        if not ok:
+            if self.rapid_scan_var.get():
+                self.root.bell()
+            else:
+                messagebox.showwarning("Peringatan", message)
+
     def reset_pos_search(self):
         self.pos_search_var.set('')
         for item in self.pos_search_tree.get_children():
@@ -398,33 +966,36 @@ class ProductInventorySystem:
         selected_item = self.pos_search_tree.selection()
         if selected_item:
             item = self.pos_search_tree.item(selected_item[0])
-            values = item['values']
-            product_id, barcode, name, price, stock = values
-
-            if stock <= 0:
-                messagebox.showwarning("Peringatan", "Stok tidak mencukupi.")
-                return
+            self.add_one_to_cart(item['values'])
 
-            # Check if the product is already in the cart
-            for cart_item in self.cart_tree.get_children():
-                cart_values = self.cart_tree.item(cart_item)['values']
-                if cart_values[1] == barcode:  # Match by barcode
-                    new_qty = cart_values[4] + 1
-                    if new_qty > stock:
-                        messagebox.showwarning("Peringatan", f"Stok tidak mencukupi. Stok tersedia: {stock}")
-                        return
-                    new_total = new_qty * price
-                    self.cart_tree.item(cart_item, values=(cart_values[0], cart_values[1], cart_values[2], cart_values[3], new_qty, new_total))
-                    self.update_totals()
-                    self.pos_search_var.set('')  # Clear search field
-                    messagebox.showinfo("Sukses", f"Jumlah produk '{name}' di keranjang diperbarui.")
-                    return
+    def add_one_to_cart(self, row):
+        product_id, barcode, name, price, stock = row
+        product = self.catalog.index.get_by_id(product_id)
+        if product is None:
+            product = ProductRecord(product_id, str(barcode), name, None, float(price), int(stock), None)
+        stock = product.quantity
+        
+        if stock <= 0:
+            self.notify_scan("Stok tidak mencukupi.", ok=False)
+            return
 
-            # Add new product to the cart
-            self.cart_tree.insert('', 'end', values=(product_id, barcode, name, price, 1, price))
+        # Check if the product is already in the cart
+        line = self.cart.find(product.id)
+        if line is not None:
+            if line.quantity + 1 > stock:
+                self.notify_scan(f"Stok tidak mencukupi. Stok tersedia: {stock}", ok=False)
+                return
+            self.render_cart_line(self.cart.add(product, 1))
             self.update_totals()
             self.pos_search_var.set('')  # Clear search field
-            messagebox.showinfo("Sukses", f"Produk '{name}' berhasil ditambahkan ke keranjang.")
+            self.notify_scan(f"Jumlah produk '{product.name}' di keranjang diperbarui.")
+            return
+
+        # Add new product to the cart
+        self.render_cart_line(self.cart.add(product, 1))
+        self.update_totals()
+        self.pos_search_var.set('')  # Clear search field
+        self.notify_scan(f"Produk '{product.name}' berhasil ditambahkan ke keranjang.")
 
     def setup_product_entry_frame(self, parent_frame):
         entry_frame = ttk.LabelFrame(parent_frame, text="Input Produk")
@@ -522,6 +1093,13 @@ class ProductInventorySystem:
         # Tombol proses pembayaran
         process_btn = ttk.Button(payment_frame, text="Proses Pembayaran", command=self.process_payment)
         process_btn.grid(row=7, column=0, columnspan=2, padx=5, pady=15, sticky=tk.W+tk.E)
+        ttk.Button(payment_frame, text="Cetak Ulang Struk", command=self.reprint_receipt).grid(
+            row=8, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W+tk.E)
+        
+        # Status transaksi terakhir (tanpa dialog modal agar kasir bisa langsung lanjut)
+        self.transaction_status_var = tk.StringVar()
+        ttk.Label(payment_frame, textvariable=self.transaction_status_var, wraplength=250).grid(
+            row=9, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
 
     def validate_numeric_input(self, P):
         if P == "" or P == ".":
@@ -538,13 +1116,38 @@ class ProductInventorySystem:
         self.barcode_var.set(random_barcode)
 
     def on_closing(self):
-        # Tutup koneksi database
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        # Matikan kamera
+        if self.scanner is not None:
+            self.scanner.stop()
+        
+        # Hentikan worker lalu tutup koneksi database
+        if hasattr(self, 'db_worker'):
+            self.db_worker.shutdown()
+        if hasattr(self, 'core'):
+            self.core.close()
+        if getattr(self, 'metrics_exporter', None) is not None:
+            self.metrics_exporter.close()
         
         # Hancurkan window utama
         self.root.destroy()
 
+    def report_callback_exception(self, exc_type, exc_value, exc_traceback):
+        # Exception di callback Tk: catat dan hitung, lalu tampilkan seperti handler lain
+        logging.error("Unhandled UI error", exc_info=(exc_type, exc_value, exc_traceback))
+        self.metrics.count_error('tk', exc_value)
+        messagebox.showerror("Error", f"Terjadi kesalahan: {str(exc_value)}")
+
+    def read_product_form(self, product_id=None):
+        return ProductRecord(
+            product_id,
+            self.barcode_var.get(),
+            self.product_name_var.get(),
+            float(self.capital_price_var.get()),
+            float(self.selling_price_var.get()),
+            int(self.quantity_var.get()),
+            int(self.low_stock_threshold_var.get())
+        )
+
     def add_product(self):
         try:
             if not all([self.barcode_var.get(), self.product_name_var.get(), 
@@ -552,32 +1155,24 @@ class ProductInventorySystem:
                        self.quantity_var.get(), self.low_stock_threshold_var.get()]):
                 messagebox.showerror("Error", "Semua field harus diisi")
                 return
-                
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO products (
-                    barcode, name, capital_price, selling_price, 
-                    quantity, low_stock_threshold, date_added
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                self.barcode_var.get(),
-                self.product_name_var.get(),
-                float(self.capital_price_var.get()),
-                float(self.selling_price_var.get()),
-                int(self.quantity_var.get()),
-                int(self.low_stock_threshold_var.get()),
-                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
-            self.conn.commit()
-            
+            record = self.read_product_form()
+        except Exception as e:
+            messagebox.showerror("Error", f"Gagal menambahkan produk: {str(e)}")
+            return
+        
+        def done(_):
             messagebox.showinfo("Sukses", "Produk berhasil ditambahkan")
             self.clear_fields()
             self.display_products()
-            
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Barcode sudah ada dalam database")
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal menambahkan produk: {str(e)}")
+            self.refresh_low_stock_indicator()
+        
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "Barcode sudah ada dalam database")
+            else:
+                messagebox.showerror("Error", f"Gagal menambahkan produk: {str(e)}")
+        
+        self.db_worker.submit(self.catalog.add_product, record, write=True, on_done=done, on_error=failed)
 
     def update_product(self):
         if not self.edit_id:
@@ -585,30 +1180,20 @@ class ProductInventorySystem:
             return
             
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                UPDATE products 
-                SET barcode=?, name=?, capital_price=?, selling_price=?,
-                    quantity=?, low_stock_threshold=?, last_updated=?
-                WHERE id=?
-            ''', (
-                self.barcode_var.get(),
-                self.product_name_var.get(),
-                float(self.capital_price_var.get()),
-                float(self.selling_price_var.get()),
-                int(self.quantity_var.get()),
-                int(self.low_stock_threshold_var.get()),
-                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                self.edit_id
-            ))
-            self.conn.commit()
-            
+            record = self.read_product_form(self.edit_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"Gagal mengupdate produk: {str(e)}")
+            return
+        
+        def done(_):
             messagebox.showinfo("Sukses", "Produk berhasil diupdate")
             self.clear_fields()
             self.display_products()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal mengupdate produk: {str(e)}")
+            self.refresh_low_stock_indicator()
+        
+        self.db_worker.submit(
+            self.catalog.update_product, record, write=True, on_done=done,
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal mengupdate produk: {str(e)}"))
 
     def delete_product(self):
         if not self.edit_id:
@@ -616,17 +1201,15 @@ class ProductInventorySystem:
             return
             
         if messagebox.askyesno("Konfirmasi", "Yakin ingin menghapus produk ini?"):
-            try:
-                cursor = self.conn.cursor()
-                cursor.execute('DELETE FROM products WHERE id=?', (self.edit_id,))
-                self.conn.commit()
-                
+            def done(_):
                 messagebox.showinfo("Sukses", "Produk berhasil dihapus")
                 self.clear_fields()
                 self.display_products()
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Gagal menghapus produk: {str(e)}")
+                self.refresh_low_stock_indicator()
+            
+            self.db_worker.submit(
+                self.catalog.delete_product, self.edit_id, write=True, on_done=done,
+                on_error=lambda e: messagebox.showerror("Error", f"Gagal menghapus produk: {str(e)}"))
 
     def get_selected_product(self, event):
         selected_item = self.product_tree.selection()
@@ -704,8 +1287,23 @@ class ProductInventorySystem:
         self.report_summary_frame = ttk.Frame(report_frame)
         self.report_summary_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        # Tombol export
-        ttk.Button(report_frame, text="Export Laporan", command=self.export_report).pack(pady=10)
+        self.report_summary_label = ttk.Label(self.report_summary_frame, text="")
+        self.report_summary_label.pack(side=tk.LEFT, padx=5)
+        self.report_job = 0
+        
+        # Tombol export dengan progres dan pembatalan
+        export_frame = ttk.Frame(report_frame)
+        export_frame.pack(pady=10)
+        self.export_button = ttk.Button(export_frame, text="Export Laporan", command=self.export_report)
+        self.export_button.pack(side=tk.LEFT, padx=5)
+        self.export_cancel_button = ttk.Button(export_frame, text="Batal Export", state=tk.DISABLED,
+                                               command=self.cancel_export)
+        self.export_cancel_button.pack(side=tk.LEFT, padx=5)
+        self.export_status_label = ttk.Label(export_frame, text="")
+        self.export_status_label.pack(side=tk.LEFT, padx=5)
+        self.report_params = None
+        self.export_cancel = None
+        self.export_rows = 0
 
     def generate_report(self):
         report_type = self.report_type_var.get()
@@ -718,8 +1316,16 @@ class ProductInventorySystem:
         self.report_tree["columns"] = ()
         
         # Hapus data lama
-        for item in self.report_tree.get_children():
-            self.report_tree.delete(item)
+        self.report_tree.delete(*self.report_tree.get_children())
+        self.report_summary_label.config(text="")
+        
+        if REPORTS[report_type]['uses_dates']:
+            try:
+                datetime.datetime.strptime(date_from, '%Y-%m-%d')
+                datetime.datetime.strptime(date_to, '%Y-%m-%d')
+            except ValueError:
+                messagebox.showerror("Error", "Format tanggal harus YYYY-MM-DD")
+                return
             
         try:
             if report_type == "Penjualan Harian":
@@ -734,32 +1340,189 @@ class ProductInventorySystem:
         except Exception as e:
             messagebox.showerror("Error", f"Gagal generate laporan: {str(e)}")
 
-    def export_report(self):
-        if not self.report_tree["columns"]:
-            messagebox.showwarning("Peringatan", "Tidak ada data untuk diexport")
+    def generate_daily_sales_report(self, date_from, date_to):
+        self.run_report("Penjualan Harian", date_from, date_to)
+
+    def generate_product_sales_report(self, date_from, date_to):
+        self.run_report("Penjualan Produk", date_from, date_to)
+
+    def generate_inventory_movement_report(self, date_from, date_to):
+        self.run_report("Pergerakan Inventaris", date_from, date_to)
+
+    def generate_low_stock_report(self):
+        self.run_report("Stok Rendah")
+
+    def run_report(self, report_type, date_from=None, date_to=None):
+        spec = REPORTS[report_type]
+        self.report_params = (report_type, date_from, date_to)
+        
+        # Siapkan kolom laporan
+        self.report_tree["columns"] = [col for col, _, _ in spec['columns']]
+        for col, heading, width in spec['columns']:
+            self.report_tree.heading(col, text=heading)
+            self.report_tree.column(col, width=width)
+        
+        # Job baru membatalkan job laporan sebelumnya
+        self.report_job += 1
+        job = self.report_job
+        chunks = queue.Queue()
+        
+        def worker():
+            try:
+                for rows in self.core.report_chunks(report_type, date_from, date_to):
+                    if job != self.report_job:
+                        return
+                    chunks.put(rows)
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+        
+        self.report_summary_label.config(text="Memproses laporan...")
+        self.db_worker.submit(worker)
+        state = {'rows': 0, 'total': 0.0, 'start': time.perf_counter()}
+        self.root.after(REPORT_POLL_MS, self.poll_report, job, chunks, spec, state)
+
+    def poll_report(self, job, chunks, spec, state):
+        if job != self.report_job:
             return
+        
+        # Masukkan potongan hasil ke treeview tanpa menahan loop Tk terlalu lama
+        for _ in range(4):
+            try:
+                rows = chunks.get_nowait()
+            except queue.Empty:
+                break
             
-        try:
-            # Buat folder laporan jika belum ada
-            if not os.path.exists('laporan'):
-                os.makedirs('laporan')
-                
-            filename = os.path.join('laporan', f"laporan_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.txt")
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                # Tulis header
-                headers = [self.report_tree.heading(col)["text"] for col in self.report_tree["columns"]]
-                f.write("\t".join(headers) + "\n")
-                
-                # Tulis data
-                for item in self.report_tree.get_children():
-                    values = [str(value) for value in self.report_tree.item(item)["values"]]
-                    f.write("\t".join(values) + "\n")
-                    
-            messagebox.showinfo("Sukses", f"Laporan tersimpan sebagai {filename}")
+            if rows is None:
+                elapsed = (time.perf_counter() - state['start']) * 1000
+                summary = f"{state['rows']:,} baris ({elapsed:,.0f} ms)"
+                if spec['total_column'] is not None:
+                    summary += f"   Total: Rp {state['total']:,.2f}"
+                self.report_summary_label.config(text=summary)
+                return
+            if isinstance(rows, Exception):
+                self.report_summary_label.config(text="")
+                messagebox.showerror("Error", f"Gagal generate laporan: {str(rows)}")
+                return
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal export laporan: {str(e)}")
+            for row in rows:
+                self.report_tree.insert('', 'end', values=row)
+                if spec['total_column'] is not None:
+                    state['total'] += row[spec['total_column']] or 0
+            state['rows'] += len(rows)
+        
+        self.root.after(REPORT_POLL_MS, self.poll_report, job, chunks, spec, state)
+
+    def export_report(self):
+        if self.report_params is None:
+            messagebox.showwarning("Peringatan", "Tidak ada data untuk diexport")
+            return
+        if self.export_cancel is not None:
+            return
+        
+        filetypes = [("CSV", "*.csv")]
+        if module_available('pyarrow'):
+            filetypes.append(("Parquet", "*.parquet"))
+        os.makedirs('laporan', exist_ok=True)
+        filename = filedialog.asksaveasfilename(
+            parent=self.root, initialdir='laporan', defaultextension='.csv', filetypes=filetypes,
+            initialfile=f"laporan_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.csv")
+        if not filename:
+            return
+        fmt = 'parquet' if filename.lower().endswith(EXPORT_FORMATS['parquet']) else 'csv'
+        report_type, date_from, date_to = self.report_params
+        
+        # Export berjalan di worker langsung dari query, bukan dari isi report_tree
+        self.export_cancel = threading.Event()
+        self.export_rows = 0
+        self.export_cancel_button.config(state=tk.NORMAL)
+        self.export_button.config(state=tk.DISABLED)
+        
+        def progress(rows):
+            self.export_rows = rows
+        
+        def finish(message):
+            self.export_cancel = None
+            self.export_cancel_button.config(state=tk.DISABLED)
+            self.export_button.config(state=tk.NORMAL)
+            self.export_status_label.config(text=message)
+        
+        def done(rows):
+            finish(f"{rows:,} baris tersimpan di {filename}")
+        
+        def failed(e):
+            if isinstance(e, ExportCancelled):
+                finish("Export dibatalkan")
+            else:
+                finish("")
+                messagebox.showerror("Error", f"Gagal export laporan: {str(e)}")
+        
+        self.db_worker.submit(
+            self.core.export_report, report_type, filename, fmt, date_from, date_to,
+            progress, self.export_cancel, on_done=done, on_error=failed)
+        self.poll_export(self.export_cancel)
+
+    def poll_export(self, cancel):
+        if self.export_cancel is not cancel:
+            return
+        self.export_status_label.config(text=f"Export: {self.export_rows:,} baris...")
+        self.root.after(EXPORT_POLL_MS, self.poll_export, cancel)
+
+    def cancel_export(self):
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+
+    def import_products(self):
+        filename = filedialog.askopenfilename(
+            parent=self.root, title="Import Produk",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json"), ("JSON Lines", "*.jsonl")])
+        if not filename:
+            return
+        
+        def progress(rows):
+            self.import_rows = rows
+        
+        def done(result):
+            self.import_rows = None
+            self.display_products()
+            self.refresh_low_stock_indicator()
+            message = (f"{result.rows:,} baris diproses: {result.inserted:,} produk baru, "
+                       f"{result.updated:,} diperbarui, {len(result.errors):,} gagal.")
+            if result.errors:
+                message += "\n\n" + "\n".join(f"Baris {line_no}: {error}" for line_no, error in result.errors[:20])
+                if len(result.errors) > 20:
+                    message += f"\n... dan {len(result.errors) - 20:,} kesalahan lain"
+                messagebox.showwarning("Import Produk", message)
+            else:
+                messagebox.showinfo("Import Produk", message)
+        
+        def failed(e):
+            self.import_rows = None
+            messagebox.showerror("Error", f"Gagal import produk: {str(e)}")
+        
+        self.import_rows = 0
+        self.db_worker.submit(self.core.import_products, filename, progress, write=True,
+                              on_done=done, on_error=failed)
+        self.poll_import()
+
+    def poll_import(self):
+        if self.import_rows is None:
+            return
+        self.status_var.set(f"Import produk: {self.import_rows:,} baris...")
+        self.root.after(EXPORT_POLL_MS, self.poll_import)
+
+    def export_products(self):
+        os.makedirs('laporan', exist_ok=True)
+        filename = filedialog.asksaveasfilename(
+            parent=self.root, initialdir='laporan', defaultextension='.csv',
+            initialfile=f"produk_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json"), ("JSON Lines", "*.jsonl")])
+        if not filename:
+            return
+        self.db_worker.submit(
+            self.core.export_products, filename,
+            on_done=lambda rows: messagebox.showinfo("Sukses", f"{rows:,} produk tersimpan di {filename}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal export produk: {str(e)}"))
 
     def clear_fields(self):
         self.barcode_var.set('')
@@ -772,30 +1535,11 @@ class ProductInventorySystem:
         self.edit_mode = False
 
     def display_products(self):
-        # Bersihkan treeview
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
-            
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, barcode, name, capital_price, selling_price,
-                       quantity, low_stock_threshold, date_added, last_updated
-                FROM products
-                ORDER BY name
-            ''')
-            
-            for row in cursor.fetchall():
-                status = "Stok Rendah" if row[5] <= row[6] else "Normal"
-                values = list(row) + [status]
-                
-                # Tambahkan tag untuk stok rendah
-                tags = ('low_stock',) if status == "Stok Rendah" else ()
-                
-                self.product_tree.insert('', 'end', values=values, tags=tags)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal menampilkan produk: {str(e)}")
+        self.product_view.show()
+
+    def fill_product_tree(self, rows):
+        self.product_view.fill(rows)
+
     def add_to_cart(self):
         barcode = self.pos_barcode_var.get()
         if not barcode:
@@ -810,28 +1554,33 @@ class ProductInventorySystem:
             messagebox.showwarning("Peringatan", str(e))
             return
             
-        # Cek produk di database
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, name, selling_price, quantity 
-            FROM products 
-            WHERE barcode = ?
-        ''', (barcode,))
-        product = cursor.fetchone()
-        
-        if not product:
+        # Cek produk di index barcode; jika tidak ada atau stok di index kurang, index bisa tertinggal
+        # dari till lain: data terbaru dibaca dari database/server lewat worker
+        product = self.catalog.lookup(barcode)
+        line = self.cart.find(product.id) if product is not None else None
+        in_cart = line.quantity if line is not None else 0
+        if product is None or in_cart + qty > product.quantity:
+            self.db_worker.submit(
+                self.catalog.fetch, barcode,
+                on_done=lambda record: self.add_record_to_cart(record, qty),
+                on_error=lambda e: messagebox.showerror("Error", f"Gagal mencari produk: {str(e)}"))
+            return
+        self.add_record_to_cart(product, qty)
+
+    def add_record_to_cart(self, product, qty):
+        if product is None:
             messagebox.showwarning("Peringatan", "Produk tidak ditemukan")
             return
             
-        product_id, name, price, stock = product
-        
-        if qty > stock:
-            messagebox.showwarning("Peringatan", f"Stok tidak mencukupi. Stok tersedia: {stock}")
+        # Jumlah yang sudah ada di keranjang ikut dihitung karena baris digabung
+        line = self.cart.find(product.id)
+        in_cart = line.quantity if line is not None else 0
+        if in_cart + qty > product.quantity:
+            messagebox.showwarning("Peringatan", f"Stok tidak mencukupi. Stok tersedia: {product.quantity}")
             return
             
-        # Tambahkan ke keranjang
-        total = price * qty
-        self.cart_tree.insert('', 'end', values=(product_id, barcode, name, price, qty, total))
+        # Tambahkan ke keranjang (digabung jika produk sudah ada)
+        self.render_cart_line(self.cart.add(product, qty))
         
         # Update total
         self.update_totals()
@@ -840,134 +1589,81 @@ class ProductInventorySystem:
         self.pos_barcode_var.set('')
         self.pos_qty_var.set('1')
 
+    def render_cart_line(self, line):
+        # Treeview keranjang hanya tampilan dari self.cart; iid = product_id
+        iid = str(line.product_id)
+        values = (line.product_id, line.barcode, line.name, line.unit_price, line.quantity, line.total)
+        if self.cart_tree.exists(iid):
+            self.cart_tree.item(iid, values=values)
+        else:
+            self.cart_tree.insert('', 'end', iid=iid, values=values)
+
     def update_totals(self):
-        subtotal = sum(float(self.cart_tree.item(item)['values'][5]) for item in self.cart_tree.get_children())
-        tax = subtotal * self.tax_rate  # PPN 11%
-        total = subtotal + tax
+        subtotal = self.cart.subtotal
+        tax = self.cart.tax  # PPN 11%
+        total = self.cart.total
         
         self.subtotal_label.config(text=f"Rp {subtotal:,.2f}")
         self.tax_label.config(text=f"Rp {tax:,.2f}")
         self.total_label.config(text=f"Rp {total:,.2f}")
 
     def process_payment(self):
-        if not self.cart_tree.get_children():
+        if not self.cart.lines:
             messagebox.showwarning("Peringatan", "Keranjang belanja kosong")
             return
+        if self.payment_in_progress:
+            return
+        
+        def done(sale):
+            self.payment_in_progress = False
             
-        try:
-            # Hitung total
-            subtotal = sum(float(self.cart_tree.item(item)['values'][5]) for item in self.cart_tree.get_children())
-            tax = subtotal * self.tax_rate
-            total = subtotal + tax
-            
-            # Generate transaction ID
-            transaction_id = datetime.datetime.now().strftime('TRX%Y%m%d%H%M%S')
-            
-            # Simpan transaksi ke database
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO sales (
-                    transaction_id, date, total_items, subtotal, tax, 
-                    total_amount, payment_method, customer_name, notes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                transaction_id,
-                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                len(self.cart_tree.get_children()),
-                subtotal,
-                tax,
-                total,
-                self.payment_method_var.get(),
-                self.customer_name_var.get(),
-                self.notes_var.get()
-            ))
-            
-            # Simpan item transaksi dan update stok
-            for item in self.cart_tree.get_children():
-                values = self.cart_tree.item(item)['values']
-                product_id, barcode, name, price, qty, item_total = values
-                
-                cursor.execute('''
-                    INSERT INTO sale_items (
-                        transaction_id, product_id, product_name, barcode,
-                        quantity, unit_price, total_price
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    transaction_id, product_id, name, barcode,
-                    qty, price, item_total
-                ))
-                
-                cursor.execute('''
-                    UPDATE products 
-                    SET quantity = quantity - ?,
-                        last_updated = ?
-                    WHERE id = ?
-                ''', (qty, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), product_id))
-                
-            self.conn.commit()
-            
-            # Tampilkan struk
-            self.print_receipt(transaction_id)
-            
-            # Bersihkan keranjang dan reset form
-            self.clear_cart()
-            self.customer_name_var.set('')
-            self.notes_var.set('')
-            self.payment_method_var.set('Tunai')
+            # Struk ditulis ke jurnal harian oleh thread latar
+            self.core.receipts.submit(sale)
             
-            messagebox.showinfo("Sukses", "Transaksi berhasil")
+            # Bersihkan keranjang dan reset form tanpa dialog konfirmasi
+            self.reset_cart()
+            self.refresh_low_stock_indicator()
             
-        except Exception as e:
-            self.conn.rollback()
-            messagebox.showerror("Error", f"Terjadi kesalahan: {str(e)}")
+            self.transaction_status_var.set(
+                f"Transaksi {sale.transaction_id} berhasil (Rp {sale.total:,.2f}). Struk masuk jurnal.")
+            self.schedule_scan_drain()
+        
+        def failed(e):
+            self.payment_in_progress = False
+            self.schedule_scan_drain()
+            if isinstance(e, StockError):
+                # Stok berubah di till lain sejak item masuk keranjang
+                self.refresh_low_stock_indicator()
+                messagebox.showwarning("Peringatan", str(e))
+            else:
+                messagebox.showerror("Error", f"Terjadi kesalahan: {str(e)}")
+        
+        # Checkout memakai salinan keranjang agar worker tidak membaca data yang sedang diubah UI
+        self.payment_in_progress = True
+        self.db_worker.submit(
+            self.core.checkout, self.cart.copy(), self.payment_method_var.get(),
+            self.customer_name_var.get(), self.notes_var.get(),
+            write=True, on_done=done, on_error=failed)
 
-    def print_receipt(self, transaction_id):
-        try:
-            # Buat folder struk jika belum ada
-            if not os.path.exists('struk'):
-                os.makedirs('struk')
-            
-            filename = os.path.join('struk', f"struk_{transaction_id}.txt")
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("=" * 40 + "\n")
-                f.write("TOKO SAYA\n")
-                f.write("Jl. Contoh No. 123\n")
-                f.write("Telp: 021-1234567\n")
-                f.write("=" * 40 + "\n\n")
-                
-                f.write(f"No: {transaction_id}\n")
-                f.write(f"Tanggal: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Kasir: Admin\n\n")
-                
-                f.write("-" * 40 + "\n")
-                for item in self.cart_tree.get_children():
-                    values = self.cart_tree.item(item)['values']
-                    name = values[2]
-                    qty = values[4]
-                    price = values[3]
-                    total = values[5]
-                    f.write(f"{name[:20]:<20}\n")
-                    f.write(f"{qty:>3} x {price:>10,.2f} = {total:>10,.2f}\n")
-                
-                f.write("-" * 40 + "\n\n")
-                
-                subtotal = float(self.subtotal_label.cget("text").replace("Rp ", "").replace(",", ""))
-                tax = float(self.tax_label.cget("text").replace("Rp ", "").replace(",", ""))
-                total = float(self.total_label.cget("text").replace("Rp ", "").replace(",", ""))
-                
-                f.write(f"Subtotal: {subtotal:>28,.2f}\n")
-                f.write(f"PPN 11%: {tax:>28,.2f}\n")
-                f.write(f"TOTAL  : {total:>28,.2f}\n\n")
-                
-                f.write("=" * 40 + "\n")
-                f.write("Terima kasih atas kunjungan Anda\n")
-                f.write("=" * 40 + "\n")
-            
-            messagebox.showinfo("Sukses", f"Struk tersimpan sebagai {filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal menyimpan struk: {str(e)}")
+    def reprint_receipt(self):
+        transaction_id = simpledialog.askstring("Cetak Ulang Struk", "Nomor transaksi:", parent=self.root)
+        if not transaction_id:
+            return
+        
+        def done(text):
+            if text is None:
+                messagebox.showwarning("Peringatan", f"Transaksi {transaction_id} tidak ditemukan")
+                return
+            window = tk.Toplevel(self.root)
+            window.title(f"Struk {transaction_id}")
+            receipt_text = tk.Text(window, width=44, height=30, font=("Courier", 10))
+            receipt_text.insert('1.0', text)
+            receipt_text.config(state=tk.DISABLED)
+            receipt_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.db_worker.submit(
+            self.core.reprint_receipt, transaction_id.strip(), on_done=done,
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal mencetak ulang struk: {str(e)}"))
 
     def search_products(self):
         search_term = self.search_var.get()
@@ -975,98 +1671,101 @@ class ProductInventorySystem:
             self.display_products()
             return
             
-        # Bersihkan treeview
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
-            
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, barcode, name, capital_price, selling_price,
-                       quantity, low_stock_threshold, date_added, last_updated
-                FROM products
-                WHERE barcode LIKE ? OR name LIKE ?
-                ORDER BY name
-            ''', (f'%{search_term}%', f'%{search_term}%'))
-            
-            for row in cursor.fetchall():
-                status = "Stok Rendah" if row[5] <= row[6] else "Normal"
-                values = list(row) + [status]
-                
-                # Tambahkan tag untuk stok rendah
-                tags = ('low_stock',) if status == "Stok Rendah" else ()
-                
-                self.product_tree.insert('', 'end', values=values, tags=tags)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal mencari produk: {str(e)}")
+        # Pencarian baru membatalkan pencarian sebelumnya yang belum selesai
+        self.db_worker.submit(
+            self.catalog.search, search_term, key='product_list', on_done=self.fill_product_tree,
+            on_error=lambda e: messagebox.showerror("Error", f"Gagal mencari produk: {str(e)}"))
+
     def remove_from_cart(self):
         selected_item = self.cart_tree.selection()
         if not selected_item:
             messagebox.showwarning("Peringatan", "Pilih item yang akan dihapus")
             return
             
-        self.cart_tree.delete(selected_item)
+        for iid in selected_item:
+            self.cart.remove(int(iid))
+        self.cart_tree.delete(*selected_item)
         self.update_totals()
 
     def clear_cart(self):
-        if not self.cart_tree.get_children():
+        if not self.cart.lines:
             messagebox.showwarning("Peringatan", "Keranjang sudah kosong")
             return
             
         if messagebox.askyesno("Konfirmasi", "Yakin ingin mengosongkan keranjang?"):
-            for item in self.cart_tree.get_children():
-                self.cart_tree.delete(item)
-            self.update_totals()
-            
-            # Reset form pembayaran
-            self.customer_name_var.set('')
-            self.notes_var.set('')
-            self.payment_method_var.set('Tunai')
+            self.reset_cart()
+
+    def reset_cart(self):
+        self.cart.clear()
+        self.cart_tree.delete(*self.cart_tree.get_children())
+        self.update_totals()
+        
+        # Reset form pembayaran
+        self.customer_name_var.set('')
+        self.notes_var.set('')
+        self.payment_method_var.set('Tunai')
+
     def display_low_stock(self):
-        # Bersihkan treeview
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
-            
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, barcode, name, capital_price, selling_price,
-                       quantity, low_stock_threshold, date_added, last_updated
-                FROM products
-                WHERE quantity <= low_stock_threshold
-                ORDER BY name
-            ''')
-            
-            for row in cursor.fetchall():
-                status = "Stok Rendah"
-                values = list(row) + [status]
-                
-                self.product_tree.insert('', 'end', values=values, tags=('low_stock',))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal menampilkan produk stok rendah: {str(e)}")
+        self.product_view.show(LOW_STOCK_WHERE)
 
-    def check_low_inventory(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT name, quantity, low_stock_threshold 
-                FROM products 
-                WHERE quantity <= low_stock_threshold
-            ''')
-            low_stock_items = cursor.fetchall()
-            
-            if low_stock_items:
-                message = "Produk dengan stok rendah:\n\n"
-                for item in low_stock_items:
-                    message += f"- {item[0]}: {item[1]} (Batas: {item[2]})\n"
-                messagebox.showwarning("Peringatan Stok Rendah", message)
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal memeriksa stok: {str(e)}")
+    def show_low_stock(self):
+        self.notebook.select(self.inventory_frame)
+        self.display_low_stock()
+
+    def poll_journal(self):
+        journal = self.core.journal
+        backlog = journal.backlog
+        if backlog and journal.last_error is not None:
+            self.journal_label.config(text=f"Offline: {backlog:,} transaksi menunggu di jurnal", foreground="red")
+        elif backlog:
+            self.journal_label.config(text=f"Menyimpan {backlog:,} transaksi...", foreground="")
+        else:
+            self.journal_label.config(text="")
+        self.root.after(JOURNAL_POLL_MS, self.poll_journal)
+
+    def refresh_low_stock_indicator(self):
+        # Mode remote bertanya ke server: dijalankan di worker, label diperbarui saat hasil tiba
+        self.db_worker.submit(
+            self.catalog.low_stock_count, key='low_stock_count',
+            on_done=self.show_low_stock_count,
+            on_error=lambda e: logging.error(f"Low stock count error: {e}"))
+
+    def show_low_stock_count(self, count):
+        if count:
+            self.low_stock_label.config(text=f"Stok rendah: {count:,} produk", foreground="red")
+        else:
+            self.low_stock_label.config(text="Stok aman", foreground="")
 
 # Jalankan aplikasi
 if __name__ == "__main__":
-    root = ThemedTk(theme="arc")  # Anda bisa mengganti theme sesuai preferensi
-    app = ProductInventorySystem(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Sistem Inventaris & POS Produk")
+    parser.add_argument('--rebuild-rollup', action='store_true',
+                        help="hitung ulang tabel ringkasan penjualan harian lalu keluar")
+    parser.add_argument('--archive-sales', action='store_true',
+                        help="pindahkan transaksi tahun yang sudah tutup ke file arsip per tahun lalu keluar")
+    parser.add_argument('--before-year', type=int,
+                        help="arsipkan transaksi sebelum tahun ini (default: tahun berjalan - archive_keep_years)")
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM database utama setelah pengarsipan")
+    args = parser.parse_args()
+    
+    if args.archive_sales:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        settings = dict(DATABASE_DEFAULTS, **(dict(config['Database']) if 'Database' in config else {}))
+        core = POSCore(settings['path'], settings)
+        try:
+            for year, path, sales, items in core.archive_sales(args.before_year, args.vacuum):
+                print(f"{year}: {sales} transaksi, {items} item -> {path}")
+        finally:
+            core.close()
+    elif args.rebuild_rollup:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        conn = sqlite3.connect(config.get('Database', 'path', fallback=DATABASE_DEFAULTS['path']))
+        migrate(conn)
+        rebuild_daily_rollup(conn)
+        conn.close()
+    else:
+        root = create_root()
+        app = ProductInventorySystem(root)
+        root.mainloop()
@@ -0,0 +1,2230 @@
+import sqlite3
+import csv
+import json
+import importlib
+import datetime
+import os
+import threading
+import time
+import logging
+import queue
+import contextlib
+import collections
+import secrets
+
+from pos_metrics import InstrumentedConnection
+
+DATABASE_DEFAULTS = {
+    'path': 'inventory.db',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': '268435456',
+    'cache_size': '-65536',
+    'temp_store': 'MEMORY',
+    'busy_timeout': '5000',
+    'read_connections': '2',
+    'archive_dir': 'arsip',  # relatif terhadap folder database
+    'archive_keep_years': '1',  # tahun penuh sebelum tahun berjalan yang tetap di database utama
+}
+
+class ConnectionManager:
+    # Satu koneksi penulis dan pool koneksi read-only agar laporan tidak menahan transaksi
+    def __init__(self, path, settings=None, metrics=None):
+        settings = dict(DATABASE_DEFAULTS, **(settings or {}))
+        self.path = path
+        self.settings = settings
+        self.metrics = metrics  # pos_metrics.Metrics; None = tanpa instrumentasi (koneksi sqlite3 biasa)
+        self.read_size = max(1, int(settings['read_connections']))
+        self._readers = queue.Queue()
+        self._reader_count = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()  # Thread UI/worker dan replay jurnal berbagi koneksi penulis
+        self.writer = self._connect()
+
+    def _connect(self, readonly=False):
+        factory = sqlite3.Connection if self.metrics is None else InstrumentedConnection
+        if readonly:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False, factory=factory)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=factory)
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(self.settings['busy_timeout'])}")
+        if not readonly:
+            mode = cursor.execute(f"PRAGMA journal_mode = {self.settings['journal_mode']}").fetchone()[0]
+            logging.info(f"Database journal mode: {mode}")
+            cursor.execute(f"PRAGMA synchronous = {self.settings['synchronous']}")
+        cursor.execute(f"PRAGMA mmap_size = {int(self.settings['mmap_size'])}")
+        cursor.execute(f"PRAGMA cache_size = {int(self.settings['cache_size'])}")
+        cursor.execute(f"PRAGMA temp_store = {self.settings['temp_store']}")
+        return conn
+
+    @contextlib.contextmanager
+    def reader(self):
+        # Ambil koneksi baca dari pool, buat baru jika pool belum penuh
+        if self.path == ':memory:':
+            yield self.writer
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._reader_count < self.read_size
+                if create:
+                    self._reader_count += 1
+            conn = self._connect(readonly=True) if create else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def write(self, fn, *args):
+        # Jalankan fn(cursor, *args) pada koneksi penulis; commit jika berhasil, rollback jika gagal
+        if self.metrics is not None:
+            start = time.perf_counter()
+            self._write_lock.acquire()
+            self.metrics.observe_lock('writer', time.perf_counter() - start)
+        else:
+            self._write_lock.acquire()
+        try:
+            cursor = self.writer.cursor()
+            try:
+                result = fn(cursor, *args)
+                self.writer.commit()
+                return result
+            except Exception:
+                self.writer.rollback()
+                raise
+        finally:
+            self._write_lock.release()
+
+    def close(self):
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.writer.close()
+
+PRODUCT_INDEX_COLUMNS = ('id', 'barcode', 'name', 'capital_price', 'selling_price',
+                         'quantity', 'low_stock_threshold')
+
+class ProductRecord:
+    __slots__ = PRODUCT_INDEX_COLUMNS
+
+    def __init__(self, id, barcode, name, capital_price, selling_price, quantity, low_stock_threshold):
+        self.id = id
+        self.barcode = barcode
+        self.name = name
+        self.capital_price = capital_price
+        self.selling_price = selling_price
+        self.quantity = quantity
+        self.low_stock_threshold = low_stock_threshold
+
+# Format pertukaran data, dipakai server dan klien (pos_remote)
+def record_to_list(record):
+    return [getattr(record, column) for column in PRODUCT_INDEX_COLUMNS]
+
+class BarcodeIndex:
+    # Peta barcode -> produk di memori agar setiap scan tidak perlu query SQLite
+    def __init__(self):
+        self.by_barcode = {}
+        self.by_id = {}
+        self.low_stock = set()  # id produk dengan stok <= batas, dijaga setiap kali stok berubah
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def load(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {", ".join(PRODUCT_INDEX_COLUMNS)} FROM products')
+        self.by_barcode = {}
+        self.by_id = {}
+        self.low_stock = set()
+        for row in cursor:
+            self.put(ProductRecord(*row))
+        logging.info(f"Barcode index loaded: {len(self.by_id)} products.")
+
+    def get(self, barcode):
+        return self.by_barcode.get(barcode)
+
+    def get_by_id(self, product_id):
+        return self.by_id.get(product_id)
+
+    def put(self, record):
+        # Hapus barcode lama jika barcode produk diubah
+        old = self.by_id.get(record.id)
+        if old is not None and old.barcode != record.barcode:
+            self.by_barcode.pop(old.barcode, None)
+        self.by_id[record.id] = record
+        self.by_barcode[record.barcode] = record
+        self.track_stock(record)
+
+    def remove(self, product_id):
+        record = self.by_id.pop(product_id, None)
+        if record is not None:
+            self.by_barcode.pop(record.barcode, None)
+        self.low_stock.discard(product_id)
+
+    def adjust_quantity(self, product_id, delta):
+        record = self.by_id.get(product_id)
+        if record is not None:
+            record.quantity += delta
+            self.track_stock(record)
+
+    def set_quantity(self, product_id, quantity):
+        record = self.by_id.get(product_id)
+        if record is not None:
+            record.quantity = quantity
+            self.track_stock(record)
+
+    def track_stock(self, record):
+        if record.low_stock_threshold is not None and record.quantity <= record.low_stock_threshold:
+            self.low_stock.add(record.id)
+        else:
+            self.low_stock.discard(record.id)
+
+# Kondisi stok rendah; ditulis persis sama di query agar index parsial terpakai
+LOW_STOCK_WHERE = 'quantity <= low_stock_threshold'
+# Filter daftar produk yang bisa dipilih lewat nama (pos_server dan pos_remote)
+PAGE_FILTERS = {'': '', 'low_stock': LOW_STOCK_WHERE}
+
+def split_duplicate_transaction_ids(cursor):
+    # ID lama berbasis detik bisa kembar. Kode lama menulis baris sales lalu item-itemnya dalam satu
+    # transaksi, jadi item ber-ID sama (urut id) dibagi ke sales (urut id) sebanyak total_items baris
+    # dan dicocokkan dengan subtotal. Yang tidak cocok tidak digabung diam-diam: migrasi dibatalkan.
+    duplicates = cursor.execute('''
+        SELECT transaction_id FROM sales GROUP BY transaction_id HAVING COUNT(*) > 1
+    ''').fetchall()
+    ambiguous = []
+    for (transaction_id,) in duplicates:
+        sales = cursor.execute('''
+            SELECT id, total_items, subtotal FROM sales WHERE transaction_id = ? ORDER BY id
+        ''', (transaction_id,)).fetchall()
+        items = cursor.execute('''
+            SELECT id, total_price FROM sale_items WHERE transaction_id = ? ORDER BY id
+        ''', (transaction_id,)).fetchall()
+        if sum(total_items for _, total_items, _ in sales) != len(items):
+            ambiguous.append(transaction_id)
+            continue
+        groups = []
+        start = 0
+        for sale_id, total_items, subtotal in sales:
+            group = items[start:start + total_items]
+            start += total_items
+            if abs(sum(price for _, price in group) - subtotal) > 0.01:
+                break
+            groups.append((sale_id, group))
+        else:
+            # Sales pertama tetap memakai ID asli; sisanya diberi sufiks id baris beserta itemnya
+            for sale_id, group in groups[1:]:
+                new_id = f'{transaction_id}-{sale_id}'
+                cursor.execute('UPDATE sales SET transaction_id = ? WHERE id = ?', (new_id, sale_id))
+                cursor.executemany('UPDATE sale_items SET transaction_id = ? WHERE id = ?',
+                                   [(new_id, item_id) for item_id, _ in group])
+            continue
+        ambiguous.append(transaction_id)
+    if ambiguous:
+        shown = ', '.join(ambiguous[:10]) + (f" (+{len(ambiguous) - 10} lagi)" if len(ambiguous) > 10 else '')
+        raise sqlite3.IntegrityError(
+            f"Item transaksi dengan ID kembar tidak bisa dipisahkan otomatis: {shown}. "
+            f"Perbaiki sale_items transaksi tersebut secara manual lalu jalankan ulang aplikasi.")
+    if duplicates:
+        logging.info(f"Split {len(duplicates)} duplicate transaction ids.")
+
+def add_sale_item_cost(cursor, schema, date_from, date_to):
+    # Modal per unit dicatat di sale_items saat transaksi ditulis; laporan dan ringkasan harian membaca
+    # kolom ini. Item lama tidak punya catatan modal: diisi harga modal produk saat ini (perhitungan laporan
+    # sebelumnya), lalu cost ringkasan harian untuk rentang [date_from, date_to) dihitung ulang dari item.
+    columns = [row[1] for row in cursor.execute(f'PRAGMA {schema}.table_info(sale_items)')]
+    if 'unit_cost' in columns:
+        return False
+    cursor.execute(f'ALTER TABLE {schema}.sale_items ADD COLUMN unit_cost REAL NOT NULL DEFAULT 0')
+    cursor.execute(f'''
+        UPDATE {schema}.sale_items
+        SET unit_cost = COALESCE((SELECT p.capital_price FROM main.products p WHERE p.id = sale_items.product_id), 0)
+    ''')
+    # Agregat per (hari, produk) dihitung sekali; subquery berkorelasi langsung ke sales terlalu lambat
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS rollup_cost (
+            date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            cost REAL NOT NULL,
+            PRIMARY KEY (date, product_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('DELETE FROM temp.rollup_cost')
+    cursor.execute(f'''
+        INSERT INTO temp.rollup_cost (date, product_id, cost)
+        SELECT date(s.date), si.product_id, SUM(si.quantity * si.unit_cost)
+        FROM {schema}.sales s
+        JOIN {schema}.sale_items si ON si.transaction_id = s.transaction_id
+        WHERE s.date >= ? AND s.date < ?
+        GROUP BY date(s.date), si.product_id
+    ''', (date_from, date_to))
+    cursor.execute('''
+        UPDATE main.daily_product_sales
+        SET cost = COALESCE((SELECT c.cost FROM temp.rollup_cost c
+                             WHERE c.date = daily_product_sales.date
+                               AND c.product_id = daily_product_sales.product_id), cost)
+        WHERE date >= ? AND date < ?
+    ''', (date_from, date_to))
+    cursor.execute('DELETE FROM temp.rollup_cost')
+    return True
+
+def add_main_sale_item_cost(cursor):
+    # Hari sebelum batas arsip ada di file arsip, diperbarui oleh upgrade_archives
+    boundary = cursor.execute('SELECT MAX(archived_until) FROM sales_archive').fetchone()[0]
+    add_sale_item_cost(cursor, 'main', boundary or FIRST_DATE, LAST_DATE)
+
+# Migrasi skema bertahap; versi dicatat di PRAGMA user_version.
+# Langkah yang tidak bisa ditulis sebagai satu statement SQL berupa fungsi yang menerima cursor.
+MIGRATIONS = [
+    (1, "base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE,
+            name TEXT NOT NULL,
+            capital_price REAL NOT NULL,
+            selling_price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            date_added TEXT NOT NULL,
+            last_updated TEXT,
+            low_stock_threshold INTEGER DEFAULT 3
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS inventory_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            action TEXT,
+            previous_qty INTEGER,
+            change_qty INTEGER,
+            new_qty INTEGER,
+            date TEXT,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            total_items INTEGER NOT NULL,
+            subtotal REAL NOT NULL,
+            tax REAL NOT NULL,
+            total_amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            customer_name TEXT,
+            notes TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            barcode TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            discount REAL DEFAULT 0,
+            total_price REAL NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''',
+    ]),
+    (2, "reporting and lookup indexes", [
+        'CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date)',
+        'CREATE INDEX IF NOT EXISTS idx_sale_items_transaction ON sale_items(transaction_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items(product_id)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_log_product_date ON inventory_log(product_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_products_stock ON products(quantity, low_stock_threshold)',
+    ]),
+    (3, "daily product sales rollup", [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_product_sales (
+            date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            qty INTEGER NOT NULL DEFAULT 0,
+            lines INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            tax REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, product_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            covered_from TEXT
+        )
+        ''',
+        # Database lama baru lengkap mulai besok, sampai backfill dijalankan
+        '''
+        INSERT OR IGNORE INTO rollup_state (name, covered_from)
+        SELECT 'daily_product_sales',
+               CASE WHEN EXISTS (SELECT 1 FROM sales) THEN date('now', 'localtime', '+1 day')
+                    ELSE '0000-00-00' END
+        ''',
+    ]),
+    (4, "product name index for keyset pagination", [
+        'CREATE INDEX IF NOT EXISTS idx_products_name ON products(name, id)',
+    ]),
+    (5, "unique transaction ids", [
+        # Duplikat diberi sufiks id baris (sales dan sale_items) sebelum index UNIQUE dibuat
+        split_duplicate_transaction_ids,
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_transaction_id ON sales(transaction_id)',
+    ]),
+    (6, "inventory log triggers", [
+        # Setiap perubahan products.quantity dicatat oleh SQLite sendiri, dari koneksi mana pun
+        '''
+        CREATE TRIGGER IF NOT EXISTS inventory_log_insert AFTER INSERT ON products
+        WHEN new.quantity <> 0
+        BEGIN
+            INSERT INTO inventory_log (product_id, action, previous_qty, change_qty, new_qty, date)
+            VALUES (new.id, 'Produk Baru', 0, new.quantity, new.quantity, datetime('now', 'localtime'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS inventory_log_update AFTER UPDATE OF quantity ON products
+        WHEN new.quantity <> old.quantity
+        BEGIN
+            INSERT INTO inventory_log (product_id, action, previous_qty, change_qty, new_qty, date)
+            VALUES (new.id, CASE WHEN new.quantity < old.quantity THEN 'Keluar' ELSE 'Masuk' END,
+                    old.quantity, new.quantity - old.quantity, new.quantity, datetime('now', 'localtime'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS inventory_log_delete AFTER DELETE ON products
+        WHEN old.quantity <> 0
+        BEGIN
+            INSERT INTO inventory_log (product_id, action, previous_qty, change_qty, new_qty, date)
+            VALUES (old.id, 'Hapus', old.quantity, -old.quantity, 0, datetime('now', 'localtime'));
+        END
+        ''',
+        # Titik awal riwayat untuk produk yang sudah ada sebelum trigger dibuat
+        '''
+        INSERT INTO inventory_log (product_id, action, previous_qty, change_qty, new_qty, date)
+        SELECT id, 'Stok Awal', 0, quantity, quantity, datetime('now', 'localtime')
+        FROM products
+        WHERE quantity <> 0
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_log_date ON inventory_log(date)',
+    ]),
+    (7, "partial index for low stock", [
+        # Hanya produk stok rendah yang masuk index, diurutkan seperti tampilan daftar produk;
+        # index penuh (quantity, low_stock_threshold) tidak bisa dipakai untuk perbandingan antar kolom
+        f'CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products(name, id) WHERE {LOW_STOCK_WHERE}',
+        'DROP INDEX IF EXISTS idx_products_stock',
+    ]),
+    (8, "sales archive catalog", [
+        # Tahun yang sudah dipindah ke file arsip; data < archived_until tidak lagi dibaca dari database utama
+        '''
+        CREATE TABLE IF NOT EXISTS sales_archive (
+            year INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            archived_until TEXT NOT NULL,
+            sales INTEGER NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            archived_at TEXT
+        )
+        ''',
+    ]),
+    (9, "unit cost on sale items", [
+        # Laba kotor memakai modal saat transaksi, bukan harga modal produk hari ini
+        add_main_sale_item_cost,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    # Upgrade database yang sudah ada secara in-place, satu versi per transaksi
+    # BEGIN IMMEDIATE + baca ulang user_version di dalam transaksi: dua till yang start bersamaan
+    # tidak menjalankan langkah yang sama dua kali
+    cursor = conn.cursor()
+    current = cursor.execute('PRAGMA user_version').fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        start = time.perf_counter()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            current = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            logging.error(f"Migration {version} ({description}) failed.")
+            raise
+        logging.info(f"Migrated database to version {version} ({description}) "
+                     f"in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        current = version
+    upgrade_archives(conn)
+    return current
+
+# Modal dihitung dari harga modal saat transaksi ditulis, sama dengan sale_items.unit_cost.
+# Produk yang sudah dihapus (mis. sebelum transaksi jurnal di-replay) tetap masuk ringkasan dengan modal 0.
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_product_sales (date, product_id, qty, lines, revenue, cost, tax)
+    VALUES (?, ?, ?, 1, ?, ? * COALESCE((SELECT capital_price FROM products WHERE id = ?), 0), ?)
+    ON CONFLICT (date, product_id) DO UPDATE SET
+        qty = qty + excluded.qty,
+        lines = lines + excluded.lines,
+        revenue = revenue + excluded.revenue,
+        cost = cost + excluded.cost,
+        tax = tax + excluded.tax
+'''
+
+def rebuild_daily_rollup(conn):
+    # Hitung ulang ringkasan penjualan harian dari seluruh riwayat sales/sale_items
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    # Termasuk tahun yang sudah diarsip; ATTACH harus di luar transaksi
+    sources = sales_sources(conn)
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DELETE FROM daily_product_sales')
+        rows = 0
+        for schema, date_from, date_to in sources:
+            cursor.execute(f'''
+                INSERT INTO daily_product_sales (date, product_id, qty, lines, revenue, cost, tax)
+                SELECT date(s.date), si.product_id, SUM(si.quantity), COUNT(*), SUM(si.total_price),
+                       SUM(si.quantity * si.unit_cost),
+                       SUM(CASE WHEN s.subtotal > 0 THEN si.total_price * s.tax / s.subtotal ELSE 0 END)
+                FROM {schema}.sales s
+                JOIN {schema}.sale_items si ON si.transaction_id = s.transaction_id
+                WHERE s.date >= ? AND s.date < ?
+                GROUP BY date(s.date), si.product_id
+            ''', (date_from, date_to))
+            rows += cursor.rowcount
+        cursor.execute('''
+            INSERT OR REPLACE INTO rollup_state (name, covered_from)
+            VALUES ('daily_product_sales', '0000-00-00')
+        ''')
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    logging.info(f"Rebuilt daily_product_sales: {rows} rows in "
+                 f"{(time.perf_counter() - start) * 1000:.1f} ms.")
+    return rows
+
+def rollup_covers(conn, date_from):
+    row = conn.execute(
+        "SELECT covered_from FROM rollup_state WHERE name = 'daily_product_sales'").fetchone()
+    return row is not None and row[0] is not None and date_from >= row[0]
+
+# Arsip penjualan per tahun: transaksi tahun yang sudah tutup dipindah ke file SQLite terpisah
+# (sales + sale_items, skema sama) agar database utama tetap kecil. Laporan yang rentangnya
+# menyentuh arsip meng-ATTACH file tersebut dan menggabungkan hasil per sumber dengan UNION ALL.
+MAX_ATTACHED_ARCHIVES = 10  # batas ATTACH bawaan SQLite (SQLITE_MAX_ATTACHED)
+ARCHIVE_SALES_COLUMNS = ('id', 'transaction_id', 'date', 'total_items', 'subtotal', 'tax', 'total_amount',
+                         'payment_method', 'customer_name', 'notes')
+ARCHIVE_ITEM_COLUMNS = ('id', 'transaction_id', 'product_id', 'product_name', 'barcode', 'quantity',
+                        'unit_price', 'discount', 'total_price', 'unit_cost')
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.sales (
+        id INTEGER PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        total_items INTEGER NOT NULL,
+        subtotal REAL NOT NULL,
+        tax REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        customer_name TEXT,
+        notes TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.sale_items (
+        id INTEGER PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        product_name TEXT NOT NULL,
+        barcode TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        discount REAL DEFAULT 0,
+        total_price REAL NOT NULL,
+        unit_cost REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS {db}.idx_sales_date ON sales(date)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS {db}.idx_sales_transaction_id ON sales(transaction_id)',
+    'CREATE INDEX IF NOT EXISTS {db}.idx_sale_items_transaction ON sale_items(transaction_id)',
+    'CREATE INDEX IF NOT EXISTS {db}.idx_sale_items_product ON sale_items(product_id)',
+]
+FIRST_DATE = '0000-00-00'
+LAST_DATE = '9999-12-31'
+OPEN_DATE_TO = '9999-12-30'  # date_to laporan tanpa batas; date(?, '+1 day') SQLite masih valid
+
+def archive_schema_name(year):
+    return f'archive_{year}'
+
+def database_file(conn):
+    # Path file database utama ('' untuk :memory:)
+    for _, name, path in conn.execute('PRAGMA database_list'):
+        if name == 'main':
+            return path
+    return ''
+
+def sales_archives(conn):
+    return conn.execute('SELECT year, path, archived_until FROM sales_archive ORDER BY year').fetchall()
+
+def archive_boundary(conn):
+    # Transaksi sebelum tanggal ini dibaca dari arsip; None jika belum ada arsip
+    return conn.execute('SELECT MAX(archived_until) FROM sales_archive').fetchone()[0]
+
+def attach_archives(conn, archives):
+    # ATTACH file arsip (year, path) yang belum terpasang; arsip lain dilepas jika batas ATTACH tercapai.
+    # Koneksi read-only meng-ATTACH arsip sebagai read-only juga. Tidak boleh dipanggil di dalam transaksi.
+    if len(archives) > MAX_ATTACHED_ARCHIVES:
+        raise ValueError(f"Rentang terlalu panjang: maksimal {MAX_ATTACHED_ARCHIVES} tahun arsip sekaligus")
+    attached = {name for _, name, _ in conn.execute('PRAGMA database_list')} - {'main', 'temp'}
+    wanted = {archive_schema_name(year) for year, _ in archives}
+    base = os.path.dirname(database_file(conn))
+    for year, path in archives:
+        name = archive_schema_name(year)
+        if name in attached:
+            continue
+        if len(attached) >= MAX_ATTACHED_ARCHIVES:
+            for other in sorted(attached - wanted)[:len(attached) - MAX_ATTACHED_ARCHIVES + 1]:
+                conn.execute(f'DETACH DATABASE {other}')
+                attached.discard(other)
+        conn.execute(f'ATTACH DATABASE ? AS {name}', (os.path.join(base, path),))
+        attached.add(name)
+
+def upgrade_archive(conn, year, path, until):
+    # File arsip dari versi sebelum sale_items.unit_cost; arsip harus sudah di-ATTACH
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        upgraded = add_sale_item_cost(cursor, archive_schema_name(year), f'{year:04d}-01-01', until)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        logging.error(f"Upgrading sales archive {path} failed.")
+        raise
+    if upgraded:
+        logging.info(f"Upgraded sales archive {path}: added unit cost.")
+
+def upgrade_archives(conn):
+    # Tiap file cukup di-upgrade sekali; tidak boleh dipanggil di dalam transaksi (ATTACH)
+    base = os.path.dirname(database_file(conn))
+    for year, path, until in sales_archives(conn):
+        if not os.path.exists(os.path.join(base, path)):
+            logging.warning(f"Sales archive {path} not found, skipping upgrade.")
+            continue
+        attach_archives(conn, [(year, path)])
+        upgrade_archive(conn, year, path, until)
+
+def sales_sources(conn, date_from=FIRST_DATE, date_to=LAST_DATE):
+    # Sumber data penjualan untuk rentang [date_from, date_to) sebagai (schema, dari, sampai), urut waktu.
+    # Rentang per sumber tidak beririsan, jadi sisa baris lama di database utama (job arsip terputus) tidak terhitung dua kali.
+    sources = []
+    needed = []
+    boundary = FIRST_DATE
+    for year, path, until in sales_archives(conn):
+        boundary = max(boundary, until)
+        start = max(f'{year:04d}-01-01', date_from)
+        end = min(until, date_to)
+        if start < end:
+            needed.append((year, path))
+            sources.append((archive_schema_name(year), start, end))
+    attach_archives(conn, needed)
+    start = max(boundary, date_from)
+    if start < date_to:
+        sources.append(('main', start, date_to))
+    return sources
+
+def archive_sales(conn, before_year, archive_dir='arsip', progress=None):
+    # Pindahkan transaksi sebelum 1 Januari before_year ke <archive_dir>/<nama db>_<tahun>.db, per bulan:
+    # salin ke arsip dan commit, lalu hapus dari database utama sekaligus majukan archived_until dalam
+    # satu transaksi. Salinan memakai INSERT OR IGNORE sehingga job yang terputus aman diulang.
+    # Tabel ringkasan daily_product_sales tidak disentuh, laporan produk tetap memakai ringkasan.
+    db_file = database_file(conn)
+    if not db_file:
+        raise ValueError("Arsip penjualan membutuhkan database berupa file")
+    if conn.in_transaction:
+        conn.commit()
+    stem = os.path.splitext(os.path.basename(db_file))[0]
+    cutoff = f'{before_year:04d}-01-01'
+    boundary = archive_boundary(conn) or FIRST_DATE
+    first = conn.execute('SELECT MIN(date) FROM sales WHERE date >= ?', (boundary,)).fetchone()[0]
+    results = []
+    if first is None or first >= cutoff:
+        return results
+    sales_columns = ', '.join(ARCHIVE_SALES_COLUMNS)
+    item_columns = ', '.join(ARCHIVE_ITEM_COLUMNS)
+    cursor = conn.cursor()
+    for year in range(int(first[:4]), before_year):
+        start = time.perf_counter()
+        path = os.path.join(archive_dir, f'{stem}_{year}.db')
+        os.makedirs(os.path.join(os.path.dirname(db_file), archive_dir), exist_ok=True)
+        name = archive_schema_name(year)
+        attach_archives(conn, [(year, path)])
+        for statement in ARCHIVE_SCHEMA:
+            cursor.execute(statement.format(db=name))
+        upgrade_archive(conn, year, path, f'{year + 1:04d}-01-01')
+        moved_sales = moved_items = 0
+        for month in range(1, 13):
+            month_from = f'{year:04d}-{month:02d}-01'
+            month_to = f'{year:04d}-{month + 1:02d}-01' if month < 12 else f'{year + 1:04d}-01-01'
+            if month_to <= boundary:
+                continue
+            try:
+                cursor.execute('BEGIN')
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO {name}.sales ({sales_columns})
+                    SELECT {sales_columns} FROM main.sales WHERE date >= ? AND date < ?
+                ''', (month_from, month_to))
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO {name}.sale_items ({item_columns})
+                    SELECT {', '.join('si.' + column for column in ARCHIVE_ITEM_COLUMNS)}
+                    FROM main.sales s
+                    JOIN main.sale_items si ON si.transaction_id = s.transaction_id
+                    WHERE s.date >= ? AND s.date < ?
+                ''', (month_from, month_to))
+                conn.commit()
+                
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('''
+                    DELETE FROM main.sale_items WHERE transaction_id IN (
+                        SELECT transaction_id FROM main.sales WHERE date >= ? AND date < ?)
+                ''', (month_from, month_to))
+                items = cursor.rowcount
+                cursor.execute('DELETE FROM main.sales WHERE date >= ? AND date < ?', (month_from, month_to))
+                sales = cursor.rowcount
+                cursor.execute('''
+                    INSERT INTO sales_archive (year, path, archived_until, sales, items, archived_at)
+                    VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+                    ON CONFLICT (year) DO UPDATE SET
+                        archived_until = excluded.archived_until,
+                        sales = sales + excluded.sales,
+                        items = items + excluded.items,
+                        archived_at = excluded.archived_at
+                ''', (year, path, month_to, sales, items))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                logging.error(f"Archiving sales {month_from} failed.")
+                raise
+            moved_sales += sales
+            moved_items += items
+            if progress is not None:
+                progress(year, month)
+        cursor.execute(f'ANALYZE {name}')
+        conn.commit()
+        logging.info(f"Archived {year}: {moved_sales} sales, {moved_items} items to {path} "
+                     f"in {time.perf_counter() - start:.1f} s.")
+        results.append((year, path, moved_sales, moved_items))
+    return results
+
+PRODUCT_FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        barcode, name,
+        content='products', content_rowid='id',
+        tokenize='trigram'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, barcode, name) VALUES (new.id, new.barcode, new.name);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, barcode, name) VALUES ('delete', old.id, old.barcode, old.name);
+    END
+    ''',
+    # Upsert katalog selalu menulis ulang name; index hanya diperbarui jika nilainya benar-benar berubah
+    'DROP TRIGGER IF EXISTS products_fts_au',
+    '''
+    CREATE TRIGGER products_fts_au AFTER UPDATE OF barcode, name ON products
+    WHEN old.barcode IS NOT new.barcode OR old.name IS NOT new.name
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, barcode, name) VALUES ('delete', old.id, old.barcode, old.name);
+        INSERT INTO products_fts(rowid, barcode, name) VALUES (new.id, new.barcode, new.name);
+    END
+    ''',
+]
+
+# Tokenizer trigram hanya bisa mencocokkan kata kunci minimal 3 karakter
+FTS_MIN_TERM_LENGTH = 3
+
+def create_product_fts(conn):
+    # Buat index full-text produk; kembalikan False jika SQLite tidak mendukung FTS5 trigram
+    cursor = conn.cursor()
+    try:
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+        for statement in PRODUCT_FTS_SCHEMA:
+            cursor.execute(statement)
+        if not exists:
+            cursor.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+        conn.commit()
+        return True
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logging.warning(f"FTS5 not available, falling back to LIKE search: {e}")
+        return False
+
+def search_product_rows(conn, search_term, columns, limit, fts_enabled=True):
+    # Cari produk berdasarkan barcode/nama, hasil diurutkan berdasarkan relevansi
+    cursor = conn.cursor()
+    select_columns = ", ".join(f"p.{col}" for col in columns)
+    if fts_enabled and len(search_term) >= FTS_MIN_TERM_LENGTH:
+        match = '"' + search_term.replace('"', '""') + '"'
+        cursor.execute(f'''
+            SELECT {select_columns}
+            FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY f.rank, p.name
+            LIMIT ?
+        ''', (match, limit))
+    else:
+        cursor.execute(f'''
+            SELECT {select_columns}
+            FROM products p
+            WHERE p.barcode LIKE ? OR p.name LIKE ?
+            ORDER BY p.name
+            LIMIT ?
+        ''', (f'%{search_term}%', f'%{search_term}%', limit))
+    return cursor.fetchall()
+
+PRODUCT_LIST_COLUMNS = ('id', 'barcode', 'name', 'capital_price', 'selling_price',
+                        'quantity', 'low_stock_threshold', 'date_added', 'last_updated')
+PRODUCT_PAGE_SIZE = 200
+
+def product_page(conn, where='', after=None, before=None, limit=PRODUCT_PAGE_SIZE):
+    # Keyset pagination pada (name, id) sehingga halaman ke-N tidak perlu OFFSET
+    conditions = [where] if where else []
+    params = []
+    order = 'name, id'
+    if after is not None:
+        conditions.append('(name, id) > (?, ?)')
+        params.extend(after)
+    elif before is not None:
+        conditions.append('(name, id) < (?, ?)')
+        params.extend(before)
+        order = 'name DESC, id DESC'
+    where_sql = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    rows = conn.execute(f'''
+        SELECT {", ".join(PRODUCT_LIST_COLUMNS)}
+        FROM products
+        {where_sql}
+        ORDER BY {order}
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+MOVEMENT_COLUMNS = ('id', 'date', 'action', 'previous_qty', 'change_qty', 'new_qty')
+MOVEMENT_PAGE_SIZE = 500
+
+def movement_history(conn, product_id, date_from=None, date_to=None, after=None, limit=MOVEMENT_PAGE_SIZE):
+    # Riwayat pergerakan stok satu produk; memakai index (product_id, date) dan keyset pada (date, id)
+    conditions = ['product_id = ?']
+    params = [product_id]
+    if date_from:
+        conditions.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append("date < date(?, '+1 day')")
+        params.append(date_to)
+    if after is not None:
+        conditions.append('(date, id) > (?, ?)')
+        params.extend(after)
+    return conn.execute(f'''
+        SELECT {", ".join(MOVEMENT_COLUMNS)}
+        FROM inventory_log
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date, id
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+REPORT_CHUNK_SIZE = 500
+
+# Definisi laporan: kolom (nama, judul, lebar) dan satu query agregasi per laporan.
+# Rentang tanggal memakai batas setengah terbuka agar index pada kolom date terpakai.
+REPORTS = {
+    "Penjualan Harian": {
+        'columns': (("date", "Tanggal", 100), ("transactions", "Jumlah Transaksi", 120),
+                    ("items", "Item Terjual", 100), ("subtotal", "Subtotal", 120),
+                    ("tax", "PPN", 100), ("total", "Total", 120)),
+        'sql': '''
+            SELECT date(date) AS day, COUNT(*), SUM(total_items),
+                   ROUND(SUM(subtotal), 2), ROUND(SUM(tax), 2), ROUND(SUM(total_amount), 2)
+            FROM sales
+            WHERE date >= ? AND date < date(?, '+1 day')
+            GROUP BY day
+            ORDER BY day
+        ''',
+        'rollup_sql': '''
+            SELECT r.day,
+                   (SELECT COUNT(*) FROM sales
+                    WHERE date >= r.day AND date < date(r.day, '+1 day')),
+                   r.lines, ROUND(r.revenue, 2), ROUND(r.tax, 2), ROUND(r.revenue + r.tax, 2)
+            FROM (
+                SELECT date AS day, SUM(lines) AS lines, SUM(revenue) AS revenue, SUM(tax) AS tax
+                FROM daily_product_sales
+                WHERE date BETWEEN ? AND ?
+                GROUP BY date
+            ) r
+            ORDER BY r.day
+        ''',
+        'rollup_reads_sales': True,  # jumlah transaksi per hari tetap dihitung dari tabel sales
+        'archive_arm': '''
+            SELECT date(date) AS day, COUNT(*) AS sales, SUM(total_items) AS items,
+                   SUM(subtotal) AS subtotal, SUM(tax) AS tax, SUM(total_amount) AS total
+            FROM {db}.sales
+            WHERE date >= ? AND date < ?
+            GROUP BY day
+        ''',
+        'archive_sql': '''
+            SELECT day, SUM(sales), SUM(items), ROUND(SUM(subtotal), 2), ROUND(SUM(tax), 2),
+                   ROUND(SUM(total), 2)
+            FROM ({arms})
+            GROUP BY day
+            ORDER BY day
+        ''',
+        'uses_dates': True,
+        'total_column': 5,
+    },
+    "Penjualan Produk": {
+        'columns': (("id", "ID", 50), ("barcode", "Barcode", 120), ("name", "Nama Produk", 200),
+                    ("qty", "Jumlah Terjual", 100), ("revenue", "Pendapatan", 120),
+                    ("cost", "Modal", 120), ("profit", "Laba Kotor", 120)),
+        'sql': '''
+            SELECT si.product_id, si.barcode, si.product_name, SUM(si.quantity),
+                   ROUND(SUM(si.total_price), 2),
+                   ROUND(SUM(si.quantity * si.unit_cost), 2),
+                   ROUND(SUM(si.total_price) - SUM(si.quantity * si.unit_cost), 2)
+            FROM sales s
+            JOIN sale_items si ON si.transaction_id = s.transaction_id
+            WHERE s.date >= ? AND s.date < date(?, '+1 day')
+            GROUP BY si.product_id
+            ORDER BY SUM(si.total_price) DESC
+        ''',
+        'rollup_sql': '''
+            SELECT r.product_id, COALESCE(p.barcode, '-'), COALESCE(p.name, '-'), SUM(r.qty),
+                   ROUND(SUM(r.revenue), 2), ROUND(SUM(r.cost), 2),
+                   ROUND(SUM(r.revenue) - SUM(r.cost), 2)
+            FROM daily_product_sales r
+            LEFT JOIN products p ON p.id = r.product_id
+            WHERE r.date BETWEEN ? AND ?
+            GROUP BY r.product_id
+            ORDER BY SUM(r.revenue) DESC
+        ''',
+        'archive_arm': '''
+            SELECT si.product_id AS product_id, si.barcode AS barcode, si.product_name AS name,
+                   SUM(si.quantity) AS qty, SUM(si.total_price) AS revenue,
+                   SUM(si.quantity * si.unit_cost) AS cost
+            FROM {db}.sales s
+            JOIN {db}.sale_items si ON si.transaction_id = s.transaction_id
+            WHERE s.date >= ? AND s.date < ?
+            GROUP BY si.product_id
+        ''',
+        'archive_sql': '''
+            SELECT a.product_id, a.barcode, a.name, SUM(a.qty), ROUND(SUM(a.revenue), 2),
+                   ROUND(SUM(a.cost), 2), ROUND(SUM(a.revenue) - SUM(a.cost), 2)
+            FROM ({arms}) a
+            GROUP BY a.product_id
+            ORDER BY SUM(a.revenue) DESC
+        ''',
+        'uses_dates': True,
+        'total_column': 4,
+    },
+    "Pergerakan Inventaris": {
+        'columns': (("date", "Tanggal", 100), ("id", "ID", 50), ("name", "Nama Produk", 200),
+                    ("action", "Aksi", 100), ("count", "Jumlah Catatan", 110),
+                    ("change", "Perubahan Stok", 110)),
+        'sql': '''
+            SELECT date(l.date) AS day, l.product_id, COALESCE(p.name, '-'), l.action,
+                   COUNT(*), SUM(l.change_qty)
+            FROM inventory_log l
+            LEFT JOIN products p ON p.id = l.product_id
+            WHERE l.date >= ? AND l.date < date(?, '+1 day')
+            GROUP BY day, l.product_id, l.action
+            ORDER BY day, l.product_id
+        ''',
+        'uses_dates': True,
+        'total_column': None,
+    },
+    "Stok Rendah": {
+        'columns': (("id", "ID", 50), ("barcode", "Barcode", 120), ("name", "Nama Produk", 200),
+                    ("quantity", "Stok", 80), ("low_stock", "Batas Stok", 80),
+                    ("shortage", "Kekurangan", 90)),
+        'sql': '''
+            SELECT id, barcode, name, quantity, low_stock_threshold,
+                   low_stock_threshold - quantity
+            FROM products
+            WHERE quantity <= low_stock_threshold
+            ORDER BY quantity - low_stock_threshold, name
+        ''',
+        'uses_dates': False,
+        'total_column': None,
+    },
+}
+
+def archive_report_query(conn, spec, date_from=None, date_to=None):
+    # Query laporan per sumber (arsip per tahun + database utama), digabung dengan UNION ALL
+    date_to = (datetime.date.fromisoformat(date_to[:10]) + datetime.timedelta(days=1)).isoformat() \
+        if date_to else LAST_DATE
+    sources = sales_sources(conn, date_from or FIRST_DATE, date_to)
+    if not sources:
+        sources = [('main', FIRST_DATE, FIRST_DATE)]
+    arms = ' UNION ALL '.join(spec['archive_arm'].format(db=schema) for schema, _, _ in sources)
+    return spec['archive_sql'].format(arms=arms), [bound for _, start, end in sources for bound in (start, end)]
+
+def report_chunks(conn, report_type, date_from=None, date_to=None, chunk_size=REPORT_CHUNK_SIZE):
+    # Jalankan query laporan dan hasilkan baris per potongan agar memori tetap kecil
+    spec = REPORTS[report_type]
+    if spec['uses_dates']:
+        # Tanpa tanggal = seluruh riwayat
+        date_from = date_from or FIRST_DATE
+        date_to = date_to or OPEN_DATE_TO
+    params = (date_from, date_to) if spec['uses_dates'] else ()
+    sql = spec['sql']
+    boundary = archive_boundary(conn) if spec.get('archive_sql') else None
+    archived = boundary is not None and date_from < boundary
+    # Pakai tabel ringkasan jika seluruh rentang tanggal sudah tercakup
+    if spec.get('rollup_sql') and rollup_covers(conn, date_from) and not (archived and spec.get('rollup_reads_sales')):
+        sql = spec['rollup_sql']
+    elif archived:
+        sql, params = archive_report_query(conn, spec, date_from, date_to)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+EXPORT_CHUNK_SIZE = 20000
+EXPORT_FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+class ExportCancelled(Exception):
+    pass
+
+def write_csv(path, headings, chunks, on_chunk):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(headings)
+        for rows in chunks:
+            writer.writerows(rows)
+            on_chunk(len(rows))
+
+def write_parquet(path, headings, chunks, on_chunk):
+    # Parquet (kolumnar, terkompresi zstd) lewat pyarrow yang di-load hanya saat dibutuhkan;
+    # setiap potongan menjadi satu row group sehingga memori tidak tumbuh dengan jumlah baris
+    try:
+        pa = importlib.import_module('pyarrow')
+        pq = importlib.import_module('pyarrow.parquet')
+    except ImportError:
+        raise RuntimeError("Export Parquet membutuhkan pyarrow (pip install pyarrow)")
+    writer = None
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            if writer is None:
+                # Tipe kolom diambil dari potongan pertama; kolom yang semuanya NULL dianggap teks
+                fields = []
+                for heading, values in zip(headings, columns):
+                    kind = pa.array(values).type
+                    fields.append(pa.field(heading, pa.string() if pa.types.is_null(kind) else kind))
+                schema = pa.schema(fields)
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            on_chunk(len(rows))
+        if writer is None:
+            schema = pa.schema([pa.field(heading, pa.string()) for heading in headings])
+            writer = pq.ParquetWriter(path, schema, compression='zstd')
+    finally:
+        if writer is not None:
+            writer.close()
+
+EXPORT_WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+def export_report(conn, report_type, path, fmt='csv', date_from=None, date_to=None,
+                  chunk_size=EXPORT_CHUNK_SIZE, progress=None, cancel=None):
+    # Streaming langsung dari cursor SQL ke file per potongan
+    return write_report(report_type, path, fmt, report_chunks(conn, report_type, date_from, date_to, chunk_size),
+                        progress=progress, cancel=cancel)
+
+def write_report(report_type, path, fmt, report, progress=None, cancel=None):
+    # report: iterable potongan baris (dari cursor lokal atau stream pos_server). Ditulis ke file .part
+    # lalu di-rename agar export yang dibatalkan/gagal tidak meninggalkan file setengah jadi
+    headings = [heading for _, heading, _ in REPORTS[report_type]['columns']]
+    written = 0
+    
+    def chunks():
+        for rows in report:
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+            yield rows
+    
+    def on_chunk(count):
+        nonlocal written
+        written += count
+        if progress is not None:
+            progress(written)
+    
+    partial = path + '.part'
+    try:
+        EXPORT_WRITERS[fmt](partial, headings, chunks(), on_chunk)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return written
+
+# Import/export katalog produk (CSV atau JSON/JSON Lines) untuk sinkronisasi katalog supplier
+PRODUCT_FILE_COLUMNS = ('barcode', 'name', 'capital_price', 'selling_price', 'quantity', 'low_stock_threshold')
+IMPORT_BATCH_SIZE = 10000
+
+# quantity/low_stock_threshold kosong: produk baru memakai default, produk lama tidak diubah
+PRODUCT_UPSERT_SQL = '''
+    INSERT INTO products (
+        barcode, name, capital_price, selling_price,
+        quantity, low_stock_threshold, date_added
+    ) VALUES (?, ?, ?, ?, COALESCE(?, 0), COALESCE(?, 3), ?)
+    ON CONFLICT (barcode) DO UPDATE SET
+        name = excluded.name,
+        capital_price = excluded.capital_price,
+        selling_price = excluded.selling_price,
+        quantity = COALESCE(?, quantity),
+        low_stock_threshold = COALESCE(?, low_stock_threshold),
+        last_updated = excluded.date_added
+'''
+
+class ImportResult:
+    __slots__ = ('rows', 'inserted', 'updated', 'errors')
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # (nomor baris, pesan)
+
+def read_product_file(path):
+    # Hasilkan (nomor baris, dict) secara streaming; .json berisi array objek, .jsonl satu objek per baris
+    if path.lower().endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError as e:
+                        yield line_no, e
+    elif path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("File JSON harus berisi array produk")
+        yield from enumerate(data, 1)
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            missing = [col for col in PRODUCT_FILE_COLUMNS[:4] if col not in (reader.fieldnames or ())]
+            if missing:
+                raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+            # Baris 1 adalah header
+            yield from enumerate(reader, 2)
+
+def parse_product_row(data):
+    # Validasi satu baris file import; ValueError berisi pesan yang bisa ditampilkan ke pengguna
+    if isinstance(data, Exception):
+        raise ValueError(f"JSON tidak valid: {data}")
+    if not isinstance(data, dict):
+        raise ValueError("Baris harus berupa objek")
+    
+    def text(name):
+        value = data.get(name)
+        return '' if value is None else str(value).strip()
+    
+    def number(name, kind, required):
+        value = text(name)
+        if not value:
+            if required:
+                raise ValueError(f"{name} wajib diisi")
+            return None
+        try:
+            result = kind(value)
+        except ValueError:
+            raise ValueError(f"{name} bukan angka yang valid: {value!r}")
+        if result < 0:
+            raise ValueError(f"{name} tidak boleh negatif")
+        return result
+    
+    barcode = text('barcode')
+    name = text('name')
+    if not barcode:
+        raise ValueError("barcode wajib diisi")
+    if not name:
+        raise ValueError("name wajib diisi")
+    return (barcode, name, number('capital_price', float, True), number('selling_price', float, True),
+            number('quantity', int, False), number('low_stock_threshold', int, False))
+
+def export_products(conn, path, chunk_size=EXPORT_CHUNK_SIZE, progress=None, cancel=None):
+    # Export katalog secara streaming dengan kolom yang sama dengan format import
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT {", ".join(PRODUCT_FILE_COLUMNS)} FROM products ORDER BY barcode')
+    return write_product_file(path, iter(lambda: cursor.fetchmany(chunk_size), []),
+                              progress=progress, cancel=cancel)
+
+def write_product_file(path, chunks, progress=None, cancel=None):
+    # chunks: iterable potongan baris PRODUCT_FILE_COLUMNS, dari cursor lokal atau halaman pos_server
+    written = 0
+    partial = path + '.part'
+    try:
+        with open(partial, 'w', newline='', encoding='utf-8') as f:
+            lower = path.lower()
+            if lower.endswith('.json') or lower.endswith('.jsonl'):
+                array = lower.endswith('.json')
+                f.write('[\n' if array else '')
+                separator = ''
+                for rows in chunks:
+                    if cancel is not None and cancel.is_set():
+                        raise ExportCancelled()
+                    for row in rows:
+                        f.write(separator + json.dumps(dict(zip(PRODUCT_FILE_COLUMNS, row)), ensure_ascii=False))
+                        separator = ',\n' if array else '\n'
+                    written += len(rows)
+                    if progress is not None:
+                        progress(written)
+                f.write('\n]\n' if array else '\n')
+            else:
+                writer = csv.writer(f)
+                writer.writerow(PRODUCT_FILE_COLUMNS)
+                for rows in chunks:
+                    if cancel is not None and cancel.is_set():
+                        raise ExportCancelled()
+                    writer.writerows(rows)
+                    written += len(rows)
+                    if progress is not None:
+                        progress(written)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return written
+
+class CartLine:
+    __slots__ = ('product_id', 'barcode', 'name', 'unit_price', 'quantity')
+
+    def __init__(self, product_id, barcode, name, unit_price, quantity):
+        self.product_id = product_id
+        self.barcode = barcode
+        self.name = name
+        self.unit_price = unit_price
+        self.quantity = quantity
+
+    @property
+    def total(self):
+        return self.unit_price * self.quantity
+
+class Cart:
+    # Keranjang belanja tanpa UI, diindeks per product_id; subtotal dijaga secara inkremental
+    # sehingga scan dan perubahan jumlah tetap O(1) walau keranjang berisi ratusan baris
+    def __init__(self, tax_rate):
+        self.tax_rate = tax_rate
+        self.lines = {}
+        self.subtotal = 0.0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines.values())
+
+    def find(self, product_id):
+        return self.lines.get(product_id)
+
+    def add(self, product, qty=1):
+        # Produk yang sudah ada di keranjang digabung jumlahnya, bukan baris baru
+        line = self.lines.get(product.id)
+        if line is None:
+            line = CartLine(product.id, product.barcode, product.name, product.selling_price, 0)
+            self.lines[product.id] = line
+        line.quantity += qty
+        self.subtotal += line.unit_price * qty
+        return line
+
+    def set_quantity(self, product_id, qty):
+        line = self.lines[product_id]
+        self.subtotal += line.unit_price * (qty - line.quantity)
+        line.quantity = qty
+        return line
+
+    def remove(self, product_id):
+        line = self.lines.pop(product_id)
+        if self.lines:
+            self.subtotal -= line.total
+        else:
+            self.subtotal = 0.0  # Hindari sisa pembulatan float
+        return line
+
+    def clear(self):
+        self.lines = {}
+        self.subtotal = 0.0
+
+    def copy(self):
+        cart = Cart(self.tax_rate)
+        cart.lines = {line.product_id: CartLine(line.product_id, line.barcode, line.name,
+                                                line.unit_price, line.quantity)
+                      for line in self.lines.values()}
+        cart.subtotal = self.subtotal
+        return cart
+
+    @property
+    def tax(self):
+        return self.subtotal * self.tax_rate
+
+    @property
+    def total(self):
+        return self.subtotal + self.tax
+
+SCAN_DRAIN_BATCH = 50
+
+class ScanResult:
+    # status: 'added', 'not_found', atau 'no_stock' (available = stok tersedia)
+    __slots__ = ('barcode', 'quantity', 'status', 'line', 'available', 'queued_at')
+
+    def __init__(self, barcode, quantity, status, line=None, available=None, queued_at=None):
+        self.barcode = barcode
+        self.quantity = quantity
+        self.status = status
+        self.line = line
+        self.available = available
+        self.queued_at = queued_at
+
+class ScanBurstQueue:
+    # Antrian scan beruntun (scanner keyboard-wedge atau kamera): barcode langsung dicatat saat Enter,
+    # lalu diproses berurutan terhadap index barcode dan keranjang tanpa menunggu UI
+    def __init__(self, catalog, cart):
+        self.catalog = catalog
+        self.cart = cart
+        self.pending = collections.deque()
+        self.added = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, barcode, qty=1, queued_at=None):
+        barcode = barcode.strip()
+        if barcode:
+            self.pending.append((barcode, qty, queued_at if queued_at is not None else time.perf_counter()))
+
+    def drain(self, limit=SCAN_DRAIN_BATCH):
+        # Batasi jumlah per panggilan agar loop Tk tetap responsif saat antrian panjang
+        results = []
+        while self.pending and len(results) < limit:
+            barcode, qty, queued_at = self.pending.popleft()
+            results.append(self.resolve(barcode, qty, queued_at))
+        return results
+
+    def resolve(self, barcode, qty=1, queued_at=None):
+        product = self.catalog.lookup(barcode)
+        if product is None:
+            self.rejected += 1
+            return ScanResult(barcode, qty, 'not_found', queued_at=queued_at)
+        line = self.cart.find(product.id)
+        in_cart = line.quantity if line is not None else 0
+        if in_cart + qty > product.quantity:
+            self.rejected += 1
+            return ScanResult(barcode, qty, 'no_stock', line, product.quantity, queued_at)
+        self.added += 1
+        return ScanResult(barcode, qty, 'added', self.cart.add(product, qty), product.quantity, queued_at)
+
+class Sale:
+    __slots__ = ('transaction_id', 'date', 'lines', 'subtotal', 'tax', 'total',
+                 'payment_method', 'customer_name', 'notes')
+
+    def __init__(self, transaction_id, date, lines, subtotal, tax, total,
+                 payment_method, customer_name='', notes=''):
+        self.transaction_id = transaction_id
+        self.date = date
+        self.lines = lines
+        self.subtotal = subtotal
+        self.tax = tax
+        self.total = total
+        self.payment_method = payment_method
+        self.customer_name = customer_name
+        self.notes = notes
+
+class StockError(ValueError):
+    # Checkout ditolak karena stok tidak mencukupi; failures berisi (CartLine, stok tersedia atau None)
+    def __init__(self, failures):
+        self.failures = failures
+        details = '; '.join(
+            f"{line.name} (diminta {line.quantity}, tersedia {available})" if available is not None
+            else f"{line.name} (produk tidak ditemukan)"
+            for line, available in failures)
+        super().__init__(f"Stok tidak mencukupi: {details}")
+
+# Pengurangan stok set-based untuk seluruh baris keranjang dalam satu statement. Baris dengan
+# produk yang sama dijumlahkan dulu; produk yang stoknya kurang tidak ikut diubah dan tidak
+# muncul di RETURNING sehingga bisa dilaporkan per baris.
+STOCK_DECREMENT_SQL = '''
+    UPDATE products
+    SET quantity = products.quantity - c.qty,
+        last_updated = ?
+    FROM (
+        SELECT json_extract(value, '$[0]') AS product_id, SUM(json_extract(value, '$[1]')) AS qty
+        FROM json_each(?)
+        GROUP BY 1
+    ) AS c
+    WHERE products.id = c.product_id AND products.quantity >= c.qty
+    RETURNING products.id
+'''
+
+# Versi tanpa guard untuk transaksi dari jurnal till: barang sudah keluar dari toko,
+# jadi stok tetap dikurangi walau menjadi minus dan produk yang minus dilaporkan
+STOCK_FORCE_DECREMENT_SQL = '''
+    UPDATE products
+    SET quantity = products.quantity - c.qty,
+        last_updated = ?
+    FROM (
+        SELECT json_extract(value, '$[0]') AS product_id, SUM(json_extract(value, '$[1]')) AS qty
+        FROM json_each(?)
+        GROUP BY 1
+    ) AS c
+    WHERE products.id = c.product_id
+    RETURNING products.id, products.quantity
+'''
+
+CROCKFORD_BASE32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TERMINAL_ID_BITS = 20
+TRANSACTION_COUNTER_BITS = 20
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_BASE32[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+class TransactionIdGenerator:
+    # ID transaksi gaya ULID yang urut waktu: TRX + waktu UTC sampai milidetik + ID terminal + counter.
+    # Aman antar-thread (lock) dan antar-proses/till selama setiap terminal memakai ID berbeda;
+    # tanpa ID terminal dipakai nilai acak 20 bit per proses.
+    def __init__(self, terminal_id=None):
+        if terminal_id is None:
+            terminal_id = secrets.randbits(TERMINAL_ID_BITS)
+        if not 0 <= terminal_id < 1 << TERMINAL_ID_BITS:
+            raise ValueError(f"ID terminal harus antara 0 dan {(1 << TERMINAL_ID_BITS) - 1}")
+        self.terminal_id = terminal_id
+        self.terminal = encode_base32(terminal_id, TERMINAL_ID_BITS // 5)
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+        self._second = None
+        self._prefix = ''
+
+    def next(self):
+        with self._lock:
+            ms = time.time_ns() // 1000000
+            if ms > self._last_ms:
+                self._last_ms = ms
+                self._counter = 0
+            else:
+                # Milidetik yang sama atau jam mundur: lanjutkan counter, pinjam milidetik berikutnya jika penuh
+                self._counter += 1
+                if self._counter >> TRANSACTION_COUNTER_BITS:
+                    self._last_ms += 1
+                    self._counter = 0
+            second, millis = divmod(self._last_ms, 1000)
+            if second != self._second:
+                # UTC agar urutan tidak rusak saat pergantian zona/DST
+                self._second = second
+                self._prefix = time.strftime('TRX%Y%m%d%H%M%S', time.gmtime(second))
+            return (f"{self._prefix}{millis:03d}{self.terminal}"
+                    f"{encode_base32(self._counter, TRANSACTION_COUNTER_BITS // 5)}")
+
+class Catalog:
+    # Data produk: index barcode di memori untuk lookup, SQLite untuk pencarian dan perubahan
+    def __init__(self, db, fts_enabled=False, search_limit=200):
+        self.db = db
+        self.fts_enabled = fts_enabled
+        self.search_limit = search_limit
+        self.index = BarcodeIndex()
+        self.index.load(db.writer)
+
+    def lookup(self, barcode):
+        return self.index.get(barcode)
+
+    def fetch(self, barcode):
+        # Index dimuat sekali saat start; till lain yang memakai file database yang sama bisa menambah
+        # produk atau stok sesudahnya. Baca ulang baris produk (dari worker, bukan loop Tk) dan perbarui index.
+        with self.db.reader() as conn:
+            row = conn.execute(f'''
+                SELECT {", ".join(PRODUCT_INDEX_COLUMNS)} FROM products WHERE barcode = ?
+            ''', (barcode,)).fetchone()
+        if row is None:
+            stale = self.index.get(barcode)
+            if stale is not None:
+                self.index.remove(stale.id)
+            return None
+        record = ProductRecord(*row)
+        self.index.put(record)
+        return record
+
+    def search(self, search_term, columns=PRODUCT_LIST_COLUMNS, limit=None):
+        with self.db.reader() as conn:
+            return search_product_rows(conn, search_term, columns,
+                                       limit or self.search_limit, self.fts_enabled)
+
+    def page(self, where='', after=None, before=None, limit=PRODUCT_PAGE_SIZE):
+        with self.db.reader() as conn:
+            return product_page(conn, where, after, before, limit)
+
+    def movement_history(self, product_id, date_from=None, date_to=None, after=None, limit=MOVEMENT_PAGE_SIZE):
+        with self.db.reader() as conn:
+            return movement_history(conn, product_id, date_from, date_to, after, limit)
+
+    def low_stock_count(self):
+        # Dibaca dari set di index barcode, tanpa query
+        return len(self.index.low_stock)
+
+    def add_product(self, record):
+        def insert(cursor):
+            cursor.execute('''
+                INSERT INTO products (
+                    barcode, name, capital_price, selling_price, 
+                    quantity, low_stock_threshold, date_added
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                record.barcode,
+                record.name,
+                record.capital_price,
+                record.selling_price,
+                record.quantity,
+                record.low_stock_threshold,
+                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
+            return cursor.lastrowid
+        
+        record.id = self.db.write(insert)
+        self.index.put(record)
+        return record
+
+    def import_products(self, rows, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        # rows: iterable (nomor baris, dict). Baris valid di-upsert per barcode dengan executemany,
+        # satu transaksi per batch; baris tidak valid dilaporkan tanpa menggagalkan baris lain
+        result = ImportResult()
+        batch = []
+        inserted = set()
+        
+        def flush():
+            now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            params = [(barcode, name, capital, selling, qty, threshold, now, qty, threshold)
+                      for _, (barcode, name, capital, selling, qty, threshold) in batch]
+            
+            def write(cursor):
+                # Tanpa savepoint di jalur cepat: savepoint bersarang membuat setiap statement trigger
+                # menulis sub-journal dan memperlambat upsert beberapa kali lipat
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    cursor.executemany(PRODUCT_UPSERT_SQL, params)
+                    return [line_no for line_no, _ in batch]
+                except sqlite3.Error:
+                    cursor.execute('ROLLBACK')
+                # Batch gagal: ulangi per baris untuk menemukan baris penyebabnya
+                cursor.execute('BEGIN IMMEDIATE')
+                applied = []
+                for (line_no, _), row in zip(batch, params):
+                    cursor.execute('SAVEPOINT import_row')
+                    try:
+                        cursor.execute(PRODUCT_UPSERT_SQL, row)
+                        applied.append(line_no)
+                    except sqlite3.Error as e:
+                        cursor.execute('ROLLBACK TO import_row')
+                        result.errors.append((line_no, str(e)))
+                    cursor.execute('RELEASE import_row')
+                return applied
+            
+            applied = set(self.db.write(write))
+            for line_no, row in batch:
+                if line_no not in applied:
+                    continue
+                # Barcode yang sudah ada (di database atau di baris sebelumnya) dihitung sebagai update
+                if row[0] in self.index.by_barcode or row[0] in inserted:
+                    result.updated += 1
+                else:
+                    result.inserted += 1
+                    inserted.add(row[0])
+            batch.clear()
+            if progress is not None:
+                progress(result.rows)
+        
+        for line_no, data in rows:
+            result.rows += 1
+            try:
+                batch.append((line_no, parse_product_row(data)))
+            except ValueError as e:
+                result.errors.append((line_no, str(e)))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        
+        # Bangun index baru lalu tukar, agar lookup dari thread UI tidak melihat index setengah terisi
+        index = BarcodeIndex()
+        with self.db.reader() as conn:
+            index.load(conn)
+        self.index = index
+        return result
+
+    def update_product(self, record):
+        def update(cursor):
+            cursor.execute('''
+                UPDATE products 
+                SET barcode=?, name=?, capital_price=?, selling_price=?,
+                    quantity=?, low_stock_threshold=?, last_updated=?
+                WHERE id=?
+            ''', (
+                record.barcode,
+                record.name,
+                record.capital_price,
+                record.selling_price,
+                record.quantity,
+                record.low_stock_threshold,
+                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                record.id
+            ))
+        
+        self.db.write(update)
+        self.index.put(record)
+        return record
+
+    def delete_product(self, product_id):
+        self.db.write(lambda cursor: cursor.execute('DELETE FROM products WHERE id=?', (product_id,)))
+        self.index.remove(product_id)
+
+    def apply_sale(self, sale):
+        # Sinkronkan stok di index barcode setelah commit berhasil
+        for line in sale.lines:
+            self.index.adjust_quantity(line.product_id, -line.quantity)
+
+RECEIPT_WIDTH = 40
+RECEIPT_HEADER = ("TOKO SAYA", "Jl. Contoh No. 123", "Telp: 021-1234567")
+RECEIPT_BATCH_SIZE = 200
+
+def render_receipt(sale, tax_rate):
+    # Struk dibangun dari data transaksi yang sudah di-commit, bukan dari tampilan UI
+    out = ["=" * RECEIPT_WIDTH, *RECEIPT_HEADER, "=" * RECEIPT_WIDTH, "",
+           f"No: {sale.transaction_id}", f"Tanggal: {sale.date}", "Kasir: Admin", "",
+           "-" * RECEIPT_WIDTH]
+    for line in sale.lines:
+        out.append(f"{line.name[:20]:<20}")
+        out.append(f"{line.quantity:>3} x {line.unit_price:>10,.2f} = {line.total:>10,.2f}")
+    out += ["-" * RECEIPT_WIDTH, "",
+            f"Subtotal: {sale.subtotal:>28,.2f}",
+            f"PPN {tax_rate * 100:g}%: {sale.tax:>28,.2f}",
+            f"TOTAL  : {sale.total:>28,.2f}", "",
+            "=" * RECEIPT_WIDTH, "Terima kasih atas kunjungan Anda", "=" * RECEIPT_WIDTH, "", ""]
+    return "\n".join(out)
+
+def load_sale(conn, transaction_id):
+    # Bangun ulang Sale dari database, untuk cetak ulang struk yang tidak ada di jurnal;
+    # transaksi lama dicari di file arsip, tahun terbaru dulu
+    sale = load_sale_from(conn, 'main', transaction_id)
+    if sale is None:
+        for year, path, _ in reversed(sales_archives(conn)):
+            attach_archives(conn, [(year, path)])
+            sale = load_sale_from(conn, archive_schema_name(year), transaction_id)
+            if sale is not None:
+                break
+    return sale
+
+def load_sale_from(conn, schema, transaction_id):
+    row = conn.execute(f'''
+        SELECT transaction_id, date, subtotal, tax, total_amount, payment_method, customer_name, notes
+        FROM {schema}.sales
+        WHERE transaction_id = ?
+    ''', (transaction_id,)).fetchone()
+    if row is None:
+        return None
+    lines = [CartLine(*item) for item in conn.execute(f'''
+        SELECT product_id, barcode, product_name, unit_price, quantity
+        FROM {schema}.sale_items
+        WHERE transaction_id = ?
+        ORDER BY id
+    ''', (transaction_id,))]
+    return Sale(row[0], row[1], lines, row[2], row[3], row[4], row[5], row[6] or '', row[7] or '')
+
+class ReceiptJournal:
+    # Jurnal struk harian append-only (struk_YYYY-MM-DD.txt) dengan index offset per transaksi
+    # (struk_YYYY-MM-DD.idx: transaction_id, offset byte, panjang) untuk cetak ulang tanpa scan file
+    def __init__(self, directory='struk'):
+        self.directory = directory
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def paths(self, day):
+        base = os.path.join(self.directory, f"struk_{day}")
+        return base + '.txt', base + '.idx'
+
+    def append(self, receipts):
+        # receipts: list (hari, transaction_id, teks); satu kali tulis per file per hari
+        by_day = {}
+        for day, transaction_id, text in receipts:
+            by_day.setdefault(day, []).append((transaction_id, text.encode('utf-8')))
+        os.makedirs(self.directory, exist_ok=True)
+        for day, items in by_day.items():
+            journal_path, index_path = self.paths(day)
+            entries = []
+            with open(journal_path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                for transaction_id, data in items:
+                    entries.append((transaction_id, offset, len(data)))
+                    offset += len(data)
+                f.write(b''.join(data for _, data in items))
+            # Index ditulis setelah isi jurnal; jika terputus, struk tetap bisa dibangun ulang dari database
+            with open(index_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{transaction_id}\t{offset}\t{length}\n"
+                                for transaction_id, offset, length in entries))
+            with self._lock:
+                index = self._indexes.get(day)
+                if index is not None:
+                    for transaction_id, offset, length in entries:
+                        index[transaction_id] = (offset, length)
+
+    def _index(self, day):
+        with self._lock:
+            index = self._indexes.get(day)
+            if index is None:
+                index = {}
+                _, index_path = self.paths(day)
+                if os.path.exists(index_path):
+                    with open(index_path, encoding='utf-8') as f:
+                        for entry in f:
+                            parts = entry.rstrip('\n').split('\t')
+                            if len(parts) == 3:
+                                index[parts[0]] = (int(parts[1]), int(parts[2]))
+                self._indexes[day] = index
+            return index
+
+    def read(self, transaction_id):
+        # ID memuat tanggal (UTC untuk ID baru, lokal untuk ID lama); cek hari itu dan tetangganya
+        try:
+            day = datetime.datetime.strptime(transaction_id[3:11], '%Y%m%d').date()
+        except ValueError:
+            return None
+        for delta in (0, 1, -1):
+            candidate = (day + datetime.timedelta(days=delta)).isoformat()
+            entry = self._index(candidate).get(transaction_id)
+            if entry is not None:
+                offset, length = entry
+                try:
+                    with open(self.paths(candidate)[0], 'rb') as f:
+                        f.seek(offset)
+                        return f.read(length).decode('utf-8')
+                except OSError as e:
+                    # Jurnal hilang/rusak: biarkan pemanggil membangun ulang dari database
+                    logging.warning(f"Receipt journal unreadable for {transaction_id}: {e}")
+                    return None
+        return None
+
+class ReceiptWriter:
+    # Antrean struk yang ditulis thread latar; struk yang menumpuk ditulis sekaligus per batch
+    def __init__(self, journal, tax_rate, batch_size=RECEIPT_BATCH_SIZE):
+        self.journal = journal
+        self.tax_rate = tax_rate
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.written = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, sale):
+        with self._lock:
+            self.pending[sale.transaction_id] = sale
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='receipt-writer', daemon=True)
+                self._thread.start()
+        self.queue.put(sale)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = [sale for sale in batch if sale is not None]
+            if not batch:
+                continue
+            try:
+                self.journal.append([(sale.date[:10], sale.transaction_id, render_receipt(sale, self.tax_rate))
+                                     for sale in batch])
+                self.written += len(batch)
+            except Exception as e:
+                self.errors += len(batch)
+                logging.error(f"Failed to write {len(batch)} receipts: {e}")
+            with self._lock:
+                for sale in batch:
+                    self.pending.pop(sale.transaction_id, None)
+
+    def read(self, transaction_id):
+        # Struk yang masih di antrean dirender langsung dari memori
+        with self._lock:
+            sale = self.pending.get(transaction_id)
+        if sale is not None:
+            return render_receipt(sale, self.tax_rate)
+        return self.journal.read(transaction_id)
+
+    def close(self):
+        # Tulis semua struk yang tersisa sebelum keluar
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+JOURNAL_BATCH_SIZE = 200
+JOURNAL_RETRY_SECONDS = 2.0
+JOURNAL_ROTATE_BYTES = 16 * 1024 * 1024
+
+def sale_to_dict(sale):
+    return {
+        'transaction_id': sale.transaction_id,
+        'date': sale.date,
+        'lines': [[line.product_id, line.barcode, line.name, line.unit_price, line.quantity]
+                  for line in sale.lines],
+        'subtotal': sale.subtotal,
+        'tax': sale.tax,
+        'total': sale.total,
+        'payment_method': sale.payment_method,
+        'customer_name': sale.customer_name,
+        'notes': sale.notes,
+    }
+
+def sale_from_dict(data):
+    return Sale(data['transaction_id'], data['date'], [CartLine(*line) for line in data['lines']],
+                data['subtotal'], data['tax'], data['total'], data['payment_method'],
+                data['customer_name'], data['notes'])
+
+def existing_transactions(conn, transaction_ids, chunk_size=500):
+    # transaction_id yang sudah ada di tabel sales, dicek per potongan agar tidak melewati batas parameter
+    found = set()
+    for i in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[i:i + chunk_size]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT transaction_id FROM sales WHERE transaction_id IN ({','.join('?' * len(chunk))})", chunk))
+    return found
+
+def is_lock_error(error):
+    # Database dipegang koneksi/proses lain melewati busy_timeout
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+def check_stock(index, lines):
+    # Validasi stok dari index di memori untuk checkout lewat jurnal (tanpa menunggu database)
+    failures = []
+    for line in lines:
+        record = index.get_by_id(line.product_id)
+        if record is None or line.quantity > record.quantity:
+            failures.append((line, record.quantity if record is not None else None))
+    if failures:
+        raise StockError(failures)
+
+class TillJournal:
+    # Jurnal write-ahead till: satu transaksi per baris JSON, append-only, fsync sebelum checkout selesai.
+    # Offset yang sudah diterapkan ke database disimpan di <path>.applied; karena replay memeriksa
+    # transaction_id, crash di antara commit dan penyimpanan offset tidak membuat transaksi ganda.
+    def __init__(self, path='till_journal.jsonl'):
+        self.path = path
+        self.checkpoint_path = path + '.applied'
+        self.lock = threading.Lock()
+        self._repair()
+        self.file = open(path, 'ab')
+        self.applied = self._read_checkpoint()
+        self.pending_count = sum(1 for _ in self._read_from(self.applied))
+
+    def _repair(self):
+        # Baris terakhir yang terpotong (crash saat menulis) dibuang agar append berikutnya tidak rusak
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                logging.warning(f"Till journal {self.path}: dropping {len(data) - end} bytes of incomplete entry")
+                f.truncate(end)
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                offset = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+        return offset if offset <= os.path.getsize(self.path) else 0
+
+    def _read_from(self, offset, limit=None):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            count = 0
+            for line in f:
+                if not line.endswith(b'\n') or (limit is not None and count >= limit):
+                    return
+                offset += len(line)
+                count += 1
+                yield offset, line
+
+    def append(self, sale):
+        data = (json.dumps(sale_to_dict(sale)) + '\n').encode('utf-8')
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending_count += 1
+
+    def pending(self, limit=None):
+        # (offset akhir entri, Sale) yang belum diterapkan, sesuai urutan checkout
+        return [(offset, sale_from_dict(json.loads(line))) for offset, line in self._read_from(self.applied, limit)]
+
+    def mark_applied(self, offset, count):
+        with self.lock:
+            self.applied = offset
+            self.pending_count -= count
+            # Jurnal yang sudah habis diterapkan dipotong agar tidak tumbuh tanpa batas
+            if offset >= JOURNAL_ROTATE_BYTES and offset == self.file.tell():
+                self.file.truncate(0)
+                self.applied = 0
+            partial = self.checkpoint_path + '.part'
+            with open(partial, 'w') as f:
+                f.write(str(self.applied))
+            os.replace(partial, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+class JournalReplayer:
+    # Thread latar yang menerapkan jurnal till ke database per batch. Jika database terkunci atau
+    # server tidak terjangkau, entri tetap di jurnal dan dicoba lagi berkala tanpa menahan kasir.
+    def __init__(self, journal, apply, batch_size=JOURNAL_BATCH_SIZE, retry_seconds=JOURNAL_RETRY_SECONDS):
+        self.journal = journal
+        self.apply = apply
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.last_error = None
+        self.applied = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def backlog(self):
+        return self.journal.pending_count
+
+    def submit(self, sale):
+        self.journal.append(sale)
+        self.wake()
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='journal-replay', daemon=True)
+                self._thread.start()
+        self.wakeup.set()
+
+    def replay(self):
+        # Terapkan semua entri tertunda per batch; setiap batch satu transaksi database
+        while True:
+            entries = self.journal.pending(self.batch_size)
+            if not entries:
+                return
+            self.apply([sale for _, sale in entries])
+            self.journal.mark_applied(entries[-1][0], len(entries))
+            self.applied += len(entries)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.retry_seconds if self.backlog else None)
+            self.wakeup.clear()
+            try:
+                self.replay()
+                if self.last_error is not None:
+                    logging.info("Till journal replay resumed.")
+                self.last_error = None
+            except Exception as e:
+                if self.last_error is None:
+                    logging.warning(f"Till journal replay postponed ({self.backlog} pending): {e}")
+                self.last_error = e
+            if self.stopping:
+                break
+
+    def close(self, timeout=5.0):
+        # Coba terapkan sisa jurnal sebelum keluar; yang gagal diterapkan saat aplikasi dibuka lagi
+        self.stopping = True
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self.wakeup.set()
+            thread.join(timeout)
+        if thread is None or not thread.is_alive():
+            self.journal.close()
+
+class POSCore:
+    # Lapisan inti tanpa UI (katalog, keranjang, checkout, laporan) untuk aplikasi Tk, skrip, dan server
+    def __init__(self, db_path, settings=None, tax_rate=0.11, search_limit=200, terminal_id=None,
+                 receipt_dir='struk', journal_path=None, metrics=None):
+        self.db = ConnectionManager(db_path, settings, metrics)
+        self.tax_rate = tax_rate
+        self.transaction_ids = TransactionIdGenerator(terminal_id)
+        self.receipts = ReceiptWriter(ReceiptJournal(receipt_dir), tax_rate)
+        migrate(self.db.writer)
+        fts_enabled = create_product_fts(self.db.writer)
+        self.catalog = Catalog(self.db, fts_enabled, search_limit)
+        self.journal = None
+        if journal_path:
+            self.journal = JournalReplayer(TillJournal(journal_path), self.apply_journaled)
+            self.restore_journal()
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+        self.receipts.close()
+        self.db.close()
+
+    def restore_journal(self):
+        # Transaksi jurnal yang belum masuk database tetap mengurangi stok di index, lalu replay dimulai
+        pending = [sale for _, sale in self.journal.journal.pending()]
+        if not pending:
+            return
+        with self.db.reader() as conn:
+            committed = existing_transactions(conn, [sale.transaction_id for sale in pending])
+        for sale in pending:
+            if sale.transaction_id not in committed:
+                self.catalog.apply_sale(sale)
+        logging.info(f"Till journal: replaying {len(pending)} pending transactions.")
+        self.journal.wake()
+
+    def new_cart(self):
+        return Cart(self.tax_rate)
+
+    def build_sale(self, cart, payment_method='Tunai', customer_name='', notes=''):
+        now = datetime.datetime.now()
+        subtotal = cart.subtotal
+        tax = subtotal * self.tax_rate
+        return Sale(self.transaction_ids.next(), now.strftime('%Y-%m-%d %H:%M:%S'), list(cart.copy()),
+                    subtotal, tax, subtotal + tax, payment_method, customer_name, notes)
+
+    def record_sale(self, cursor, sale, allow_oversell=False):
+        # Simpan transaksi ke database
+        cursor.execute('''
+            INSERT INTO sales (
+                transaction_id, date, total_items, subtotal, tax, 
+                total_amount, payment_method, customer_name, notes
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            sale.transaction_id,
+            sale.date,
+            len(sale.lines),
+            sale.subtotal,
+            sale.tax,
+            sale.total,
+            sale.payment_method,
+            sale.customer_name,
+            sale.notes
+        ))
+        
+        # Kurangi stok sekaligus dengan guard quantity >= jumlah agar till lain tidak bisa oversell
+        quantities = json.dumps([[line.product_id, line.quantity] for line in sale.lines])
+        if allow_oversell:
+            rows = cursor.execute(STOCK_FORCE_DECREMENT_SQL, (sale.date, quantities)).fetchall()
+            for product_id, quantity in rows:
+                if quantity < 0:
+                    logging.warning(f"Product {product_id} oversold by {-quantity} in {sale.transaction_id}")
+        else:
+            updated = {row[0] for row in cursor.execute(STOCK_DECREMENT_SQL, (sale.date, quantities))}
+            if len(updated) < len({line.product_id for line in sale.lines}):
+                self.raise_stock_error(cursor, sale, updated)
+        
+        cursor.executemany('''
+            INSERT INTO sale_items (
+                transaction_id, product_id, product_name, barcode,
+                quantity, unit_price, total_price, unit_cost
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT capital_price FROM products WHERE id = ?), 0))
+        ''', [(sale.transaction_id, line.product_id, line.name, line.barcode,
+               line.quantity, line.unit_price, line.total, line.product_id) for line in sale.lines])
+        
+        # Perbarui ringkasan penjualan harian dalam transaksi yang sama
+        cursor.executemany(ROLLUP_UPSERT_SQL, [(
+            sale.date[:10], line.product_id, line.quantity, line.total, line.quantity, line.product_id,
+            line.total * self.tax_rate
+        ) for line in sale.lines])
+
+    def raise_stock_error(self, cursor, sale, updated):
+        # Laporkan baris yang gagal beserta stok sebenarnya di database
+        failed = [line for line in sale.lines if line.product_id not in updated]
+        ids = [line.product_id for line in failed]
+        stock = dict(cursor.execute(
+            f"SELECT id, quantity FROM products WHERE id IN ({','.join('?' * len(ids))})", ids))
+        raise StockError([(line, stock.get(line.product_id)) for line in failed])
+
+    def checkout(self, cart, payment_method='Tunai', customer_name='', notes=''):
+        if not cart.lines:
+            raise ValueError("Keranjang belanja kosong")
+        if self.journal is not None and self.journal.backlog:
+            # Jurnal masih menunggu database yang terkunci: transaksi berikutnya ikut antre di jurnal
+            return self.checkout_journaled(self.build_sale(cart, payment_method, customer_name, notes))
+        sale = self.build_sale(cart, payment_method, customer_name, notes)
+        
+        def write(cursor):
+            # BEGIN IMMEDIATE mengambil kunci tulis di awal sehingga cek stok dan commit atomik
+            cursor.execute('BEGIN IMMEDIATE')
+            self.record_sale(cursor, sale)
+        
+        try:
+            self.db.write(write)
+        except StockError as e:
+            # Index di memori bisa tertinggal dari till lain; samakan dengan stok di database
+            for line, available in e.failures:
+                if available is not None:
+                    self.catalog.index.set_quantity(line.product_id, available)
+            raise
+        except sqlite3.OperationalError as e:
+            # Jurnal hanya cadangan saat database terkunci; jalur normal tetap memakai guard stok di SQL
+            if self.journal is None or not is_lock_error(e):
+                raise
+            logging.warning(f"Database locked, journaling checkout {sale.transaction_id}: {e}")
+            return self.checkout_journaled(sale)
+        self.catalog.apply_sale(sale)
+        return sale
+
+    def checkout_journaled(self, sale):
+        # Stok dicek dari index, transaksi di-fsync ke jurnal lalu diterapkan di latar saat database bebas
+        check_stock(self.catalog.index, sale.lines)
+        self.journal.submit(sale)
+        self.catalog.apply_sale(sale)
+        return sale
+
+    def checkout_many(self, carts, payment_method='Tunai'):
+        # Banyak transaksi dalam satu commit; savepoint per keranjang agar satu kegagalan
+        # tidak membatalkan yang lain. Hasil berisi Sale atau exception per keranjang.
+        return self.commit_sales([self.build_sale(cart, payment_method) if cart.lines else None
+                                  for cart in carts])
+
+    def commit_sales(self, sales):
+        # Sale yang sudah dibangun (None = keranjang kosong) di-commit bersama, dipakai juga oleh server
+        results = []
+        
+        def write(cursor):
+            cursor.execute('BEGIN IMMEDIATE')
+            for sale in sales:
+                if sale is None:
+                    results.append(ValueError("Keranjang belanja kosong"))
+                    continue
+                cursor.execute('SAVEPOINT checkout_cart')
+                try:
+                    self.record_sale(cursor, sale)
+                    cursor.execute('RELEASE checkout_cart')
+                    results.append(sale)
+                except (sqlite3.Error, StockError) as e:
+                    cursor.execute('ROLLBACK TO checkout_cart')
+                    cursor.execute('RELEASE checkout_cart')
+                    results.append(e)
+        
+        self.db.write(write)
+        for result in results:
+            if isinstance(result, Sale):
+                self.catalog.apply_sale(result)
+            elif isinstance(result, StockError):
+                for line, available in result.failures:
+                    if available is not None:
+                        self.catalog.index.set_quantity(line.product_id, available)
+        return results
+
+    def apply_journaled(self, sales):
+        # Terapkan transaksi dari jurnal till dalam satu commit. Idempoten: transaction_id yang sudah
+        # ada di database dilewati, jadi replay ulang setelah crash aman. Mengembalikan Sale yang baru masuk.
+        applied = []
+        
+        def write(cursor):
+            cursor.execute('BEGIN IMMEDIATE')
+            committed = existing_transactions(cursor, [sale.transaction_id for sale in sales])
+            for sale in sales:
+                if sale.transaction_id in committed:
+                    continue
+                self.record_sale(cursor, sale, allow_oversell=True)
+                committed.add(sale.transaction_id)
+                applied.append(sale)
+        
+        self.db.write(write)
+        return applied
+
+    def import_products(self, path, progress=None):
+        return self.catalog.import_products(read_product_file(path), progress=progress)
+
+    def export_products(self, path, progress=None, cancel=None):
+        with self.db.reader() as conn:
+            return export_products(conn, path, progress=progress, cancel=cancel)
+
+    def export_report(self, report_type, path, fmt='csv', date_from=None, date_to=None,
+                      progress=None, cancel=None):
+        with self.db.reader() as conn:
+            return export_report(conn, report_type, path, fmt, date_from, date_to,
+                                 progress=progress, cancel=cancel)
+
+    def archive_sales(self, before_year=None, vacuum=False, progress=None):
+        # Koneksi terpisah: penyalinan ke arsip tidak menahan koneksi penulis, penghapusan per bulan
+        # hanya mengambil kunci tulis sebentar sehingga till tetap bisa checkout
+        settings = self.db.settings
+        if before_year is None:
+            before_year = datetime.date.today().year - int(settings['archive_keep_years'])
+        conn = self.db._connect()
+        try:
+            results = archive_sales(conn, before_year, settings['archive_dir'], progress)
+            if vacuum and results:
+                # Kecilkan file database utama (butuh kunci eksklusif; jalankan di luar jam buka)
+                start = time.perf_counter()
+                conn.execute('VACUUM')
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                logging.info(f"Vacuumed database in {time.perf_counter() - start:.1f} s.")
+            return results
+        finally:
+            conn.close()
+
+    def reprint_receipt(self, transaction_id):
+        # Cari di antrean/jurnal dulu; struk lama (sebelum ada jurnal) dibangun ulang dari database
+        text = self.receipts.read(transaction_id)
+        if text is None:
+            with self.db.reader() as conn:
+                sale = load_sale(conn, transaction_id)
+            if sale is not None:
+                text = render_receipt(sale, self.tax_rate)
+        return text
+
+    def report_chunks(self, report_type, date_from=None, date_to=None, chunk_size=REPORT_CHUNK_SIZE):
+        with self.db.reader() as conn:
+            yield from report_chunks(conn, report_type, date_from, date_to, chunk_size)
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import datetime
+import http.server
+
+# Instrumentasi: latensi per statement SQL, baris, tunggu kunci, query lambat (dengan EXPLAIN QUERY PLAN),
+# lag event loop (Tk/asyncio), dan error handler. Diekspor sebagai file teks Prometheus atau endpoint JSON.
+
+METRICS_DEFAULTS = {
+    'enabled': '0',
+    'slow_query_ms': '100',
+    'slow_log': 'slow_queries.log',
+    'explain': '1',
+    'prometheus_file': '',  # mis. /var/lib/node_exporter/pos.prom untuk textfile collector
+    'port': '',  # port HTTP lokal untuk /metrics (teks Prometheus) dan /metrics.json
+    'interval': '15',
+}
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0)
+MAX_STATEMENTS = 500
+SLOW_WARNING_INTERVAL = 60.0
+STATEMENT_LABEL_LENGTH = 200
+NO_EXPLAIN = ('BEGIN', 'COMMIT', 'END', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA', 'EXPLAIN', 'ANALYZE',
+              'VACUUM', 'CREATE', 'DROP', 'ALTER')
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\?(\s*,\s*\?)+')
+
+def normalize_sql(sql):
+    # Satu label per bentuk statement: spasi dirapikan, daftar IN (?, ?, ...) dengan panjang berbeda disatukan
+    return _PLACEHOLDER_LIST.sub('?, ...', _WHITESPACE.sub(' ', sql).strip())[:STATEMENT_LABEL_LENGTH]
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        # Perkiraan dari bucket (batas atas bucket tempat kuantil jatuh)
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5) if self.count else None,
+            'p99': self.quantile(0.99) if self.count else None,
+            'buckets': dict(zip((str(bound) for bound in self.buckets), self.counts)),
+        }
+
+class Metrics:
+    def __init__(self, slow_query_seconds=0.1, slow_log=None, explain=True):
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_log = slow_log
+        self.explain = explain
+        self.statements = {}
+        self.rows = {}
+        self.locks = {}
+        self.loop_lag = {}
+        self.errors = {}
+        self.slow_queries = 0
+        self.plans = {}
+        self.keys = {}  # teks SQL -> label; regex normalisasi hanya sekali per teks
+        self.warned = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def statement_key(self, sql):
+        key = self.keys.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if key not in self.statements and len(self.statements) >= MAX_STATEMENTS:
+                key = 'other'
+            if len(self.keys) >= MAX_STATEMENTS * 10:
+                self.keys.clear()
+            self.keys[sql] = key
+        return key
+
+    def observe_statement(self, conn, sql, params, elapsed, rows=None):
+        key = self.statement_key(sql)
+        with self._lock:
+            histogram = self.statements.get(key)
+            if histogram is None:
+                histogram = self.statements[key] = Histogram()
+            histogram.observe(elapsed)
+            if rows is not None and rows > 0:
+                self.rows[key] = self.rows.get(key, 0) + rows
+        if key.upper().startswith('BEGIN'):
+            # Lama BEGIN IMMEDIATE = waktu menunggu kunci tulis dari koneksi/proses lain
+            self.observe_lock('sqlite_begin', elapsed)
+        if elapsed >= self.slow_query_seconds:
+            self.log_slow_query(conn, key, sql, params, elapsed)
+        return key
+
+    def add_rows(self, key, count):
+        if count:
+            with self._lock:
+                self.rows[key] = self.rows.get(key, 0) + count
+
+    def observe_lock(self, name, elapsed):
+        with self._lock:
+            histogram = self.locks.get(name)
+            if histogram is None:
+                histogram = self.locks[name] = Histogram()
+            histogram.observe(elapsed)
+
+    def observe_lag(self, loop, lag):
+        with self._lock:
+            histogram = self.loop_lag.get(loop)
+            if histogram is None:
+                histogram = self.loop_lag[loop] = Histogram()
+            histogram.observe(lag)
+
+    def count_error(self, source, error):
+        name = (source, type(error).__name__)
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def query_plan(self, conn, key, sql, params):
+        # Rencana query disimpan per bentuk statement; cukup diambil sekali
+        if not self.explain or key.split(' ', 1)[0].upper() in NO_EXPLAIN:
+            return None
+        plan = self.plans.get(key)
+        if plan is None:
+            try:
+                # Cursor biasa agar EXPLAIN tidak ikut terukur
+                cursor = sqlite3.Cursor(conn)
+                plan = [row[3] for row in cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN gagal: {e}"]
+            self.plans[key] = plan
+        return plan
+
+    def log_slow_query(self, conn, key, sql, params, elapsed):
+        plan = self.query_plan(conn, key, sql, params)
+        self.slow_queries += 1
+        # Log aplikasi cukup sekali per statement per menit; detail lengkap tetap masuk slow_log
+        now = time.monotonic()
+        if now - self.warned.get(key, -SLOW_WARNING_INTERVAL) >= SLOW_WARNING_INTERVAL:
+            self.warned[key] = now
+            logging.warning(f"Slow query ({elapsed * 1000:.1f} ms): {key}")
+        if not self.slow_log:
+            return
+        entry = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(elapsed * 1000, 3),
+            'sql': _WHITESPACE.sub(' ', sql).strip(),
+            'params': [repr(value)[:100] for value in params][:20] if isinstance(params, (list, tuple)) else None,
+            'thread': threading.current_thread().name,
+            'plan': plan,
+        }
+        try:
+            with self._log_lock, open(self.slow_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            logging.error(f"Cannot write slow query log {self.slow_log}: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.started,
+                'slow_queries': self.slow_queries,
+                'statements': {key: dict(histogram.to_dict(), rows=self.rows.get(key, 0))
+                               for key, histogram in self.statements.items()},
+                'locks': {name: histogram.to_dict() for name, histogram in self.locks.items()},
+                'loop_lag': {loop: histogram.to_dict() for loop, histogram in self.loop_lag.items()},
+                'errors': [{'source': source, 'type': kind, 'count': count}
+                           for (source, kind), count in self.errors.items()],
+            }
+
+    def prometheus(self):
+        # Format teks eksposisi Prometheus
+        out = []
+        with self._lock:
+            write_histogram(out, 'pos_sql_statement_seconds', "Latensi statement SQLite", 'statement',
+                            self.statements)
+            out.append("# HELP pos_sql_rows_total Baris yang diubah atau di-fetch per statement")
+            out.append("# TYPE pos_sql_rows_total counter")
+            for key, rows in self.rows.items():
+                out.append(f'pos_sql_rows_total{{statement="{escape_label(key)}"}} {rows}')
+            write_histogram(out, 'pos_lock_wait_seconds', "Waktu menunggu kunci tulis", 'lock', self.locks)
+            write_histogram(out, 'pos_event_loop_lag_seconds', "Keterlambatan event loop", 'loop',
+                            self.loop_lag)
+            out.append("# HELP pos_errors_total Error per sumber dan tipe")
+            out.append("# TYPE pos_errors_total counter")
+            for (source, kind), count in self.errors.items():
+                out.append(f'pos_errors_total{{source="{escape_label(source)}",type="{escape_label(kind)}"}} {count}')
+            out.append("# HELP pos_slow_queries_total Query di atas ambang slow query")
+            out.append("# TYPE pos_slow_queries_total counter")
+            out.append(f"pos_slow_queries_total {self.slow_queries}")
+        return '\n'.join(out) + '\n'
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_histogram(out, name, help_text, label, histograms):
+    out.append(f"# HELP {name} {help_text}")
+    out.append(f"# TYPE {name} histogram")
+    for key, histogram in histograms.items():
+        labels = f'{label}="{escape_label(key)}"'
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        out.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+        out.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Ukur setiap execute/executemany; baris dihitung dari rowcount (DML), iterasi, dan fetch*
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            self.connection.metrics.count_error('sqlite', e)
+            raise
+        finally:
+            self._metrics_key = self.connection.metrics.observe_statement(
+                self.connection, sql, parameters, time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            self.connection.metrics.count_error('sqlite', e)
+            raise
+        finally:
+            self._metrics_key = self.connection.metrics.observe_statement(
+                self.connection, sql, seq_of_parameters[0] if seq_of_parameters else (),
+                time.perf_counter() - start, self.rowcount)
+
+    def __next__(self):
+        row = super().__next__()
+        self.connection.metrics.add_rows(self._metrics_key, 1)
+        return row
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self.connection.metrics.add_rows(self._metrics_key, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.connection.metrics.add_rows(self._metrics_key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.connection.metrics.add_rows(self._metrics_key, len(rows))
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    metrics = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class LoopLagMonitor:
+    # Heartbeat Tk: selisih antara jadwal after() dan saat callback benar-benar jalan
+    def __init__(self, root, metrics, interval_ms=100, name='tk'):
+        self.root = root
+        self.metrics = metrics
+        self.interval = interval_ms / 1000.0
+        self.interval_ms = interval_ms
+        self.name = name
+        self.expected = None
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval
+        self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.metrics.observe_lag(self.name, max(0.0, now - self.expected))
+        self.expected = now + self.interval
+        self.root.after(self.interval_ms, self._tick)
+
+async def monitor_asyncio_lag(metrics, interval=0.1, name='asyncio'):
+    # Versi asyncio untuk pos_server
+    import asyncio
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        metrics.observe_lag(name, max(0.0, time.perf_counter() - expected))
+
+class MetricsExporter:
+    # Tulis file teks Prometheus berkala (atomik) dan/atau layani /metrics dan /metrics.json di localhost
+    def __init__(self, metrics, prometheus_file=None, port=None, interval=15.0):
+        self.metrics = metrics
+        self.prometheus_file = prometheus_file
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+        self.server = None
+        if prometheus_file:
+            self.thread = threading.Thread(target=self._run, name='metrics-export', daemon=True)
+            self.thread.start()
+        if port:
+            self.server = http.server.ThreadingHTTPServer(('127.0.0.1', int(port)), self._handler())
+            threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+            logging.info(f"Metrics available at http://127.0.0.1:{port}/metrics")
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def write_file(self):
+        partial = self.prometheus_file + '.part'
+        try:
+            with open(partial, 'w', encoding='utf-8') as f:
+                f.write(self.metrics.prometheus())
+            os.replace(partial, self.prometheus_file)
+        except OSError as e:
+            logging.error(f"Cannot write metrics file {self.prometheus_file}: {e}")
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            self.write_file()
+
+    def close(self):
+        self.stopping.set()
+        if self.prometheus_file:
+            self.write_file()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+def metrics_from_config(section):
+    # section: bagian [Metrics] config.ini; None jika instrumentasi nonaktif
+    settings = dict(METRICS_DEFAULTS, **dict(section or {}))
+    if settings['enabled'].strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return None, None
+    metrics = Metrics(float(settings['slow_query_ms']) / 1000.0, settings['slow_log'].strip() or None,
+                      settings['explain'].strip().lower() in ('1', 'true', 'yes', 'on'))
+    exporter = MetricsExporter(metrics, settings['prometheus_file'].strip() or None,
+                               settings['port'].strip() or None, float(settings['interval']))
+    return metrics, exporter
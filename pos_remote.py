@@ -0,0 +1,354 @@
+import errno
+import http.client
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import urllib.parse
+
+from pos_core import (
+    FIRST_DATE, MOVEMENT_PAGE_SIZE, OPEN_DATE_TO, PAGE_FILTERS, PRODUCT_FILE_COLUMNS, PRODUCT_LIST_COLUMNS,
+    PRODUCT_PAGE_SIZE, REPORTS, BarcodeIndex, Cart, CartLine, ImportResult, JournalReplayer, POSCore,
+    ProductRecord, StockError, TillJournal, TransactionIdGenerator, check_stock, parse_product_row,
+    read_product_file, record_to_list, sale_from_dict, sale_to_dict, write_product_file, write_report,
+)
+
+# Mode remote untuk aplikasi Tk: antarmuka sama dengan POSCore, tetapi semua akses database lewat
+# layanan pos_server. Index barcode tetap disalin ke till agar scan tidak perlu round-trip;
+# stok di server tetap penentu akhir saat checkout.
+
+REMOTE_TIMEOUT = 10
+INDEX_PAGE_SIZE = 20000
+IMPORT_PAGE_SIZE = 2000  # baris import per request, jauh di bawah REMOTE_TIMEOUT
+EXPORT_PAGE_SIZE = 5000
+
+class RemoteError(RuntimeError):
+    pass
+
+def server_unreachable(error):
+    # Hanya kegagalan sebelum request terkirim; timeout/putus di tengah bisa berarti server sudah commit
+    if isinstance(error, (ConnectionRefusedError, socket.gaierror)):
+        return True
+    return isinstance(error, OSError) and error.errno in (errno.ENETUNREACH, errno.EHOSTUNREACH)
+
+class RemoteClient:
+    # Satu koneksi HTTP keep-alive per thread (thread UI dan thread DatabaseWorker)
+    def __init__(self, url, timeout=REMOTE_TIMEOUT):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def reset(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self.local.conn = None
+
+    def send(self, method, path, params=None, body=None):
+        if params:
+            path += '?' + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        # Koneksi keep-alive yang sudah ditutup server dicoba ulang sekali dengan koneksi baru
+        for attempt in (0, 1):
+            try:
+                conn = self.connection()
+                conn.request(method, path, payload, headers)
+                return conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.reset()
+                if attempt:
+                    raise
+            except OSError:
+                self.reset()
+                raise
+
+    def request(self, method, path, params=None, body=None):
+        response = self.send(method, path, params, body)
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise remote_error(response.status, data)
+        return data
+
+    def stream(self, path, params=None):
+        # Respons chunked: satu baris JSON per potongan
+        response = self.send('GET', path, params)
+        if response.status != 200:
+            raise remote_error(response.status, json.loads(response.read()))
+        finished = False
+        try:
+            while True:
+                line = response.readline()
+                if not line:
+                    finished = True
+                    break
+                data = json.loads(line)
+                if isinstance(data, dict) and 'error' in data:
+                    raise remote_error(500, data)
+                yield data
+        finally:
+            # Respons yang tidak dibaca sampai habis membuat koneksi tidak bisa dipakai ulang
+            if not finished:
+                self.reset()
+
+    def close(self):
+        self.reset()
+
+def remote_error(status, data):
+    # Bangun ulang exception yang dikenali UI dari respons error server
+    message = data.get('error', f"HTTP {status}")
+    kind = data.get('type')
+    if kind == 'StockError':
+        return StockError([(CartLine(product_id, barcode, name, 0.0, quantity), available)
+                           for product_id, barcode, name, quantity, available in data['failures']])
+    if kind == 'IntegrityError':
+        return sqlite3.IntegrityError(message)
+    if status in (400, 404):
+        return ValueError(message)
+    return RemoteError(message)
+
+class RemoteDatabase:
+    # Pengganti ConnectionManager untuk DatabaseWorker: jumlah thread baca paralel ke server
+    def __init__(self, read_size=2):
+        self.read_size = read_size
+
+class RemoteReceipts:
+    # Struk sudah dijurnal oleh server saat checkout
+    def submit(self, sale):
+        pass
+
+    def close(self):
+        pass
+
+class RemoteCatalog:
+    def __init__(self, client, search_limit=200):
+        self.client = client
+        self.search_limit = search_limit
+        self.index = BarcodeIndex()
+        self.refresh()
+
+    def refresh(self):
+        # Salin index barcode dari server per halaman id
+        index = BarcodeIndex()
+        after_id = 0
+        while True:
+            rows = self.client.request('GET', '/products/index',
+                                       {'after_id': after_id, 'limit': INDEX_PAGE_SIZE})
+            for row in rows:
+                index.put(ProductRecord(*row))
+            if len(rows) < INDEX_PAGE_SIZE:
+                break
+            after_id = rows[-1][0]
+        self.index = index
+        logging.info(f"Remote barcode index loaded: {len(index)} products.")
+
+    def lookup(self, barcode):
+        # Hanya salinan index di memori; aman dipanggil dari loop Tk
+        return self.index.get(barcode)
+
+    def fetch(self, barcode):
+        # Produk baru atau stok dari till lain belum ada di salinan index: tanyakan ke server (jalankan di worker)
+        try:
+            record = ProductRecord(*self.client.request('GET', '/products/lookup', {'barcode': barcode}))
+        except ValueError:
+            stale = self.index.get(barcode)
+            if stale is not None:
+                self.index.remove(stale.id)
+            return None
+        self.index.put(record)
+        return record
+
+    def search(self, search_term, columns=PRODUCT_LIST_COLUMNS, limit=None):
+        rows = self.client.request('GET', '/products/search', {
+            'q': search_term, 'columns': ','.join(columns), 'limit': limit or self.search_limit})
+        return [tuple(row) for row in rows]
+
+    def page(self, where='', after=None, before=None, limit=PRODUCT_PAGE_SIZE):
+        names = {sql: name for name, sql in PAGE_FILTERS.items()}
+        if where not in names:
+            raise ValueError("Filter daftar produk tidak didukung di mode remote")
+        params = {'filter': names[where], 'limit': limit}
+        if after is not None:
+            params.update(after_name=after[0], after_id=after[1])
+        elif before is not None:
+            params.update(before_name=before[0], before_id=before[1])
+        return [tuple(row) for row in self.client.request('GET', '/products/page', params)]
+
+    def movement_history(self, product_id, date_from=None, date_to=None, after=None, limit=MOVEMENT_PAGE_SIZE):
+        params = {'product_id': product_id, 'date_from': date_from, 'date_to': date_to}
+        if after is not None:
+            params.update(after_date=after[0], after_id=after[1])
+        return [tuple(row) for row in self.client.request('GET', '/products/history', params)]
+
+    def low_stock_count(self):
+        return self.client.request('GET', '/products/low_stock_count')
+
+    def add_product(self, record):
+        record = ProductRecord(*self.client.request('POST', '/products/add',
+                                                    body={'product': record_to_list(record)}))
+        self.index.put(record)
+        return record
+
+    def update_product(self, record):
+        record = ProductRecord(*self.client.request('POST', '/products/update',
+                                                    body={'product': record_to_list(record)}))
+        self.index.put(record)
+        return record
+
+    def delete_product(self, product_id):
+        self.client.request('POST', '/products/delete', body={'product_id': product_id})
+        self.index.remove(product_id)
+
+    def apply_sale(self, sale):
+        for line in sale.lines:
+            self.index.adjust_quantity(line.product_id, -line.quantity)
+
+class RemoteCore:
+    # Antarmuka POSCore yang dipakai aplikasi Tk, dilayani oleh pos_server
+    def __init__(self, url, search_limit=200, read_size=2, terminal_id=None, journal_path=None):
+        self.client = RemoteClient(url)
+        config = self.client.request('GET', '/config')
+        self.tax_rate = config['tax_rate']
+        self.transaction_ids = TransactionIdGenerator(terminal_id)
+        self.db = RemoteDatabase(read_size)
+        self.receipts = RemoteReceipts()
+        self.catalog = RemoteCatalog(self.client, search_limit)
+        self.journal = None
+        if journal_path:
+            # Transaksi jurnal yang belum sampai ke server belum terlihat di salinan index
+            self.journal = JournalReplayer(TillJournal(journal_path), self.apply_journaled)
+            for _, sale in self.journal.journal.pending():
+                self.catalog.apply_sale(sale)
+            if self.journal.backlog:
+                self.journal.wake()
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+        self.client.close()
+
+    def new_cart(self):
+        return Cart(self.tax_rate)
+
+    # Mode jurnal membuat transaksi di till sendiri, dengan ID dari generator till ini
+    build_sale = POSCore.build_sale
+
+    def apply_journaled(self, sales):
+        return self.client.request('POST', '/sales/apply',
+                                   body={'sales': [sale_to_dict(sale) for sale in sales]})
+
+    def price_cart(self, cart):
+        # Harga dan total menurut server, untuk memeriksa keranjang sebelum pembayaran
+        return self.client.request('POST', '/cart/price', body={
+            'lines': [[line.product_id, line.quantity] for line in cart]})
+
+    def checkout(self, cart, payment_method='Tunai', customer_name='', notes=''):
+        if not cart.lines:
+            raise ValueError("Keranjang belanja kosong")
+        if self.journal is not None and self.journal.backlog:
+            # Server masih belum menerima isi jurnal: transaksi berikutnya ikut antre di jurnal
+            return self.checkout_journaled(self.build_sale(cart, payment_method, customer_name, notes))
+        try:
+            sale = sale_from_dict(self.client.request('POST', '/checkout', body={
+                'lines': [[line.product_id, line.quantity] for line in cart],
+                'payment_method': payment_method,
+                'customer_name': customer_name,
+                'notes': notes,
+            }))
+        except StockError as e:
+            for line, available in e.failures:
+                if available is not None:
+                    self.catalog.index.set_quantity(line.product_id, available)
+            raise
+        except OSError as e:
+            # Jurnal hanya cadangan saat server tidak terjangkau; normalnya server mengecek stok dan harga
+            if self.journal is None or not server_unreachable(e):
+                raise
+            logging.warning(f"POS service unreachable, journaling checkout: {e}")
+            return self.checkout_journaled(self.build_sale(cart, payment_method, customer_name, notes))
+        self.catalog.apply_sale(sale)
+        return sale
+
+    def checkout_journaled(self, sale):
+        check_stock(self.catalog.index, sale.lines)
+        self.journal.submit(sale)
+        self.catalog.apply_sale(sale)
+        return sale
+
+    def report_chunks(self, report_type, date_from=None, date_to=None, chunk_size=None):
+        if REPORTS[report_type]['uses_dates']:
+            # Sama seperti report_chunks lokal: tanpa tanggal = seluruh riwayat
+            date_from = date_from or FIRST_DATE
+            date_to = date_to or OPEN_DATE_TO
+        for chunk in self.client.stream('/reports', {'type': report_type, 'date_from': date_from,
+                                                     'date_to': date_to}):
+            yield [tuple(row) for row in chunk]
+
+    def reprint_receipt(self, transaction_id):
+        try:
+            return self.client.request('GET', '/receipts', {'transaction_id': transaction_id})['text']
+        except ValueError:
+            return None
+
+    def import_products(self, path, progress=None):
+        # File dibaca dan divalidasi di till; baris valid dikirim ke server per batch
+        result = ImportResult()
+        batch = []
+        
+        def flush():
+            data = self.client.request('POST', '/products/import', body={'rows': batch})
+            result.inserted += data['inserted']
+            result.updated += data['updated']
+            result.errors.extend((line_no, error) for line_no, error in data['errors'])
+            batch.clear()
+            if progress is not None:
+                progress(result.rows)
+        
+        for line_no, data in read_product_file(path):
+            result.rows += 1
+            try:
+                parse_product_row(data)
+            except ValueError as e:
+                result.errors.append((line_no, str(e)))
+                continue
+            batch.append([line_no, data])
+            if len(batch) >= IMPORT_PAGE_SIZE:
+                flush()
+        if batch:
+            flush()
+        result.errors.sort()
+        self.catalog.refresh()
+        return result
+
+    def export_products(self, path, progress=None, cancel=None):
+        # Katalog diambil per halaman (keyset nama, id) dari server lalu ditulis di till
+        positions = [PRODUCT_LIST_COLUMNS.index(column) for column in PRODUCT_FILE_COLUMNS]
+        name_at, id_at = PRODUCT_LIST_COLUMNS.index('name'), PRODUCT_LIST_COLUMNS.index('id')
+        
+        def pages():
+            after = None
+            while True:
+                rows = self.catalog.page(after=after, limit=EXPORT_PAGE_SIZE)
+                if rows:
+                    yield [tuple(row[i] for i in positions) for row in rows]
+                if len(rows) < EXPORT_PAGE_SIZE:
+                    break
+                after = (rows[-1][name_at], rows[-1][id_at])
+        
+        return write_product_file(path, pages(), progress=progress, cancel=cancel)
+
+    def export_report(self, report_type, path, fmt='csv', date_from=None, date_to=None,
+                      progress=None, cancel=None):
+        # Baris laporan di-stream dari server (/reports) dan ditulis di till
+        return write_report(report_type, path, fmt, self.report_chunks(report_type, date_from, date_to),
+                            progress=progress, cancel=cancel)
@@ -0,0 +1,442 @@
+import asyncio
+import argparse
+import concurrent.futures
+import configparser
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import urllib.parse
+
+from pos_core import (
+    DATABASE_DEFAULTS, PAGE_FILTERS, PRODUCT_LIST_COLUMNS, PRODUCT_PAGE_SIZE, REPORTS, CartLine, POSCore,
+    ProductRecord, Sale, StockError, record_to_list, sale_from_dict, sale_to_dict,
+)
+from pos_metrics import METRICS_DEFAULTS, metrics_from_config, monitor_asyncio_lag
+
+# Layanan HTTP/JSON lokal di depan inventory.db agar beberapa till dalam satu toko berbagi stok.
+# Server memegang satu-satunya koneksi penulis; checkout dari semua till dikumpulkan lalu di-commit
+# bersama (group commit), pembacaan memakai pool koneksi read-only milik ConnectionManager.
+
+SERVER_DEFAULTS = {
+    'host': '127.0.0.1',
+    'port': '8765',
+    'batch_size': '100',
+    'batch_ms': '0',  # 0 = commit segera; checkout yang datang saat commit berjalan ikut batch berikutnya
+}
+REPORT_STREAM_QUEUE = 4
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict',
+                500: 'Internal Server Error'}
+
+class NotFound(LookupError):
+    pass
+
+def error_to_dict(error):
+    data = {'error': str(error), 'type': type(error).__name__}
+    if isinstance(error, StockError):
+        data['failures'] = [[line.product_id, line.barcode, line.name, line.quantity, available]
+                            for line, available in error.failures]
+    return data
+
+def error_status(error):
+    if isinstance(error, NotFound):
+        return 404
+    if isinstance(error, (StockError, sqlite3.IntegrityError)):
+        return 409
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        return 400
+    return 500
+
+class POSService:
+    # Endpoint JSON untuk katalog, harga keranjang, checkout, laporan, dan cetak ulang struk
+    def __init__(self, core, batch_size=100, batch_ms=0, metrics=None):
+        self.core = core
+        self.metrics = metrics
+        self.catalog = core.catalog
+        self.batch_size = batch_size
+        self.batch_ms = batch_ms
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=core.db.read_size, thread_name_prefix='api-read')
+        self.write_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='api-write')
+        self.pending = None
+        self.batches = 0
+        self.batched_sales = 0
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/config'): self.config,
+            ('GET', '/products/lookup'): self.lookup,
+            ('GET', '/products/search'): self.search,
+            ('GET', '/products/page'): self.page,
+            ('GET', '/products/index'): self.index_page,
+            ('GET', '/products/history'): self.history,
+            ('GET', '/products/low_stock_count'): self.low_stock_count,
+            ('POST', '/products/add'): self.add_product,
+            ('POST', '/products/update'): self.update_product,
+            ('POST', '/products/delete'): self.delete_product,
+            ('POST', '/products/import'): self.import_products,
+            ('POST', '/cart/price'): self.price_cart,
+            ('POST', '/checkout'): self.checkout,
+            ('POST', '/sales/apply'): self.apply_sales,
+            ('GET', '/receipts'): self.receipt,
+            ('GET', '/metrics'): self.metrics_snapshot,
+        }
+
+    async def serve(self, host, port):
+        self.pending = asyncio.Queue()
+        writer_task = asyncio.create_task(self.batch_writer())
+        if self.metrics is not None:
+            lag_task = asyncio.create_task(monitor_asyncio_lag(self.metrics))
+        server = await asyncio.start_server(self.handle_client, host, port)
+        logging.info(f"POS service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            if self.metrics is not None:
+                lag_task.cancel()
+            self.read_executor.shutdown(wait=False, cancel_futures=True)
+            self.write_executor.shutdown(wait=True)
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.read_executor, fn, *args)
+
+    async def write(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.write_executor, fn, *args)
+
+    async def handle_client(self, reader, writer):
+        # HTTP/1.1 minimal dengan keep-alive; satu koneksi per till cukup untuk seluruh sesi
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                await self.dispatch(method, target, body, writer)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body, writer):
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if (method, url.path) == ('GET', '/reports'):
+                await self.stream_report(query, writer)
+                return
+            handler = self.routes.get((method, url.path))
+            if handler is None:
+                raise NotFound(f"Endpoint {method} {url.path} tidak ada")
+            data = json.loads(body) if body else {}
+            status, payload = 200, await handler(query, data)
+        except Exception as e:
+            status, payload = error_status(e), error_to_dict(e)
+            if self.metrics is not None:
+                self.metrics.count_error('api', e)
+            if status == 500:
+                logging.error(f"API error on {method} {url.path}: {e}")
+        await self.respond(writer, status, payload)
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+    async def health(self, query, data):
+        return {'status': 'ok', 'products': len(self.catalog.index),
+                'batches': self.batches, 'batched_sales': self.batched_sales}
+
+    async def metrics_snapshot(self, query, data):
+        # Versi JSON; teks Prometheus lewat [Metrics] prometheus_file atau port
+        if self.metrics is None:
+            raise NotFound("Instrumentasi nonaktif ([Metrics] enabled = 0)")
+        return self.metrics.snapshot()
+
+    async def config(self, query, data):
+        return {'tax_rate': self.core.tax_rate, 'search_limit': self.catalog.search_limit,
+                'page_size': PRODUCT_PAGE_SIZE}
+
+    async def lookup(self, query, data):
+        # Dari index barcode di memori, tanpa thread pool
+        record = self.catalog.lookup(query['barcode'])
+        if record is None:
+            raise NotFound(f"Produk {query['barcode']} tidak ditemukan")
+        return record_to_list(record)
+
+    async def search(self, query, data):
+        columns = tuple(query['columns'].split(',')) if query.get('columns') else PRODUCT_LIST_COLUMNS
+        if not set(columns) <= set(PRODUCT_LIST_COLUMNS):
+            raise ValueError("Kolom tidak dikenal")
+        limit = int(query['limit']) if query.get('limit') else None
+        return await self.read(self.catalog.search, query['q'], columns, limit)
+
+    async def page(self, query, data):
+        # Filter hanya lewat nama yang dikenal, klien tidak pernah mengirim SQL
+        where = PAGE_FILTERS[query.get('filter', '')]
+        after = (query['after_name'], int(query['after_id'])) if 'after_id' in query else None
+        before = (query['before_name'], int(query['before_id'])) if 'before_id' in query else None
+        return await self.read(self.catalog.page, where, after, before,
+                               int(query.get('limit', PRODUCT_PAGE_SIZE)))
+
+    async def index_page(self, query, data):
+        # Snapshot index barcode untuk till, per halaman id
+        after_id = int(query.get('after_id', 0))
+        limit = int(query.get('limit', 10000))
+        by_id = self.catalog.index.by_id
+        ids = sorted(product_id for product_id in list(by_id) if product_id > after_id)[:limit]
+        return [record_to_list(by_id[product_id]) for product_id in ids if product_id in by_id]
+
+    async def history(self, query, data):
+        after = (query['after_date'], int(query['after_id'])) if 'after_id' in query else None
+        return await self.read(self.catalog.movement_history, int(query['product_id']),
+                               query.get('date_from'), query.get('date_to'), after)
+
+    async def low_stock_count(self, query, data):
+        return self.catalog.low_stock_count()
+
+    async def add_product(self, query, data):
+        record = await self.write(self.catalog.add_product, ProductRecord(None, *data['product'][1:]))
+        return record_to_list(record)
+
+    async def update_product(self, query, data):
+        record = await self.write(self.catalog.update_product, ProductRecord(*data['product']))
+        return record_to_list(record)
+
+    async def delete_product(self, query, data):
+        await self.write(self.catalog.delete_product, int(data['product_id']))
+        return {'deleted': data['product_id']}
+
+    async def import_products(self, query, data):
+        # Baris file import dibaca till; validasi dan upsert tetap di server, satu batch per request
+        rows = [(line_no, row) for line_no, row in data['rows']]
+        result = await self.write(self.catalog.import_products, rows)
+        return {'rows': result.rows, 'inserted': result.inserted, 'updated': result.updated,
+                'errors': result.errors}
+
+    def build_cart(self, lines):
+        # Harga selalu dari index server, bukan dari till, agar harga basi di till tidak ikut tersimpan
+        cart = self.core.new_cart()
+        missing = []
+        for product_id, qty in lines:
+            if int(qty) <= 0:
+                raise ValueError("Jumlah harus lebih dari 0")
+            record = self.catalog.index.get_by_id(int(product_id))
+            if record is None:
+                missing.append((CartLine(product_id, '', f"Produk #{product_id}", 0.0, qty), None))
+            else:
+                cart.add(record, int(qty))
+        if missing:
+            raise StockError(missing)
+        return cart
+
+    async def price_cart(self, query, data):
+        cart = self.build_cart(data['lines'])
+        stock = {line.product_id: self.catalog.index.get_by_id(line.product_id).quantity for line in cart}
+        return {
+            'lines': [[line.product_id, line.barcode, line.name, line.unit_price, line.quantity, line.total]
+                      for line in cart],
+            'subtotal': cart.subtotal,
+            'tax': cart.tax,
+            'total': cart.total,
+            'short': [[line.product_id, stock[line.product_id]] for line in cart
+                      if line.quantity > stock[line.product_id]],
+        }
+
+    async def checkout(self, query, data):
+        cart = self.build_cart(data['lines'])
+        if not cart.lines:
+            raise ValueError("Keranjang belanja kosong")
+        sale = self.core.build_sale(cart, data.get('payment_method', 'Tunai'),
+                                    data.get('customer_name', ''), data.get('notes', ''))
+        future = asyncio.get_running_loop().create_future()
+        await self.pending.put((sale, future))
+        result = await future
+        if isinstance(result, Exception):
+            raise result
+        self.core.receipts.submit(result)
+        return sale_to_dict(result)
+
+    async def apply_sales(self, query, data):
+        # Transaksi dari jurnal till (dibuat saat server tidak terjangkau); transaction_id ganda dilewati
+        sales = [self.reprice_sale(sale_from_dict(item)) for item in data['sales']]
+        applied = await self.write(self.apply_journaled, sales)
+        for sale in applied:
+            self.core.receipts.submit(sale)
+        return {'applied': [sale.transaction_id for sale in applied]}
+
+    def apply_journaled(self, sales):
+        # Dijalankan di thread penulis: stok di index diubah berurutan dengan commit_sales milik batch checkout
+        applied = self.core.apply_journaled(sales)
+        for sale in applied:
+            self.catalog.apply_sale(sale)
+        return applied
+
+    def reprice_sale(self, sale):
+        # Sama seperti build_cart: harga dan total dari index server, bukan yang dikirim till
+        lines = []
+        for line in sale.lines:
+            quantity = int(line.quantity)
+            if quantity <= 0:
+                raise ValueError("Jumlah harus lebih dari 0")
+            record = self.catalog.index.get_by_id(int(line.product_id))
+            if record is None:
+                # Produk sudah dihapus di server; transaksi tetap dicatat dengan harga dari till
+                logging.warning(f"Journaled sale {sale.transaction_id}: product {line.product_id} "
+                                f"not found, keeping till price.")
+                lines.append(CartLine(int(line.product_id), line.barcode, line.name, float(line.unit_price),
+                                      quantity))
+                continue
+            if record.selling_price != line.unit_price:
+                logging.info(f"Journaled sale {sale.transaction_id}: repriced product {record.id} "
+                             f"{line.unit_price} -> {record.selling_price}.")
+            lines.append(CartLine(record.id, record.barcode, record.name, record.selling_price, quantity))
+        subtotal = sum(line.total for line in lines)
+        tax = subtotal * self.core.tax_rate
+        return Sale(sale.transaction_id, sale.date, lines, subtotal, tax, subtotal + tax,
+                    sale.payment_method, sale.customer_name, sale.notes)
+
+    async def batch_writer(self):
+        # Group commit: semua checkout yang menunggu di-commit dalam satu transaksi lewat commit_sales
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.pending.get()]
+            deadline = loop.time() + self.batch_ms / 1000.0
+            while len(batch) < self.batch_size:
+                if not self.pending.empty():
+                    batch.append(self.pending.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.pending.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = await self.write(self.core.commit_sales, [sale for sale, _ in batch])
+            except Exception as e:
+                logging.error(f"Batch checkout failed: {e}")
+                results = [e] * len(batch)
+            self.batches += 1
+            self.batched_sales += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def receipt(self, query, data):
+        text = await self.read(self.core.reprint_receipt, query['transaction_id'])
+        if text is None:
+            raise NotFound(f"Transaksi {query['transaction_id']} tidak ditemukan")
+        return {'text': text}
+
+    async def stream_report(self, query, writer):
+        # Laporan dikirim per potongan (chunked, satu baris JSON per potongan) agar memori tetap kecil
+        report_type = query['type']
+        if report_type not in REPORTS:
+            raise NotFound(f"Laporan {report_type} tidak ada")
+        if REPORTS[report_type]['uses_dates'] and not (query.get('date_from') and query.get('date_to')):
+            raise ValueError("Laporan ini membutuhkan date_from dan date_to")
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(REPORT_STREAM_QUEUE)
+        cancel = threading.Event()
+
+        def put(item):
+            # Klien yang putus tidak lagi membaca antrean; producer berhenti sebelum put berikutnya
+            if cancel.is_set():
+                return False
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+            return True
+
+        def produce():
+            # Generator ditutup eksplisit agar koneksi baca segera kembali ke pool
+            report = self.core.report_chunks(report_type, query.get('date_from'), query.get('date_to'))
+            try:
+                with contextlib.closing(report):
+                    for chunk in report:
+                        if not put(chunk):
+                            return
+            except Exception as e:
+                put(e)
+            put(None)
+
+        producer = loop.run_in_executor(self.read_executor, produce)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\n\r\n")
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                payload = error_to_dict(chunk) if isinstance(chunk, Exception) else chunk
+                data = json.dumps(payload).encode('utf-8') + b'\n'
+                writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # Kosongkan antrean sampai producer selesai, supaya put yang tertunda tidak menggantung
+            # thread baca selamanya (mis. till menutup socket di tengah laporan)
+            cancel.set()
+            while not producer.done():
+                while not chunks.empty():
+                    chunks.get_nowait()
+                await asyncio.wait([producer], timeout=0.05)
+            await producer
+
+def load_config(path='config.ini'):
+    config = configparser.ConfigParser()
+    config.read(path)
+    for section, defaults in (('Database', DATABASE_DEFAULTS), ('Server', SERVER_DEFAULTS),
+                              ('Metrics', METRICS_DEFAULTS)):
+        if section not in config:
+            config[section] = {}
+        for key, value in defaults.items():
+            config[section].setdefault(key, value)
+    return config
+
+def main():
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Layanan POS HTTP/JSON untuk beberapa till")
+    parser.add_argument('--db', default=config['Database']['path'])
+    parser.add_argument('--host', default=config['Server']['host'])
+    parser.add_argument('--port', type=int, default=int(config['Server']['port']))
+    parser.add_argument('--batch-size', type=int, default=int(config['Server']['batch_size']))
+    parser.add_argument('--batch-ms', type=float, default=float(config['Server']['batch_ms']))
+    args = parser.parse_args()
+
+    tax_rate = config.getfloat('Tax', 'rate', fallback=0.11)
+    search_limit = config.getint('Search', 'limit', fallback=200)
+    terminal_id = config.get('Terminal', 'id', fallback='').strip()
+    metrics, exporter = metrics_from_config(config['Metrics'])
+    core = POSCore(args.db, dict(config['Database']), tax_rate, search_limit,
+                   int(terminal_id) if terminal_id else None, metrics=metrics)
+    service = POSService(core, args.batch_size, args.batch_ms, metrics)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.close()
+        if exporter is not None:
+            exporter.close()
+
+if __name__ == "__main__":
+    main()